@@ -0,0 +1,186 @@
+import os
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import List, Optional
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from awesome_api.constants import ENV_VAR_METRICS_ENABLED
+from awesome_api.history_cache import get_history_cache
+from awesome_api.models import MetricsConfig, QueryEvent, QueryObserver
+from awesome_api.order_logging import get_order_buffer
+from awesome_api.portfolio_index import get_portfolio_index
+from awesome_api.utils.metrics import MetricsRegistry, render_gauge
+
+METRICS_CONFIG_ENV_VARS = {
+    "enabled": ENV_VAR_METRICS_ENABLED,
+}
+# Route of the request being served, labelling the queries it runs. Queries
+# of background tasks and worker threads have no route.
+current_route: ContextVar[str] = ContextVar("current_route", default="none")
+UNMATCHED_ROUTE = "unmatched"
+
+
+def get_metrics_config() -> MetricsConfig:
+    """Build the metrics configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in METRICS_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return MetricsConfig.model_validate(values)
+
+
+class ApiMetrics(QueryObserver):
+    """Query and request metrics of the API, in Prometheus text format.
+
+    Queries are labelled by the route of the request running them, executor
+    method and query label, requests by method, route and status code.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        query_labels = ["route", "method", "query"]
+        self.query_seconds = self.registry.histogram(
+            "awesome_query_duration_seconds",
+            "Duration of executor queries, connection wait included.",
+            query_labels,
+        )
+        self.query_connection_wait_seconds = self.registry.histogram(
+            "awesome_query_connection_wait_seconds",
+            "Wait for a pooled connection before executor queries.",
+            query_labels,
+        )
+        self.query_rows = self.registry.counter(
+            "awesome_query_rows_total",
+            "Rows returned by executor queries.",
+            query_labels,
+        )
+        self.query_bytes = self.registry.counter(
+            "awesome_query_bytes_total",
+            "Estimated size of the rows returned by executor queries.",
+            query_labels,
+        )
+        self.query_errors = self.registry.counter(
+            "awesome_query_errors_total", "Failed executor queries.", query_labels
+        )
+        self.request_seconds = self.registry.histogram(
+            "awesome_request_duration_seconds",
+            "Duration of API requests, until the response is sent.",
+            ["method", "route", "status"],
+        )
+
+    def observe_query(self, event: QueryEvent) -> None:
+        labels = (current_route.get(), event.method, event.label)
+        self.query_seconds.observe(event.seconds, *labels)
+        self.query_connection_wait_seconds.observe(
+            event.connection_wait_seconds, *labels
+        )
+        self.query_rows.inc(*labels, amount=event.rows)
+        self.query_bytes.inc(*labels, amount=event.bytes)
+        if event.failed:
+            self.query_errors.inc(*labels)
+
+    def observe_request(
+        self, method: str, route: str, status: int, seconds: float
+    ) -> None:
+        self.request_seconds.observe(seconds, method, route, str(status))
+
+    def render(self) -> str:
+        lines: List[str] = self.registry.render_lines()
+        order_buffer = get_order_buffer()
+        if order_buffer is not None:
+            order_stats = order_buffer.stats()
+            lines += render_gauge(
+                "awesome_order_buffer_queue_depth",
+                "Client orders waiting for a flush.",
+                order_stats.queue_depth,
+            )
+            lines += render_gauge(
+                "awesome_order_buffer_flushed_orders",
+                "Client orders written by the order buffer.",
+                order_stats.flushed_orders,
+            )
+            lines += render_gauge(
+                "awesome_order_buffer_dropped_orders",
+                "Client orders dropped by the order buffer.",
+                order_stats.dropped_orders,
+            )
+            lines += render_gauge(
+                "awesome_order_buffer_failed_flushes",
+                "Order buffer flushes that failed and were retried.",
+                order_stats.failed_flush_count,
+            )
+        history_cache = get_history_cache()
+        if history_cache is not None:
+            cache_stats = history_cache.stats()
+            for name, value in cache_stats.model_dump().items():
+                lines += render_gauge(
+                    f"awesome_history_cache_{name}", f"History cache {name}.", value
+                )
+        portfolio_index = get_portfolio_index()
+        if portfolio_index is not None:
+            index_stats = portfolio_index.stats()
+            for name, value in index_stats.model_dump().items():
+                lines += render_gauge(
+                    f"awesome_portfolio_index_{name}",
+                    f"Active portfolio index {name}.",
+                    value,
+                )
+        return "\n".join(lines) + "\n"
+
+
+def get_route_path(scope: Scope) -> str:
+    """Path template of the route matching the request, e.g. /{company_id}/claims."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """Time requests per route, and label the queries they run with it.
+
+    Requests go straight through when metrics are disabled.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        metrics = get_api_metrics()
+        if metrics is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started_at = time.perf_counter()
+        route = get_route_path(scope)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = current_route.set(route)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_route.reset(token)
+            metrics.observe_request(
+                method=scope["method"],
+                route=route,
+                status=status,
+                seconds=time.perf_counter() - started_at,
+            )
+
+
+@lru_cache(maxsize=None)
+def get_api_metrics() -> Optional[ApiMetrics]:
+    """Process-wide API metrics, None when metrics are disabled."""
+    if not get_metrics_config().enabled:
+        return None
+    return ApiMetrics()
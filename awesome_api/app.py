@@ -1,6 +1,15 @@
+from typing import List
+
+import pandas as pd
 import streamlit as st
+from pandas import DataFrame
+from sqlalchemy.exc import SQLAlchemyError
 
-from awesome_api.utils.postgres_utils import PostgresDataSource
+from awesome_api.sql_console import (
+    get_console_cache,
+    get_console_data_source,
+    run_console_query,
+)
 
 # Streamlit UI
 st.title("SQL Query Executor")
@@ -12,8 +21,35 @@ query = st.text_area("Enter your SQL query here:")
 # Button to execute the query
 if st.button("Execute Query"):
     if query.strip():
-        db = PostgresDataSource()
-        df = db.run_select_query(query=query)
-        st.dataframe(df)
+        source = get_console_data_source()
+        status = st.empty()
+        table = st.empty()
+        shown_chunks: List[DataFrame] = []
+
+        def show_chunk(chunk: DataFrame) -> None:
+            # Render rows as they are fetched, up to max_rows
+            shown_chunks.append(chunk)
+            table.dataframe(pd.concat(shown_chunks, ignore_index=True))
+            status.caption(f"{sum(map(len, shown_chunks))} rows fetched...")
+
+        try:
+            result = run_console_query(
+                source=source,
+                cache=get_console_cache(),
+                query=query,
+                on_chunk=show_chunk,
+            )
+        except SQLAlchemyError as e:
+            status.empty()
+            st.error(f"Query failed: {getattr(e, 'orig', None) or e}")
+        else:
+            table.dataframe(result.df)
+            origin = "from cache" if result.cached else f"in {result.seconds:.2f}s"
+            status.caption(f"{len(result.df)} rows {origin}")
+            if result.truncated:
+                st.warning(
+                    f"Only the first {source.config.max_rows} rows are shown,"
+                    " refine the query or add a LIMIT to see others."
+                )
     else:
         st.warning("Please enter a valid SQL query.")
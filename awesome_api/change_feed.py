@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from awesome_api.claims_management import get_claim_info_records
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    ChangeType,
+    ClientOrder,
+    OrderType,
+    TransactionalQuery,
+)
+from awesome_api.score_management import get_score_records
+from awesome_api.utils.pagination import decode_cursor, encode_cursor, optional
+
+# Scores and claims get the next change id of a shared sequence when they are
+# inserted or updated (migration 7), a cursor holds the last one returned.
+CURSOR_CONVERTERS = [optional(int)]
+ACTIVE_COMPANIES_QUERY = (
+    "SELECT company_id FROM client_portfolio WHERE validity_end_date IS NULL"
+)
+
+
+def build_score_changes_query(
+    cutoff_date: datetime, limit: int, after_change_id: Optional[int] = None
+) -> TransactionalQuery:
+    """Score changes of monitored companies, in change id order."""
+    params: Dict[str, Any] = {"cutoff_date": cutoff_date, "limit": limit}
+    query = (
+        "SELECT score_date, score, company_id, score_type, change_id"
+        " FROM company_credit_scores"
+        f" WHERE company_id IN ({ACTIVE_COMPANIES_QUERY})"
+        " and score_date >= :cutoff_date"
+    )
+    if after_change_id is not None:
+        params["after_change_id"] = after_change_id
+        query += " and change_id > :after_change_id"
+    query += " ORDER BY change_id LIMIT :limit;"
+    return TransactionalQuery(query=query, params=params)
+
+
+def build_claim_changes_query(
+    cutoff_date: datetime, limit: int, after_change_id: Optional[int] = None
+) -> TransactionalQuery:
+    """Claim changes of monitored companies, in change id order."""
+    params: Dict[str, Any] = {"cutoff_date": cutoff_date, "limit": limit}
+    query = f"""SELECT
+        claim_creation_date,
+        debtor_id,
+        claim_id,
+        hashed_claim_id,
+        initial_claim_amount,
+        current_claim_amount,
+        last_update_date,
+        change_id
+        FROM
+        claims
+        WHERE
+        debtor_id IN ({ACTIVE_COMPANIES_QUERY})
+        and claim_creation_date >= :cutoff_date
+        and last_update_date IS NOT NULL"""
+    if after_change_id is not None:
+        params["after_change_id"] = after_change_id
+        query += """
+        and change_id > :after_change_id"""
+    query += """
+        ORDER BY change_id
+        LIMIT :limit;"""
+    return TransactionalQuery(query=query, params=params)
+
+
+def decode_change_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Last change id returned before a cursor, None to start from the first."""
+    if cursor is None:
+        return None
+    [after_change_id] = decode_cursor(cursor, converters=CURSOR_CONVERTERS)
+    return after_change_id
+
+
+def encode_change_cursor(after_change_id: Optional[int]) -> str:
+    return encode_cursor([after_change_id])
+
+
+async def get_change_batch(
+    executor: AsyncSqlRequestExecutor,
+    call_date: datetime,
+    limit: int,
+    since: Optional[str] = None,
+) -> Tuple[Dict[str, Any], List[ClientOrder]]:
+    """ChangeBatch record of the next `limit` changes after the `since` cursor.
+
+    Both streams are read up to `limit + 1` rows with keyset queries, merged
+    by change id, and the cursor moves to the last returned change. Rows
+    loaded late, with dates before those already returned, get a new change
+    id and are returned by the next poll. Also returns the client orders of
+    the companies with changes.
+    """
+    cutoff_date = call_date - timedelta(days=5 * 365)
+    after_change_id = decode_change_cursor(since)
+    score_query = build_score_changes_query(
+        cutoff_date=cutoff_date, limit=limit + 1, after_change_id=after_change_id
+    )
+    claim_query = build_claim_changes_query(
+        cutoff_date=cutoff_date, limit=limit + 1, after_change_id=after_change_id
+    )
+    score_rows, claim_rows = await asyncio.gather(
+        executor.run_select_rows(query=score_query.query, params=score_query.params),
+        executor.run_select_rows(query=claim_query.query, params=claim_query.params),
+    )
+    merged = heapq.merge(
+        ((row["change_id"], ChangeType.SCORE_UPDATE, row) for row in score_rows),
+        ((row["change_id"], ChangeType.CLAIM_UPDATE, row) for row in claim_rows),
+        key=lambda change: change[0],
+    )
+    batch = [change for _, change in zip(range(limit), merged)]
+    scores = [row for _, kind, row in batch if kind == ChangeType.SCORE_UPDATE]
+    claims = [row for _, kind, row in batch if kind == ChangeType.CLAIM_UPDATE]
+    if batch:
+        after_change_id = batch[-1][0]
+    score_records = iter(get_score_records(scores))
+    claim_records = iter(get_claim_info_records(claims))
+    changes = [
+        {
+            "type": kind.value,
+            "data": next(
+                score_records if kind == ChangeType.SCORE_UPDATE else claim_records
+            ),
+        }
+        for _, kind, _ in batch
+    ]
+    change_batch = {
+        "changes": changes,
+        "next_cursor": encode_change_cursor(after_change_id=after_change_id),
+        "has_more": len(score_rows) + len(claim_rows) > len(batch),
+    }
+    orders = get_change_orders(
+        score_companies={row["company_id"] for row in scores},
+        claim_companies={row["debtor_id"] for row in claims},
+        call_date=call_date,
+    )
+    return change_batch, orders
+
+
+def get_change_orders(
+    score_companies: Set[str], claim_companies: Set[str], call_date: datetime
+) -> List[ClientOrder]:
+    return [
+        ClientOrder(company_id=company_id, order_type=order_type, order_date=call_date)
+        for companies, order_type in [
+            (score_companies, OrderType.SCORE_UPDATES),
+            (claim_companies, OrderType.CLAIM_UPDATES),
+        ]
+        for company_id in sorted(companies)
+    ]
@@ -1,13 +1,80 @@
 import hashlib
-from typing import List
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+from pandas import DataFrame, Series
+from pydantic import TypeAdapter
+
+from awesome_api.constants import CLAIM_HASH_CACHE_SIZE
+from awesome_api.models import ClaimInfo, ClaimSize, ClaimStatus, TransactionalQuery
+
+# Lower bounds (inclusive) of every claim size but XS, see set_claim_size
+CLAIM_SIZE_BOUNDS = np.array([20000, 30000, 100000, 500000])
+CLAIM_SIZES = np.array(
+    [ClaimSize.XS, ClaimSize.S, ClaimSize.M, ClaimSize.L, ClaimSize.XL], dtype=object
+)
+
+CLAIM_INFO_FIELDS = list(ClaimInfo.model_fields)
+CLAIM_INFO_LIST_ADAPTER = TypeAdapter(List[ClaimInfo])
+
+
+def build_company_claims_query(
+    company_id: str,
+    cutoff_date: datetime,
+    limit: Optional[int] = None,
+    after: Optional[Sequence[Any]] = None,
+) -> TransactionalQuery:
+    """Claims of a debtor created since `cutoff_date`.
+
+    With a `limit`, `limit` rows are returned by creation date and claim id,
+    starting after the (claim_creation_date, claim_id) keyset `after` when given.
+    """
+    params: Dict[str, Any] = {"company_id": company_id, "cutoff_date": cutoff_date}
+    query = """SELECT
+        claim_creation_date,
+        debtor_id, claim_id,
+        hashed_claim_id,
+        initial_claim_amount,
+        current_claim_amount,
+        last_update_date
+        FROM
+        claims
+        WHERE
+        debtor_id = :company_id
+        and claim_creation_date >= :cutoff_date"""
+    if after is not None:
+        after_claim_creation_date, after_claim_id = after
+        params.update(
+            after_claim_creation_date=after_claim_creation_date,
+            after_claim_id=after_claim_id,
+        )
+        query += """
+        and (claim_creation_date, claim_id)
+        > (:after_claim_creation_date, :after_claim_id)"""
+    if limit is not None:
+        params["limit"] = limit
+        query += """
+        ORDER BY claim_creation_date, claim_id
+        LIMIT :limit"""
+    return TransactionalQuery(query=query + ";", params=params)
+
+
+@lru_cache(maxsize=CLAIM_HASH_CACHE_SIZE)
+def hash_claim_id(claim_id: str) -> str:
+    """Fallback of the hashed_claim_id column of the claims table."""
+    return str(hashlib.sha256(claim_id.encode()).hexdigest())
 
-from pandas import DataFrame
 
-from awesome_api.models import ClaimInfo, ClaimSize, ClaimStatus
+def hash_claim_ids(claim_ids: Iterable[str]) -> List[str]:
+    sha256 = hashlib.sha256
+    return [sha256(claim_id.encode()).hexdigest() for claim_id in claim_ids]
 
 
-def hash_claim_id(claim_id: str) -> str:
-    return str(hashlib.sha256(claim_id.encode()).hexdigest())
+def get_hashed_claim_id(row: Mapping[str, Any]) -> str:
+    """Hashed claim id of a row, computed only if not selected from the database."""
+    return row.get("hashed_claim_id") or hash_claim_id(row["claim_id"])
 
 
 def set_claim_status(
@@ -37,6 +104,66 @@ def set_claim_size(initial_claim_amount: int) -> ClaimSize:
         return ClaimSize.XL
 
 
+def format_dates(dates: Series, unit: str) -> np.ndarray:
+    """Vectorized isoformat truncated to `unit` ("M" -> YYYY-MM, "D" -> YYYY-MM-DD)."""
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    formatted = values.astype(f"datetime64[{unit}]").astype(str).astype(object)
+    formatted[np.isnat(values)] = None
+    return formatted
+
+
+def set_claim_sizes(initial_claim_amounts: Series) -> np.ndarray:
+    """Vectorized set_claim_size."""
+    bins = np.searchsorted(
+        CLAIM_SIZE_BOUNDS, initial_claim_amounts.to_numpy(), side="right"
+    )
+    return CLAIM_SIZES[bins]
+
+
+def set_claim_statuses(
+    initial_claim_amounts: Series, current_claim_amounts: Series
+) -> np.ndarray:
+    """Vectorized claim status, a claim is partially settled below half its amount."""
+    initial = initial_claim_amounts.to_numpy(dtype=float)
+    current = current_claim_amounts.to_numpy(dtype=float)
+    return np.select(
+        [current == 0, current < (initial / 2)],
+        np.array([ClaimStatus.SETTLED, ClaimStatus.PARTIALLY_SETTLED], dtype=object),
+        default=np.array(ClaimStatus.NOT_SETTLED, dtype=object),
+    )
+
+
+def get_claim_status(
+    initial_claim_amount: int, current_claim_amount: Optional[int]
+) -> ClaimStatus:
+    """Row counterpart of set_claim_statuses."""
+    if current_claim_amount is None:
+        return ClaimStatus.NOT_SETTLED
+    elif current_claim_amount == 0:
+        return ClaimStatus.SETTLED
+    elif current_claim_amount < (initial_claim_amount / 2):
+        return ClaimStatus.PARTIALLY_SETTLED
+    else:
+        return ClaimStatus.NOT_SETTLED
+
+
+def get_claim_info_records(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Same output as get_claim_info_cp, built from database rows without pandas."""
+    return [
+        {
+            "claim_creation_date": row["claim_creation_date"].strftime("%Y-%m"),
+            "company_id": row["debtor_id"],
+            "hashed_claim_id": get_hashed_claim_id(row),
+            "claim_size": set_claim_size(row["initial_claim_amount"]),
+            "claim_status": get_claim_status(
+                row["initial_claim_amount"], row["current_claim_amount"]
+            ),
+            "claim_status_date": row["last_update_date"].strftime("%Y-%m-%d"),
+        }
+        for row in rows
+    ]
+
+
 def get_claim_info(df: DataFrame) -> List[ClaimInfo]:
     claims = []
     for i in range(len(df)):
@@ -57,24 +184,27 @@ def get_claim_info(df: DataFrame) -> List[ClaimInfo]:
 
 
 def get_claim_info_cp(df: DataFrame) -> List[ClaimInfo]:
-    claims = []
+    claims: List[ClaimInfo] = []
     if len(df):
         cp = df.copy()
         preprocess_cp(cp)
-        record_list = cp.to_dict("records")
-        claims = [ClaimInfo.model_validate(record) for record in record_list]
-        del cp, record_list
+        # Records are validated in one pydantic-core call instead of row by row
+        records = [
+            dict(zip(CLAIM_INFO_FIELDS, values))
+            for values in zip(*[cp[field].tolist() for field in CLAIM_INFO_FIELDS])
+        ]
+        claims = CLAIM_INFO_LIST_ADAPTER.validate_python(records)
+        del cp, records
     return claims
 
 
 def preprocess_cp(cp):
-    cp["claim_creation_date"] = cp["claim_creation_date"].dt.strftime("%Y-%m")
+    cp["claim_creation_date"] = format_dates(cp["claim_creation_date"], unit="M")
     cp["company_id"] = cp["debtor_id"]
-    cp["hashed_claim_id"] = cp["claim_id"].apply(hash_claim_id)
-    cp["claim_size"] = cp["initial_claim_amount"].apply(set_claim_size)
-    cp["claim_status"] = ClaimStatus.NOT_SETTLED
-    cp.loc[
-        cp["current_claim_amount"] < (cp["initial_claim_amount"] / 2), "claim_status"
-    ] = ClaimStatus.PARTIALLY_SETTLED
-    cp.loc[cp["current_claim_amount"] == 0, "claim_status"] = ClaimStatus.SETTLED
-    cp["claim_status_date"] = cp["last_update_date"].dt.strftime("%Y-%m-%d")
+    if "hashed_claim_id" not in cp:
+        cp["hashed_claim_id"] = hash_claim_ids(cp["claim_id"])
+    cp["claim_size"] = set_claim_sizes(cp["initial_claim_amount"])
+    cp["claim_status"] = set_claim_statuses(
+        cp["initial_claim_amount"], cp["current_claim_amount"]
+    )
+    cp["claim_status_date"] = format_dates(cp["last_update_date"], unit="D")
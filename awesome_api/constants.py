@@ -2,3 +2,38 @@ ENV_VAR_POSTGRES_USER = "POSTGRES_USER"
 ENV_VAR_POSTGRES_PASSWORD = "POSTGRES_PASSWORD"
 ENV_VAR_POSTGRES_DB = "POSTGRES_DB"
 ENV_VAR_POSTGRES_DATABASE_URL = "DATABASE_URL"
+ENV_VAR_DB_POOL_SIZE = "DB_POOL_SIZE"
+ENV_VAR_DB_MAX_OVERFLOW = "DB_MAX_OVERFLOW"
+ENV_VAR_DB_POOL_TIMEOUT = "DB_POOL_TIMEOUT"
+ENV_VAR_DB_POOL_RECYCLE = "DB_POOL_RECYCLE"
+ENV_VAR_DB_POOL_PRE_PING = "DB_POOL_PRE_PING"
+ENV_VAR_DB_POOL_WARM_UP = "DB_POOL_WARM_UP"
+MAX_CHUNK_SIZE = 1000
+ENV_VAR_ORDER_WRITE_BEHIND_ENABLED = "ORDER_WRITE_BEHIND_ENABLED"
+ENV_VAR_ORDER_WRITE_BEHIND_BATCH_SIZE = "ORDER_WRITE_BEHIND_BATCH_SIZE"
+ENV_VAR_ORDER_WRITE_BEHIND_FLUSH_INTERVAL = "ORDER_WRITE_BEHIND_FLUSH_INTERVAL"
+ENV_VAR_ORDER_WRITE_BEHIND_MAX_PENDING = "ORDER_WRITE_BEHIND_MAX_PENDING"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+ENV_VAR_HISTORY_CACHE_ENABLED = "HISTORY_CACHE_ENABLED"
+ENV_VAR_HISTORY_CACHE_MAX_SIZE = "HISTORY_CACHE_MAX_SIZE"
+ENV_VAR_HISTORY_CACHE_TTL = "HISTORY_CACHE_TTL"
+ENV_VAR_HISTORY_CACHE_VERSION_CHECK_INTERVAL = "HISTORY_CACHE_VERSION_CHECK_INTERVAL"
+DEFAULT_CHANGES_BATCH_SIZE = 500
+MAX_CHANGES_BATCH_SIZE = 5000
+CLAIM_HASH_CACHE_SIZE = 65536
+ENV_VAR_METRICS_ENABLED = "METRICS_ENABLED"
+ENV_VAR_PROFILING_ENABLED = "PROFILING_ENABLED"
+ENV_VAR_PROFILING_SAMPLE_RATE = "PROFILING_SAMPLE_RATE"
+ENV_VAR_PROFILING_INTERVAL = "PROFILING_INTERVAL"
+ENV_VAR_PROFILING_OUTPUT_DIR = "PROFILING_OUTPUT_DIR"
+ENV_VAR_CONSOLE_DATABASE_URL = "CONSOLE_DATABASE_URL"
+ENV_VAR_CONSOLE_MAX_ROWS = "CONSOLE_MAX_ROWS"
+ENV_VAR_CONSOLE_STATEMENT_TIMEOUT = "CONSOLE_STATEMENT_TIMEOUT"
+ENV_VAR_CONSOLE_CHUNK_SIZE = "CONSOLE_CHUNK_SIZE"
+ENV_VAR_CONSOLE_POOL_SIZE = "CONSOLE_POOL_SIZE"
+ENV_VAR_CONSOLE_CACHE_TTL = "CONSOLE_CACHE_TTL"
+ENV_VAR_CONSOLE_CACHE_MAX_SIZE = "CONSOLE_CACHE_MAX_SIZE"
+ENV_VAR_PORTFOLIO_INDEX_ENABLED = "PORTFOLIO_INDEX_ENABLED"
+ENV_VAR_PORTFOLIO_INDEX_RECONCILE_INTERVAL = "PORTFOLIO_INDEX_RECONCILE_INTERVAL"
+ENV_VAR_ARROW_TRANSFER_DIR = "ARROW_TRANSFER_DIR"
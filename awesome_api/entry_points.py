@@ -1,6 +1,14 @@
 import sys
+from datetime import datetime, timedelta
 from typing import Callable, Optional, Sequence
 
+from awesome_api.history_cache import invalidate_history_caches
+from awesome_api.migrations import apply_migrations
+from awesome_api.query_plans import check_query_plans
+from awesome_api.update_snapshots import rebuild_update_snapshot
+from awesome_api.utils.generate_dataset import write_dataset
+from awesome_api.utils.postgres_utils import get_data_source
+
 
 def make_executable(
     custom_args: Optional[Sequence[str]] = None,
@@ -30,3 +38,78 @@ def make_executable(
 @make_executable()
 def simple_task(param1: str, param2: str):
     print(f"this is param1 : {param1} and this is param2 : {param2}")
+
+
+@make_executable()
+def migrate_db(target_version: Optional[str] = None):
+    applied_migrations = apply_migrations(
+        executor=get_data_source(),
+        target_version=None if target_version is None else int(target_version),
+    )
+    for migration in applied_migrations:
+        print(f"Applied migration {migration.version:04d} {migration.name}")
+    if not applied_migrations:
+        print("Database schema is up to date")
+
+
+@make_executable()
+def explain_hot_queries(force_index_scan: str = "true"):
+    reports = check_query_plans(
+        db=get_data_source(), force_index_scan=force_index_scan.lower() == "true"
+    )
+    for report in reports:
+        status = "OK" if report.uses_expected_index else "MISSING INDEX"
+        used_indexes = ", ".join(report.used_indexes) or "no index"
+        print(f"{report.name:<24} {status:<14} {used_indexes}")
+    if not all(report.uses_expected_index for report in reports):
+        sys.exit(1)
+
+
+@make_executable()
+def snapshot_updates(update_date: Optional[str] = None):
+    if update_date is None:
+        # Run after the daily load, which completes the updates of yesterday
+        update_date = (datetime.now().date() - timedelta(days=1)).isoformat()
+    day = datetime.strptime(update_date, "%Y-%m-%d")
+    rebuild_update_snapshot(executor=get_data_source(), update_date=day)
+    print(f"Updates of {day.date().isoformat()} snapshotted")
+
+
+@make_executable()
+def invalidate_history_cache():
+    # Run after the daily load, API processes then clear their history cache
+    invalidate_history_caches(executor=get_data_source())
+    print("History caches invalidated")
+
+
+@make_executable()
+def generate_dataset(
+    output_dir: str = "initial_data",
+    output_format: str = "csv",
+    companies: str = "50",
+    max_history: str = "100",
+    claim_dates: str = "500",
+    sample_size: str = "3",
+    portfolio_share: str = "0.3",
+    seed: str = "0",
+    reference_date: Optional[str] = None,
+    chunk_size: str = "100000",
+):
+    row_counts = write_dataset(
+        output_dir=output_dir,
+        output_format=output_format,
+        companies=int(companies),
+        max_history=int(max_history),
+        claim_dates=int(claim_dates),
+        sample_size=int(sample_size),
+        portfolio_share=float(portfolio_share),
+        seed=int(seed),
+        reference_date=(
+            None
+            if reference_date is None
+            else datetime.strptime(reference_date, "%Y-%m-%d")
+        ),
+        chunk_size=int(chunk_size),
+    )
+    for table, rows in row_counts.items():
+        print(f"Generated {rows} {table} rows in {output_dir}")
@@ -1,4 +1,4 @@
-from typing import Any, Dict
+from typing import Any, Dict, Sequence
 
 
 class AwesomeApiError(Exception):
@@ -20,3 +20,23 @@ class WrongDateFormat(AwesomeApiError):
         metadata = {"date": date}
         metadata.update(other_metadata)
         super().__init__(**metadata)
+
+
+class WrongCursorFormat(AwesomeApiError):
+    def __init__(self, cursor: str, **other_metadata):
+        self.cursor: str = cursor
+        metadata = {"cursor": cursor}
+        metadata.update(other_metadata)
+        super().__init__(**metadata)
+
+
+class ChunkExecutionError(AwesomeApiError):
+    def __init__(
+        self, chunk_index: int, chunk: Sequence[Any], message: str, **other_metadata
+    ):
+        self.chunk_index: int = chunk_index
+        self.chunk: Sequence[Any] = chunk
+        metadata = {"chunk_index": chunk_index, "chunk": chunk}
+        metadata.update(other_metadata)
+        super().__init__(**metadata)
+        self.args = (message,)
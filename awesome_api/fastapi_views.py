@@ -1,24 +1,261 @@
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import List
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy.exc import SQLAlchemyError
 
-from awesome_api.claims_management import get_claim_info_cp
-from awesome_api.errors import WrongDateFormat
+from awesome_api.api_metrics import RequestMetricsMiddleware, get_api_metrics
+from awesome_api.change_feed import get_change_batch
+from awesome_api.claims_management import (
+    build_company_claims_query,
+    get_claim_info_records,
+)
+from awesome_api.constants import (
+    DEFAULT_CHANGES_BATCH_SIZE,
+    DEFAULT_PAGE_SIZE,
+    MAX_CHANGES_BATCH_SIZE,
+    MAX_PAGE_SIZE,
+)
+from awesome_api.errors import WrongCursorFormat, WrongDateFormat
+from awesome_api.history_cache import (
+    get_history_cache,
+    get_history_cache_version_async,
+)
+from awesome_api.history_validators import (
+    build_history_validator_query,
+    get_history_validator,
+    get_validator_headers,
+    is_not_modified,
+)
 from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    CacheStats,
+    ChangeBatch,
     ClaimInfo,
+    ClientOrder,
     ClientPortfolioModel,
     ClientUpdate,
+    CompanyHistory,
+    HistoryValidator,
     MonitoringStatus,
     OrderType,
     ScoreModel,
 )
-from awesome_api.portfolio_management import SqlPortfolioManager
-from awesome_api.update_management import get_claim_update, get_score_update
-from awesome_api.utils.postgres_utils import PostgresDataSource
+from awesome_api.order_logging import get_order_buffer
+from awesome_api.portfolio_index import get_portfolio_index
+from awesome_api.portfolio_management import AsyncSqlPortfolioManager
+from awesome_api.request_profiling import RequestProfilingMiddleware
+from awesome_api.score_management import (
+    build_company_scores_query,
+    get_score_keyset,
+    get_score_records,
+)
+from awesome_api.update_management import (
+    get_client_update_async,
+    iter_client_update_async,
+)
+from awesome_api.update_snapshots import has_update_snapshot_async, is_snapshot_date
+from awesome_api.utils.metrics import CONTENT_TYPE
+from awesome_api.utils.pagination import decode_cursor, encode_cursor
+from awesome_api.utils.postgres_utils import (
+    get_async_data_source,
+    get_data_source,
+    get_pool_config,
+)
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+HISTORY_QUERY_BUILDERS = {
+    CompanyHistory.SCORES: build_company_scores_query,
+    CompanyHistory.CLAIMS: build_company_claims_query,
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Handlers get their executor from get_async_data_source, unless overridden
+    db = app.dependency_overrides.get(get_async_data_source, get_async_data_source)()
+    metrics = get_api_metrics()
+    if metrics is not None:
+        # Update extractions query through the synchronous data source
+        db.observer = get_data_source().observer = metrics
+    if get_pool_config().warm_up:
+        try:
+            await db.warm_up()
+        except (SQLAlchemyError, OSError) as e:
+            # The database may still be starting (e.g. docker-compose), the pool
+            # will then open connections lazily on first use.
+            logger.warning(f"Connection pool warm-up failed: {e}")
+    order_buffer = get_order_buffer()
+    if order_buffer is not None:
+        order_buffer.pf_manager = AsyncSqlPortfolioManager(executor=db)
+        await order_buffer.start()
+    portfolio_index = get_portfolio_index()
+    if portfolio_index is not None:
+        portfolio_index.loader = AsyncSqlPortfolioManager(
+            executor=db
+        ).get_active_entries
+        await portfolio_index.start()
+    history_cache = get_history_cache()
+    if history_cache is not None:
+        history_cache.version_loader = partial(
+            get_history_cache_version_async, executor=db
+        )
+        await history_cache.start()
+    yield
+    try:
+        if history_cache is not None:
+            await history_cache.stop()
+        if portfolio_index is not None:
+            await portfolio_index.stop()
+        if order_buffer is not None:
+            await order_buffer.stop()
+    finally:
+        await db.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(RequestProfilingMiddleware)
+
+
+def json_response(content: Any) -> Response:
+    """Serialize records in one pass, skipping FastAPI response validation.
+
+    Handlers build their records in the shape of their `response_model`, which
+    is then only used for the OpenAPI schema.
+    """
+    return Response(content=to_json(content), media_type="application/json")
+
+
+def paginated_response(
+    request: Request, records: Any, next_key: Optional[Sequence[Any]]
+) -> Response:
+    """json_response advertising the next page cursor, if any, in its headers."""
+    response = json_response(records)
+    if next_key is not None:
+        next_cursor = encode_cursor(next_key)
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
 
-app = FastAPI()
+async def read_company_history(
+    db: AsyncSqlRequestExecutor,
+    history: CompanyHistory,
+    company_id: str,
+    cutoff_date: datetime,
+    limit: Optional[int] = None,
+    after: Optional[Sequence[Any]] = None,
+) -> Sequence[Mapping[str, Any]]:
+    """Rows of a company history, read through the history cache if enabled.
+
+    Pages are always read from the database.
+    """
+    build_query = HISTORY_QUERY_BUILDERS[history]
+
+    async def load(cutoff_date: datetime) -> Sequence[Mapping[str, Any]]:
+        query = build_query(
+            company_id=company_id, cutoff_date=cutoff_date, limit=limit, after=after
+        )
+        return await db.run_select_rows(query=query.query, params=query.params)
+
+    history_cache = get_history_cache()
+    if history_cache is None or limit is not None:
+        return await load(cutoff_date)
+    return await history_cache.get_rows(
+        history=history, company_id=company_id, cutoff_date=cutoff_date, loader=load
+    )
+
+
+async def full_history_response(
+    request: Request,
+    db: AsyncSqlRequestExecutor,
+    history: CompanyHistory,
+    company_id: str,
+    cutoff_date: datetime,
+    to_records: Callable[[Sequence[Mapping[str, Any]]], List[Dict[str, Any]]],
+) -> Response:
+    """Whole company history, with ETag and Last-Modified validators.
+
+    Conditional requests are first checked against a validator query, and
+    answered with a 304 without reading nor serializing the history when
+    it did not change.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None or if_modified_since is not None:
+        query = build_history_validator_query(
+            history=history, company_id=company_id, cutoff_date=cutoff_date
+        )
+        [row] = await db.run_select_rows(query=query.query, params=query.params)
+        validator = HistoryValidator.model_validate(dict(row))
+        if is_not_modified(
+            history=history,
+            validator=validator,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+        ):
+            return Response(
+                status_code=304,
+                headers=get_validator_headers(history=history, validator=validator),
+            )
+    rows = await read_company_history(
+        db=db, history=history, company_id=company_id, cutoff_date=cutoff_date
+    )
+    response = json_response(to_records(rows))
+    validator = get_history_validator(history=history, rows=rows)
+    response.headers.update(get_validator_headers(history=history, validator=validator))
+    return response
+
+
+async def monitor_company(
+    pf_manager: AsyncSqlPortfolioManager,
+    company_id: str,
+    call_date: datetime,
+    order_type: OrderType,
+) -> None:
+    order_buffer = get_order_buffer()
+    if order_buffer is None:
+        await pf_manager.add_company(
+            company_id=company_id, insertion_date=call_date, order_type=order_type
+        )
+    else:
+        await pf_manager.add_company(company_id=company_id, insertion_date=call_date)
+        order_buffer.record(
+            orders=[
+                ClientOrder(
+                    company_id=company_id, order_type=order_type, order_date=call_date
+                )
+            ]
+        )
+
+
+async def log_orders(
+    pf_manager: AsyncSqlPortfolioManager, orders: List[ClientOrder]
+) -> None:
+    order_buffer = get_order_buffer()
+    if order_buffer is None:
+        await pf_manager.add_orders(orders=orders)
+    else:
+        order_buffer.record(orders=orders)
 
 
 @app.exception_handler(WrongDateFormat)
@@ -29,68 +266,205 @@ async def unicorn_exception_handler(request: Request, exc: WrongDateFormat):
     )
 
 
+@app.exception_handler(WrongCursorFormat)
+async def wrong_cursor_exception_handler(request: Request, exc: WrongCursorFormat):
+    return JSONResponse(
+        status_code=400,
+        content={"message": exc.metadata["message"]},
+    )
+
+
 @app.get("/dummy", response_model=List[ScoreModel])
-def get_dummy_two_scores_records():
-    db = PostgresDataSource()
-    df = db.run_select_query(query="SELECT * FROM company_credit_scores LIMIT 2;")
-    del df["score_type"]
-    df["score_date"] = df["score_date"].apply(lambda x: x.isoformat())
-    records = df.to_dict("records")
-    return [ScoreModel.model_validate(record) for record in records]
+async def get_dummy_two_scores_records(
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    rows = await db.run_select_rows(
+        query="SELECT * FROM company_credit_scores LIMIT 2;"
+    )
+    return json_response(get_score_records(rows))
 
 
 @app.get("/{company_id}/scores", response_model=List[ScoreModel])
-def get_scores(company_id: str):
+async def get_scores(
+    request: Request,
+    company_id: str,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    """Scores of the last five years.
+
+    Set `limit` to page through them by score date, the next page is then
+    requested with the `X-Next-Cursor` header value as `cursor`. The order
+    is only logged for the first page.
+
+    Without pagination, the response carries ETag and Last-Modified headers
+    and conditional requests get a 304 when nothing changed, the order being
+    logged all the same.
+    """
     now = datetime.now()
     cutoff_date = now - timedelta(days=5 * 365)
-    params = {"company_id": company_id, "cutoff_date": cutoff_date}
-    db = PostgresDataSource()
-    df = db.run_select_query(
-        query="SELECT score_date, score, company_id FROM company_credit_scores"
-        " WHERE company_id = :company_id"
-        " and score_date >= :cutoff_date;",
-        params=params,
-    )
-    df["score_date"] = df["score_date"].apply(lambda x: x.isoformat())
-    records = df.to_dict("records")
-    pf_manager = SqlPortfolioManager(executor=db)
-    pf_manager.add_company(
-        company_id=company_id, insertion_date=now, order_type=OrderType.SCORES
-    )
-    return [ScoreModel.model_validate(record) for record in records]
+    if limit is None and cursor is None:
+        response = await full_history_response(
+            request=request,
+            db=db,
+            history=CompanyHistory.SCORES,
+            company_id=company_id,
+            cutoff_date=cutoff_date,
+            to_records=get_score_records,
+        )
+    else:
+        limit = limit or DEFAULT_PAGE_SIZE
+        after = None
+        if cursor is not None:
+            after = decode_cursor(
+                cursor, converters=[datetime.fromisoformat, str, int, int]
+            )
+        rows = await read_company_history(
+            db=db,
+            history=CompanyHistory.SCORES,
+            company_id=company_id,
+            cutoff_date=cutoff_date,
+            # One extra row tells whether there is a next page
+            limit=limit + 1,
+            after=after,
+        )
+        next_key = get_score_keyset(rows[limit - 1]) if len(rows) > limit else None
+        response = paginated_response(
+            request=request,
+            records=get_score_records(rows[:limit]),
+            next_key=next_key,
+        )
+    if cursor is None:
+        pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+        await monitor_company(
+            pf_manager=pf_manager,
+            company_id=company_id,
+            call_date=now,
+            order_type=OrderType.SCORES,
+        )
+    return response
 
 
 @app.get("/{company_id}/claims", response_model=list[ClaimInfo])
-def get_claims(company_id: str):
+async def get_claims(
+    request: Request,
+    company_id: str,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    """Claims created in the last five years.
+
+    Set `limit` to page through them by creation date, the next page is then
+    requested with the `X-Next-Cursor` header value as `cursor`. The order
+    is only logged for the first page.
+
+    Without pagination, the response carries ETag and Last-Modified headers
+    and conditional requests get a 304 when nothing changed, the order being
+    logged all the same.
+    """
     now = datetime.now()
     cutoff_date = now - timedelta(days=5 * 365)
-    params = {"company_id": company_id, "cutoff_date": cutoff_date}
-    db = PostgresDataSource()
-    df = db.run_select_query(
-        query="""SELECT
-        claim_creation_date,
-        debtor_id, claim_id,
-        initial_claim_amount,
-        current_claim_amount,
-        last_update_date
-        FROM
-        claims
-        WHERE
-        debtor_id = :company_id
-        and claim_creation_date >= :cutoff_date;
-        """,
-        params=params,
-    )
-    claims = get_claim_info_cp(df)
-    pf_manager = SqlPortfolioManager(executor=db)
-    pf_manager.add_company(
-        company_id=company_id, insertion_date=now, order_type=OrderType.CLAIMS
-    )
-    return claims
+    if limit is None and cursor is None:
+        response = await full_history_response(
+            request=request,
+            db=db,
+            history=CompanyHistory.CLAIMS,
+            company_id=company_id,
+            cutoff_date=cutoff_date,
+            to_records=get_claim_info_records,
+        )
+    else:
+        limit = limit or DEFAULT_PAGE_SIZE
+        after = None
+        if cursor is not None:
+            after = decode_cursor(cursor, converters=[datetime.fromisoformat, str])
+        rows = await read_company_history(
+            db=db,
+            history=CompanyHistory.CLAIMS,
+            company_id=company_id,
+            cutoff_date=cutoff_date,
+            # One extra row tells whether there is a next page
+            limit=limit + 1,
+            after=after,
+        )
+        next_key = None
+        if len(rows) > limit:
+            last_row = rows[limit - 1]
+            next_key = [last_row["claim_creation_date"], last_row["claim_id"]]
+        response = paginated_response(
+            request=request,
+            records=get_claim_info_records(rows[:limit]),
+            next_key=next_key,
+        )
+    if cursor is None:
+        pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+        await monitor_company(
+            pf_manager=pf_manager,
+            company_id=company_id,
+            call_date=now,
+            order_type=OrderType.CLAIMS,
+        )
+    return response
+
+
+def build_update_orders(
+    companies: Sequence[str], call_date: datetime
+) -> List[ClientOrder]:
+    return [
+        ClientOrder(company_id=company_id, order_type=order_type, order_date=call_date)
+        for company_id in companies
+        for order_type in (OrderType.SCORE_UPDATES, OrderType.CLAIM_UPDATES)
+    ]
+
+
+async def stream_client_update(
+    pf_manager: AsyncSqlPortfolioManager,
+    companies: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    from_snapshot: bool = False,
+) -> AsyncIterator[bytes]:
+    """NDJSON lines of the update, written chunk by chunk of companies."""
+    async for chunk, score_updates, claim_updates in iter_client_update_async(
+        companies=companies,
+        update_date=update_date,
+        call_date=call_date,
+        executor=pf_manager.executor,
+        from_snapshot=from_snapshot,
+    ):
+        await log_orders(
+            pf_manager=pf_manager,
+            orders=build_update_orders(companies=chunk, call_date=call_date),
+        )
+        lines = [
+            to_json({"type": "score_update", "data": score_update})
+            for score_update in score_updates
+        ] + [
+            to_json({"type": "claim_update", "data": claim_update})
+            for claim_update in claim_updates
+        ]
+        if lines:
+            yield b"\n".join(lines) + b"\n"
 
 
 @app.get("/updates", response_model=ClientUpdate)
-def get_updates(input_update_date: str):
+async def get_updates(
+    request: Request,
+    input_update_date: str,
+    stream: bool = False,
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    """Score and claim updates of the monitored companies on a given date.
+
+    With `stream=true` (or `Accept: application/x-ndjson`), updates are
+    streamed as they are extracted, one JSON object per line:
+    `{"type": "score_update" | "claim_update", "data": {...}}`.
+
+    Updates of past dates are read from their daily snapshot once the
+    `snapshot_updates` job built it, and from the live tables until then.
+    """
     now = datetime.now()
     try:
         update_date = datetime.strptime(input_update_date, "%Y-%m-%d")
@@ -99,54 +473,111 @@ def get_updates(input_update_date: str):
             date=input_update_date,
             message="Wrong date format, enter date in format YYYY-MM-DD",
         )
-    db = PostgresDataSource()
-    pf_manager = SqlPortfolioManager(executor=db)
-    monitored_companies = pf_manager.get_portfolio()
-    score_updates = []
-    claim_updates = []
-    for company in monitored_companies:
-        score_updates.extend(
-            get_score_update(
-                company_id=company.company_id, update_date=update_date, call_date=now
-            )
-        )
-        pf_manager.add_company(
-            company_id=company.company_id,
-            insertion_date=now,
-            order_type=OrderType.SCORE_UPDATES,
+    from_snapshot = is_snapshot_date(
+        update_date=update_date, call_date=now
+    ) and await has_update_snapshot_async(executor=db, update_date=update_date)
+    pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+    portfolio = await pf_manager.get_portfolio()
+    companies = [company.company_id for company in portfolio]
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_client_update(
+                pf_manager=pf_manager,
+                companies=companies,
+                update_date=update_date,
+                call_date=now,
+                from_snapshot=from_snapshot,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
         )
-        claim_updates.extend(
-            get_claim_update(
-                company_id=company.company_id, update_date=update_date, call_date=now
-            )
-        )
-        pf_manager.add_company(
-            company_id=company.company_id,
-            insertion_date=now,
-            order_type=OrderType.CLAIM_UPDATES,
-        )
-    return ClientUpdate(
-        update_date=update_date.isoformat(),
-        score_updates=score_updates,
-        claim_updates=claim_updates,
+    client_update = await get_client_update_async(
+        companies=companies,
+        update_date=update_date,
+        call_date=now,
+        executor=db,
+        from_snapshot=from_snapshot,
+    )
+    await log_orders(
+        pf_manager=pf_manager,
+        orders=build_update_orders(companies=companies, call_date=now),
+    )
+    return json_response(client_update)
+
+
+@app.get("/changes", response_model=ChangeBatch)
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(
+        default=DEFAULT_CHANGES_BATCH_SIZE, ge=1, le=MAX_CHANGES_BATCH_SIZE
+    ),
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    """Score and claim changes of the monitored companies, in load order.
+
+    Start without `since`, then pass the `next_cursor` of the previous batch
+    until `has_more` is false, and keep it to poll for later changes.
+    """
+    now = datetime.now()
+    change_batch, orders = await get_change_batch(
+        executor=db, call_date=now, limit=limit, since=since
     )
+    pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+    await log_orders(pf_manager=pf_manager, orders=orders)
+    return json_response(change_batch)
 
 
 @app.get("/client_portfolio", response_model=List[ClientPortfolioModel])
-def get_portfolio():
-    db = PostgresDataSource()
-    pf_manager = SqlPortfolioManager(executor=db)
-    return pf_manager.get_portfolio()
+async def get_portfolio(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSqlRequestExecutor = Depends(get_async_data_source),
+):
+    """Monitored companies, paginated by portfolio entry when `limit` is set."""
+    pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+    if limit is None and cursor is None:
+        return json_response(await pf_manager.get_portfolio())
+    after_portfolio_entry_id = 0
+    if cursor is not None:
+        [after_portfolio_entry_id] = decode_cursor(cursor, converters=[int])
+    page, next_entry_id = await pf_manager.get_portfolio_page(
+        limit=limit or DEFAULT_PAGE_SIZE,
+        after_portfolio_entry_id=after_portfolio_entry_id,
+    )
+    return paginated_response(
+        request=request,
+        records=page,
+        next_key=None if next_entry_id is None else [next_entry_id],
+    )
 
 
 @app.delete("/delete_company/{company_id}", response_model=MonitoringStatus)
-def delete_company(company_id: str):
-    db = PostgresDataSource()
-    pf_manager = SqlPortfolioManager(executor=db)
-    pf_manager.remove_company(company_id=company_id, removal_date=datetime.now())
+async def delete_company(
+    company_id: str, db: AsyncSqlRequestExecutor = Depends(get_async_data_source)
+):
+    pf_manager = AsyncSqlPortfolioManager(executor=db, index=get_portfolio_index())
+    await pf_manager.remove_company(
+        company_id=company_id, removal_date=datetime.now()
+    )
     return MonitoringStatus(company_id=company_id, monitored=False)
 
 
 @app.get("/hello")
 def hello_world():
     return "Hello World"
+
+
+@app.get("/cache/stats", response_model=Optional[CacheStats])
+async def get_cache_stats():
+    """Hit/miss counters of the history cache, null when it is disabled."""
+    history_cache = get_history_cache()
+    return None if history_cache is None else history_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Query and request metrics in Prometheus text format, when enabled."""
+    metrics = get_api_metrics()
+    if metrics is None:
+        return JSONResponse(status_code=404, content={"message": "Metrics disabled"})
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, time
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from awesome_api.constants import (
+    ENV_VAR_HISTORY_CACHE_ENABLED,
+    ENV_VAR_HISTORY_CACHE_MAX_SIZE,
+    ENV_VAR_HISTORY_CACHE_TTL,
+    ENV_VAR_HISTORY_CACHE_VERSION_CHECK_INTERVAL,
+)
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    CacheConfig,
+    CacheStats,
+    CacheStore,
+    CompanyHistory,
+    SqlRequestExecutor,
+    TransactionalQuery,
+)
+from awesome_api.utils.cache import LruTtlCacheStore
+
+logger = logging.getLogger(__name__)
+
+Rows = Sequence[Mapping[str, Any]]
+
+CACHE_CONFIG_ENV_VARS = {
+    "enabled": ENV_VAR_HISTORY_CACHE_ENABLED,
+    "max_size": ENV_VAR_HISTORY_CACHE_MAX_SIZE,
+    "ttl": ENV_VAR_HISTORY_CACHE_TTL,
+    "version_check_interval": ENV_VAR_HISTORY_CACHE_VERSION_CHECK_INTERVAL,
+}
+
+# Column compared to the cutoff date of each history
+HISTORY_DATE_COLUMNS = {
+    CompanyHistory.SCORES: "score_date",
+    CompanyHistory.CLAIMS: "claim_creation_date",
+}
+
+
+def get_cache_config() -> CacheConfig:
+    """Build the history cache configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in CACHE_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return CacheConfig.model_validate(values)
+
+
+def build_history_cache_version_query() -> TransactionalQuery:
+    query = "SELECT version FROM history_cache_version WHERE id = 1;"
+    return TransactionalQuery(query=query)
+
+
+def build_bump_history_cache_version_query() -> TransactionalQuery:
+    query = "UPDATE history_cache_version SET version = version + 1 WHERE id = 1;"
+    return TransactionalQuery(query=query)
+
+
+async def get_history_cache_version_async(executor: AsyncSqlRequestExecutor) -> int:
+    query = build_history_cache_version_query()
+    rows = await executor.run_select_rows(query=query.query)
+    return rows[0]["version"]
+
+
+def invalidate_history_caches(executor: SqlRequestExecutor) -> None:
+    """Make every API process clear its history cache, to call after a load.
+
+    Processes notice it within their `version_check_interval`.
+    """
+    query = build_bump_history_cache_version_query()
+    executor.run_update_query(query=query.query)
+
+
+class CompanyHistoryCache:
+    """Read-through cache of company score and claim histories.
+
+    Histories are cached per company with rows since the start of the cutoff
+    day, so that every call of the day shares the same entry and gets its
+    exact cutoff applied in memory. Concurrent misses on the same entry
+    share a single database query.
+
+    Once started, the cache reads the version of history_cache_version every
+    `version_check_interval` seconds and is cleared when it changed, so that
+    a load job can invalidate the caches of every API process, see
+    `invalidate_history_caches`.
+    """
+
+    def __init__(
+        self,
+        store: CacheStore,
+        version_check_interval: float = 5.0,
+        version_loader: Optional[Callable[[], Awaitable[int]]] = None,
+    ):
+        self.store: CacheStore = store
+        self.version_check_interval: float = version_check_interval
+        self.version_loader: Optional[Callable[[], Awaitable[int]]] = version_loader
+        self._version: Optional[int] = None
+        self._loading: Dict[str, "asyncio.Future[Rows]"] = {}
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._stopped: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._clears = 0
+
+    @staticmethod
+    def _key(history: CompanyHistory, company_id: str) -> str:
+        return f"{history.value}:{company_id}"
+
+    async def get_rows(
+        self,
+        history: CompanyHistory,
+        company_id: str,
+        cutoff_date: datetime,
+        loader: Callable[[datetime], Awaitable[Rows]],
+    ) -> Rows:
+        """Rows of `history` since `cutoff_date`, `loader` is called on misses."""
+        key = self._key(history=history, company_id=company_id)
+        cutoff_day = datetime.combine(cutoff_date.date(), time.min)
+        entry = self.store.get(key)
+        if entry is not None and entry[0] == cutoff_day:
+            self._hits += 1
+            rows = entry[1]
+        else:
+            self._misses += 1
+            rows = await self._load(key=key, cutoff_day=cutoff_day, loader=loader)
+        date_column = HISTORY_DATE_COLUMNS[history]
+        return [row for row in rows if row[date_column] >= cutoff_date]
+
+    async def _load(
+        self,
+        key: str,
+        cutoff_day: datetime,
+        loader: Callable[[datetime], Awaitable[Rows]],
+    ) -> Rows:
+        loading_key = f"{key}:{cutoff_day.isoformat()}"
+        future = self._loading.get(loading_key)
+        if future is None:
+            generation = self._generation(key)
+            future = asyncio.ensure_future(loader(cutoff_day))
+            self._loading[loading_key] = future
+            try:
+                rows = await asyncio.shield(future)
+            finally:
+                self._loading.pop(loading_key, None)
+            # Do not cache rows loaded before an invalidation of the entry
+            if self._generation(key) == generation:
+                self.store.set(key, (cutoff_day, rows))
+            return rows
+        return await asyncio.shield(future)
+
+    def _generation(self, key: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    def invalidate(
+        self,
+        company_id: str,
+        histories: Iterable[CompanyHistory] = tuple(CompanyHistory),
+    ) -> None:
+        """Drop cached histories of a company, to call when new data is loaded."""
+        for history in histories:
+            key = self._key(history=history, company_id=company_id)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self.store.delete(key)
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self.store.clear()
+        self._clears += 1
+
+    async def check_version(self) -> None:
+        """Clear the cache if the shared version changed since the last check."""
+        assert self.version_loader is not None
+        try:
+            version = await self.version_loader()
+        except Exception as e:
+            logger.error(f"History cache version check failed: {e}")
+            raise
+        if self._version is not None and version != self._version:
+            self.clear()
+        self._version = version
+
+    async def _run(self) -> None:
+        assert self._stopped is not None
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopped.wait(), timeout=self.version_check_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            if self._stopped.is_set():
+                break
+            try:
+                await self.check_version()
+            except Exception:
+                # Already logged, the version is checked again on next run
+                pass
+
+    async def start(self) -> None:
+        """Read the shared version, then check it periodically."""
+        if self._task is None:
+            try:
+                await self.check_version()
+            except Exception:
+                # The database may still be starting, the next check reads it
+                pass
+            self._stopped = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            assert self._stopped is not None
+            self._stopped.set()
+            await self._task
+            self._task = None
+            self._stopped = None
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self.store.evictions,
+            invalidations=self._invalidations,
+            clears=self._clears,
+            size=len(self.store),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_history_cache() -> Optional[CompanyHistoryCache]:
+    """Process-wide history cache, None when caching is disabled."""
+    config = get_cache_config()
+    if not config.enabled:
+        return None
+    store = LruTtlCacheStore(max_size=config.max_size, ttl=config.ttl)
+    return CompanyHistoryCache(
+        store=store, version_check_interval=config.version_check_interval
+    )
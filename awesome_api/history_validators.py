@@ -0,0 +1,103 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+from awesome_api.models import CompanyHistory, HistoryValidator, TransactionalQuery
+
+# Validators are computed on the same rows as the history endpoints, see
+# build_company_scores_query and build_company_claims_query.
+VALIDATOR_QUERIES = {
+    CompanyHistory.SCORES: """
+        SELECT
+        COUNT(*) AS row_count,
+        MIN(score_date) AS first_date,
+        MAX(score_date) AS last_modified
+        FROM company_credit_scores
+        WHERE company_id = :company_id
+        and score_date >= :cutoff_date;
+        """,
+    CompanyHistory.CLAIMS: """
+        SELECT
+        COUNT(*) AS row_count,
+        MIN(claim_creation_date) AS first_date,
+        GREATEST(MAX(claim_creation_date), MAX(last_update_date)) AS last_modified
+        FROM claims
+        WHERE debtor_id = :company_id
+        and claim_creation_date >= :cutoff_date;
+        """,
+}
+
+
+def build_history_validator_query(
+    history: CompanyHistory, company_id: str, cutoff_date: datetime
+) -> TransactionalQuery:
+    params = {"company_id": company_id, "cutoff_date": cutoff_date}
+    return TransactionalQuery(query=VALIDATOR_QUERIES[history], params=params)
+
+
+def get_history_validator(
+    history: CompanyHistory, rows: Sequence[Mapping[str, Any]]
+) -> HistoryValidator:
+    """Validator of already fetched rows, equal to the one of VALIDATOR_QUERIES."""
+    if len(rows) == 0:
+        return HistoryValidator(row_count=0)
+    if history == CompanyHistory.SCORES:
+        dates = [row["score_date"] for row in rows]
+        return HistoryValidator(
+            row_count=len(rows), first_date=min(dates), last_modified=max(dates)
+        )
+    creation_dates = [row["claim_creation_date"] for row in rows]
+    update_dates = [
+        row["last_update_date"] for row in rows if row["last_update_date"] is not None
+    ]
+    return HistoryValidator(
+        row_count=len(rows),
+        first_date=min(creation_dates),
+        last_modified=max(creation_dates + update_dates),
+    )
+
+
+def get_etag(history: CompanyHistory, validator: HistoryValidator) -> str:
+    # Weak, as rows are not ordered the body may differ byte for byte
+    digest = hashlib.sha256(
+        f"{history.value}:{validator.model_dump_json()}".encode()
+    ).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def get_validator_headers(
+    history: CompanyHistory, validator: HistoryValidator
+) -> Dict[str, str]:
+    headers = {"ETag": get_etag(history=history, validator=validator)}
+    if validator.last_modified is not None:
+        # Database dates are stored in UTC, without time zone
+        last_modified = validator.last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(
+    history: CompanyHistory,
+    validator: HistoryValidator,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> bool:
+    """Evaluate conditional request headers, If-None-Match taking precedence."""
+    if if_none_match is not None:
+        etag = get_etag(history=history, validator=validator)
+        client_etags = {
+            client_etag.strip().removeprefix("W/")
+            for client_etag in if_none_match.split(",")
+        }
+        return "*" in client_etags or etag.removeprefix("W/") in client_etags
+    if if_modified_since is None or validator.last_modified is None:
+        return False
+    try:
+        modified_since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if modified_since.tzinfo is None:
+        modified_since = modified_since.replace(tzinfo=timezone.utc)
+    last_modified = validator.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+    return last_modified <= modified_since
@@ -0,0 +1,258 @@
+from typing import Iterable, List, Optional, Set
+
+from awesome_api.models import Migration, SqlRequestExecutor, TransactionalQuery
+
+# Every statement must be idempotent: two concurrent runs may both apply the
+# same pending migration, the second one is then a no-op.
+MIGRATIONS = [
+    Migration(
+        version=1,
+        name="hot_query_indexes",
+        statements=[
+            # /{company_id}/scores and score updates
+            """
+            CREATE INDEX IF NOT EXISTS company_credit_scores_company_date_idx
+                ON company_credit_scores (COMPANY_ID, SCORE_DATE);
+            """,
+            # /{company_id}/claims, ordered by creation date and claim id
+            """
+            CREATE INDEX IF NOT EXISTS claims_debtor_creation_date_idx
+                ON claims (DEBTOR_ID, CLAIM_CREATION_DATE, CLAIM_ID);
+            """,
+            # claim updates
+            """
+            CREATE INDEX IF NOT EXISTS claims_debtor_update_date_idx
+                ON claims (DEBTOR_ID, LAST_UPDATE_DATE);
+            """,
+            # get_company_data
+            """
+            CREATE INDEX IF NOT EXISTS client_portfolio_valid_company_idx
+                ON client_portfolio (COMPANY_ID)
+                WHERE IS_VALID = 1;
+            """,
+            # Already in init_db.sql, only missing on older databases
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS client_portfolio_active_company_idx
+                ON client_portfolio (COMPANY_ID)
+                WHERE VALIDITY_END_DATE IS NULL;
+            """,
+            # /client_portfolio pages
+            """
+            CREATE INDEX IF NOT EXISTS client_portfolio_active_entry_idx
+                ON client_portfolio (PORTFOLIO_ENTRY_ID)
+                WHERE VALIDITY_END_DATE IS NULL;
+            """,
+            "ANALYZE company_credit_scores;",
+            "ANALYZE claims;",
+            "ANALYZE client_portfolio;",
+        ],
+    ),
+    Migration(
+        version=2,
+        name="update_snapshots",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS update_snapshots (
+                UPDATE_DATE DATE PRIMARY KEY,
+                CREATED_AT TIMESTAMP NOT NULL
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS score_update_snapshots (
+                UPDATE_DATE DATE NOT NULL,
+                SCORE_DATE TIMESTAMP NOT NULL,
+                COMPANY_ID VARCHAR(12) NOT NULL,
+                SCORE INT
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS score_update_snapshots_date_company_idx
+                ON score_update_snapshots (UPDATE_DATE, COMPANY_ID);
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS claim_update_snapshots (
+                UPDATE_DATE DATE NOT NULL,
+                CLAIM_ID VARCHAR(20) NOT NULL,
+                CLAIM_CREATION_DATE TIMESTAMP NOT NULL,
+                DEBTOR_ID VARCHAR(12),
+                LAST_UPDATE_DATE TIMESTAMP,
+                INITIAL_CLAIM_AMOUNT INT NOT NULL,
+                CURRENT_CLAIM_AMOUNT INT,
+                PRIMARY KEY (UPDATE_DATE, CLAIM_ID)
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS claim_update_snapshots_date_debtor_idx
+                ON claim_update_snapshots (UPDATE_DATE, DEBTOR_ID);
+            """,
+        ],
+    ),
+    Migration(
+        version=3,
+        name="change_time_indexes",
+        statements=[
+            # /changes, scores and claims in change time order
+            """
+            CREATE INDEX IF NOT EXISTS company_credit_scores_date_company_idx
+                ON company_credit_scores (SCORE_DATE, COMPANY_ID);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS claims_update_date_idx
+                ON claims (LAST_UPDATE_DATE, CLAIM_ID);
+            """,
+        ],
+    ),
+    Migration(
+        version=4,
+        name="hashed_claim_ids",
+        statements=[
+            # Same value as claims_management.hash_claim_id, backslashes are
+            # escaped as the text to bytea cast reads escape sequences.
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS HASHED_CLAIM_ID CHAR(64)
+            GENERATED ALWAYS AS (
+                encode(sha256(replace(CLAIM_ID, '\\', '\\\\')::bytea), 'hex')
+            ) STORED;
+            """
+            for table in ["claims", "claim_update_snapshots"]
+        ],
+    ),
+    Migration(
+        version=5,
+        name="history_cache_version",
+        statements=[
+            # Bumped by the load job, API workers clear their history cache
+            # when it changes
+            """
+            CREATE TABLE IF NOT EXISTS history_cache_version (
+                ID INT PRIMARY KEY CHECK (ID = 1),
+                VERSION BIGINT NOT NULL
+            );
+            """,
+            """
+            INSERT INTO history_cache_version (ID, VERSION)
+            VALUES (1, 0)
+            ON CONFLICT (ID) DO NOTHING;
+            """,
+        ],
+    ),
+    Migration(
+        version=6,
+        name="score_ids",
+        statements=[
+            # Tiebreaker of score pages, scores have no natural key
+            """
+            ALTER TABLE company_credit_scores
+            ADD COLUMN IF NOT EXISTS SCORE_ID BIGINT
+            GENERATED ALWAYS AS IDENTITY PRIMARY KEY;
+            """,
+        ],
+    ),
+    Migration(
+        version=7,
+        name="change_ids",
+        statements=[
+            # /changes, scores and claims in load order: rows get the next
+            # change id when inserted or updated, whatever their dates
+            "CREATE SEQUENCE IF NOT EXISTS change_ids;",
+            """
+            CREATE OR REPLACE FUNCTION set_change_id() RETURNS TRIGGER AS $$
+            BEGIN
+                NEW.CHANGE_ID := nextval('change_ids');
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+        ]
+        + [
+            statement
+            for table in ["company_credit_scores", "claims"]
+            for statement in [
+                f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS CHANGE_ID BIGINT NOT NULL
+                DEFAULT nextval('change_ids');
+                """,
+                f"DROP TRIGGER IF EXISTS {table}_change_id ON {table};",
+                f"""
+                CREATE TRIGGER {table}_change_id
+                BEFORE UPDATE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION set_change_id();
+                """,
+                f"""
+                CREATE INDEX IF NOT EXISTS {table}_change_idx
+                    ON {table} (CHANGE_ID);
+                """,
+            ]
+        ],
+    ),
+]
+
+
+def _build_create_migrations_table_query() -> TransactionalQuery:
+    query = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        VERSION INT PRIMARY KEY,
+        NAME VARCHAR(100) NOT NULL,
+        APPLIED_AT TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    """
+    return TransactionalQuery(query=query)
+
+
+def _build_record_migration_query(migration: Migration) -> TransactionalQuery:
+    query = """
+    INSERT INTO schema_migrations (VERSION, NAME)
+    VALUES (:version, :name)
+    ON CONFLICT (VERSION) DO NOTHING;
+    """
+    params = {"version": migration.version, "name": migration.name}
+    return TransactionalQuery(query=query, params=params)
+
+
+def get_applied_versions(executor: SqlRequestExecutor) -> Set[int]:
+    rows = executor.run_select_rows(query="SELECT version FROM schema_migrations;")
+    return {row["version"] for row in rows}
+
+
+def get_pending_migrations(
+    migrations: Iterable[Migration],
+    applied_versions: Set[int],
+    target_version: Optional[int] = None,
+) -> List[Migration]:
+    """Not yet applied migrations up to `target_version`, in version order."""
+    return sorted(
+        (
+            migration
+            for migration in migrations
+            if migration.version not in applied_versions
+            and (target_version is None or migration.version <= target_version)
+        ),
+        key=lambda migration: migration.version,
+    )
+
+
+def apply_migrations(
+    executor: SqlRequestExecutor,
+    target_version: Optional[int] = None,
+    migrations: Iterable[Migration] = MIGRATIONS,
+) -> List[Migration]:
+    """Apply pending migrations, each one in its own transaction.
+
+    Returns the applied migrations.
+    """
+    create_table_query = _build_create_migrations_table_query()
+    executor.run_update_query(query=create_table_query.query)
+    pending_migrations = get_pending_migrations(
+        migrations=migrations,
+        applied_versions=get_applied_versions(executor=executor),
+        target_version=target_version,
+    )
+    for migration in pending_migrations:
+        queries = [
+            TransactionalQuery(query=statement) for statement in migration.statements
+        ]
+        queries.append(_build_record_migration_query(migration=migration))
+        executor.run_queries_in_one_transaction(queries=queries)
+    return pending_migrations
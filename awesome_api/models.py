@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
 from pandas import DataFrame
 from pydantic import BaseModel, Field
@@ -28,6 +28,128 @@ class TransactionalQuery(BaseModel):
     params: Optional[Dict[str, Any]] = None
 
 
+class PoolConfig(BaseModel):
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    warm_up: bool = True
+
+
+class WriteBehindConfig(BaseModel):
+    enabled: bool = False
+    batch_size: int = 500
+    flush_interval: float = 1.0
+    max_pending: int = 100000  # orders buffered before new ones are dropped
+
+
+class OrderBufferStats(BaseModel):
+    queue_depth: int
+    flush_count: int
+    failed_flush_count: int
+    flushed_orders: int
+    dropped_orders: int
+    last_flush_seconds: float
+    max_flush_seconds: float
+    total_flush_seconds: float
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = False
+    max_size: int = 10000
+    ttl: float = 300.0
+    version_check_interval: float = 5.0  # seconds
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    clears: int
+    size: int
+
+
+class PortfolioIndexConfig(BaseModel):
+    enabled: bool = False
+    reconcile_interval: float = 60.0  # seconds
+
+
+class PortfolioIndexStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    reconcile_count: int
+    failed_reconcile_count: int
+    last_reconcile_drift: int  # entries added or removed by the last reconcile
+
+
+class ConsoleConfig(BaseModel):
+    database_url: Optional[str] = None  # defaults to the API database
+    max_rows: int = 10000
+    statement_timeout: float = 10.0  # seconds
+    chunk_size: int = 1000
+    pool_size: int = 2
+    cache_ttl: float = 300.0
+    cache_max_size: int = 50
+
+
+class MetricsConfig(BaseModel):
+    enabled: bool = False
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool = False
+    sample_rate: float = 0.0  # share of requests profiled without header
+    interval: float = 0.001  # seconds between two stack samples
+    output_dir: str = "profiles"
+
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    seconds: float
+    samples: int
+    hot_paths: Dict[str, float]  # share of samples in each hot path
+    packages: Dict[str, float]  # share of samples by package of the leaf frame
+
+
+class QueryEvent(BaseModel):
+    method: str  # executor method, e.g. run_select_rows
+    label: str  # statement type and first table, e.g. "select claims"
+    seconds: float  # connection wait included
+    connection_wait_seconds: float
+    rows: int
+    bytes: int  # estimated size of the returned rows
+    failed: bool = False
+
+
+class HistoryValidator(BaseModel):
+    """Cheap summary of a company history, changing whenever its rows do."""
+
+    row_count: int
+    first_date: Optional[datetime] = None
+    last_modified: Optional[datetime] = None
+
+
+class Migration(BaseModel):
+    version: int
+    name: str
+    statements: List[str]
+
+
+class QueryPlanReport(BaseModel):
+    name: str
+    expected_indexes: List[str]
+    used_indexes: List[str]
+
+    @property
+    def uses_expected_index(self) -> bool:
+        return any(index in self.used_indexes for index in self.expected_indexes)
+
+
 class OrderType(Enum):
     SCORES = "scores"
     CLAIMS = "claims"
@@ -35,6 +157,11 @@ class OrderType(Enum):
     CLAIM_UPDATES = "claim_updates"
 
 
+class CompanyHistory(Enum):
+    SCORES = "scores"
+    CLAIMS = "claims"
+
+
 class ClaimStatus(Enum):
     SETTLED = "settled"
     PARTIALLY_SETTLED = "partially_settled"
@@ -64,21 +191,56 @@ class ClientOrder(BaseModel):
     order_date: datetime
 
 
+class ChangeType(Enum):
+    SCORE_UPDATE = "score_update"
+    CLAIM_UPDATE = "claim_update"
+
+
+class Change(BaseModel):
+    type: ChangeType
+    data: Union[ScoreModel, ClaimInfo]
+
+
+class ChangeBatch(BaseModel):
+    changes: List[Change] = Field(default_factory=list)
+    next_cursor: str
+    has_more: bool
+
+
 class ClientUpdate(BaseModel):
     update_date: str
     score_updates: List[ScoreModel] = Field(default_factory=list)
     claim_updates: List[ClaimInfo] = Field(default_factory=list)
 
 
+class QueryObserver(ABC):
+    """Instrumentation hook called by executors after each of their queries."""
+
+    @abstractmethod
+    def observe_query(self, event: QueryEvent) -> None:
+        pass
+
+
 class SqlRequestExecutor(ABC):
     """Abstract class for data source connection and querying."""
 
+    # SQL dialect of the queries, for the few ones without a portable form
+    dialect: str = "postgresql"
+    # Set to instrument the queries, they are not observed otherwise
+    observer: Optional[QueryObserver] = None
+
     @abstractmethod
     def run_select_query(
         self, query: str, params: Optional[Dict[str, Any]] = None
     ) -> DataFrame:
         """Run a SELECT query and return the results."""
 
+    @abstractmethod
+    def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        """Run a SELECT query and return its rows, without building a DataFrame."""
+
     @abstractmethod
     def run_insert_query(
         self, query: str, params: Optional[Dict[str, Any]] = None
@@ -96,6 +258,82 @@ class SqlRequestExecutor(ABC):
         """"""
 
 
+class AsyncSqlRequestExecutor(ABC):
+    """Abstract class for asynchronous data source connection and querying."""
+
+    dialect: str = "postgresql"
+    observer: Optional[QueryObserver] = None
+
+    @abstractmethod
+    async def run_select_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> DataFrame:
+        """Run a SELECT query and return the results."""
+
+    @abstractmethod
+    async def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        """Run a SELECT query and return its rows, without building a DataFrame."""
+
+    @abstractmethod
+    async def run_insert_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """"""
+
+    @abstractmethod
+    async def run_update_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """"""
+
+    @abstractmethod
+    async def run_queries_in_one_transaction(
+        self, queries: List[TransactionalQuery]
+    ) -> None:
+        """"""
+
+    async def warm_up(self) -> None:
+        """Open connections ahead of the first queries, for pooled executors."""
+
+    async def dispose(self) -> None:
+        """Close pooled connections, at application shutdown."""
+
+
+class CacheStore(ABC):
+    """Key-value store behind the read-through caches.
+
+    Implementations decide on eviction and expiration, `get` returns None for
+    missing or expired keys.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @property
+    @abstractmethod
+    def evictions(self) -> int:
+        pass
+
+
 class PortfolioManager(ABC):
     @abstractmethod
     def add_company(
@@ -116,6 +354,49 @@ class PortfolioManager(ABC):
     ) -> List[ClientPortfolioModel]:
         """"""
 
+    @abstractmethod
+    def get_portfolio_page(
+        self, limit: int, after_portfolio_entry_id: int = 0
+    ) -> Tuple[List[ClientPortfolioModel], Optional[int]]:
+        """Active entries after `after_portfolio_entry_id`, ordered by entry id.
+
+        Also returns the entry id to resume from, None on the last page.
+        """
+
     @abstractmethod
     def add_orders(self, orders: List[ClientOrder]):
         pass
+
+
+class AsyncPortfolioManager(ABC):
+    @abstractmethod
+    async def add_company(
+        self,
+        company_id: str,
+        insertion_date: datetime,
+        order_type: Optional[OrderType] = None,
+    ) -> None:
+        """"""
+
+    @abstractmethod
+    async def remove_company(self, company_id: str, removal_date: datetime) -> None:
+        """"""
+
+    @abstractmethod
+    async def get_portfolio(
+        self, only_active_companies: bool = True
+    ) -> List[ClientPortfolioModel]:
+        """"""
+
+    @abstractmethod
+    async def get_portfolio_page(
+        self, limit: int, after_portfolio_entry_id: int = 0
+    ) -> Tuple[List[ClientPortfolioModel], Optional[int]]:
+        """Active entries after `after_portfolio_entry_id`, ordered by entry id.
+
+        Also returns the entry id to resume from, None on the last page.
+        """
+
+    @abstractmethod
+    async def add_orders(self, orders: List[ClientOrder]):
+        pass
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from awesome_api.constants import (
+    ENV_VAR_ORDER_WRITE_BEHIND_BATCH_SIZE,
+    ENV_VAR_ORDER_WRITE_BEHIND_ENABLED,
+    ENV_VAR_ORDER_WRITE_BEHIND_FLUSH_INTERVAL,
+    ENV_VAR_ORDER_WRITE_BEHIND_MAX_PENDING,
+)
+from awesome_api.models import (
+    AsyncPortfolioManager,
+    ClientOrder,
+    OrderBufferStats,
+    WriteBehindConfig,
+)
+from awesome_api.portfolio_management import AsyncSqlPortfolioManager
+from awesome_api.utils.postgres_utils import get_async_data_source
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_CONFIG_ENV_VARS = {
+    "enabled": ENV_VAR_ORDER_WRITE_BEHIND_ENABLED,
+    "batch_size": ENV_VAR_ORDER_WRITE_BEHIND_BATCH_SIZE,
+    "flush_interval": ENV_VAR_ORDER_WRITE_BEHIND_FLUSH_INTERVAL,
+    "max_pending": ENV_VAR_ORDER_WRITE_BEHIND_MAX_PENDING,
+}
+
+
+def get_write_behind_config() -> WriteBehindConfig:
+    """Build the order write-behind configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in WRITE_BEHIND_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return WriteBehindConfig.model_validate(values)
+
+
+class OrderWriteBehindBuffer:
+    """Collect client orders in memory and write them in batches via add_orders.
+
+    A batch is flushed as soon as `batch_size` orders are pending, or every
+    `flush_interval` seconds otherwise. Orders of a failed flush are put back
+    in front of the queue and retried on the next flush. `stop` flushes
+    whatever is left, so a graceful shutdown does not lose any order while
+    the database is available.
+
+    At most `max_pending` orders are kept: while flushes fail, orders
+    recorded beyond it are dropped and counted, so that a database outage
+    cannot exhaust the memory.
+    """
+
+    def __init__(self, pf_manager: AsyncPortfolioManager, config: WriteBehindConfig):
+        self.pf_manager: AsyncPortfolioManager = pf_manager
+        self.config: WriteBehindConfig = config
+        self._pending: List[ClientOrder] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._flush_count = 0
+        self._failed_flush_count = 0
+        self._flushed_orders = 0
+        self._dropped_orders = 0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def record(self, orders: List[ClientOrder]) -> None:
+        free_slots = max(self.config.max_pending - len(self._pending), 0)
+        if len(orders) > free_slots:
+            self._drop(orders=orders[free_slots:], reason="the buffer is full")
+            orders = orders[:free_slots]
+        self._pending.extend(orders)
+        if (
+            self._flush_requested is not None
+            and len(self._pending) >= self.config.batch_size
+        ):
+            self._flush_requested.set()
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[: self.config.batch_size]
+                del self._pending[: self.config.batch_size]
+                start = time.perf_counter()
+                try:
+                    await self.pf_manager.add_orders(orders=batch)
+                except Exception as e:
+                    self._pending[:0] = batch
+                    self._failed_flush_count += 1
+                    logger.error(f"Flush of {len(batch)} client orders failed: {e}")
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start
+                    self._last_flush_seconds = elapsed
+                    self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                    self._total_flush_seconds += elapsed
+                self._flush_count += 1
+                self._flushed_orders += len(batch)
+
+    def _drop(self, orders: List[ClientOrder], reason: str) -> None:
+        self._dropped_orders += len(orders)
+        logger.error(
+            f"Dropped {len(orders)} client orders as {reason}: "
+            + ", ".join(
+                f"{order.company_id} {order.order_type.value} "
+                f"{order.order_date.isoformat()}"
+                for order in orders
+            )
+        )
+
+    async def _run(self) -> None:
+        assert self._flush_requested is not None
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), timeout=self.config.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged, the orders are retried on the next flush
+                pass
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._flush_requested = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            assert self._flush_requested is not None
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+            self._flush_requested = None
+        try:
+            await self.flush()
+        except Exception:
+            # Nothing retries them once stopped
+            self._drop(orders=self._pending, reason="the final flush failed")
+            self._pending = []
+            raise
+        finally:
+            self._flush_lock = None
+
+    def stats(self) -> OrderBufferStats:
+        return OrderBufferStats(
+            queue_depth=self.queue_depth,
+            flush_count=self._flush_count,
+            failed_flush_count=self._failed_flush_count,
+            flushed_orders=self._flushed_orders,
+            dropped_orders=self._dropped_orders,
+            last_flush_seconds=self._last_flush_seconds,
+            max_flush_seconds=self._max_flush_seconds,
+            total_flush_seconds=self._total_flush_seconds,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_order_buffer() -> Optional[OrderWriteBehindBuffer]:
+    """Process-wide order buffer, None when write-behind is disabled."""
+    config = get_write_behind_config()
+    if not config.enabled:
+        return None
+    pf_manager = AsyncSqlPortfolioManager(executor=get_async_data_source())
+    return OrderWriteBehindBuffer(pf_manager=pf_manager, config=config)
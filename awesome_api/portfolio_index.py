@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from awesome_api.constants import (
+    ENV_VAR_PORTFOLIO_INDEX_ENABLED,
+    ENV_VAR_PORTFOLIO_INDEX_RECONCILE_INTERVAL,
+)
+from awesome_api.models import (
+    ClientPortfolioModel,
+    PortfolioIndexConfig,
+    PortfolioIndexStats,
+)
+
+logger = logging.getLogger(__name__)
+
+Rows = Sequence[Mapping[str, Any]]
+
+PORTFOLIO_INDEX_CONFIG_ENV_VARS = {
+    "enabled": ENV_VAR_PORTFOLIO_INDEX_ENABLED,
+    "reconcile_interval": ENV_VAR_PORTFOLIO_INDEX_RECONCILE_INTERVAL,
+}
+
+
+def get_portfolio_index_config() -> PortfolioIndexConfig:
+    """Build the active portfolio index configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in PORTFOLIO_INDEX_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return PortfolioIndexConfig.model_validate(values)
+
+
+class PortfolioIndexEntry(NamedTuple):
+    portfolio_entry_id: int
+    validity_start_date: datetime
+
+
+class ActivePortfolioIndex:
+    """In-process copy of the active entries of client_portfolio, by company.
+
+    The index is loaded by `start`, kept up to date by the portfolio manager
+    on add_company and remove_company, and reconciled with the table every
+    `reconcile_interval` seconds, which also picks up changes made by other
+    processes. Until its first load succeeds, it knows no company, so that
+    callers fall back to the database.
+
+    Companies stopped by another process stay in the index until the next
+    reconcile, and are not monitored again by requests in between: only one
+    process should add and remove companies while the index is enabled.
+    """
+
+    def __init__(
+        self,
+        config: PortfolioIndexConfig,
+        loader: Optional[Callable[[], Awaitable[Rows]]] = None,
+    ):
+        self.config: PortfolioIndexConfig = config
+        # Rows of the active entries, with company_id, validity_start_date and
+        # portfolio_entry_id columns
+        self.loader: Optional[Callable[[], Awaitable[Rows]]] = loader
+        self._entries: Dict[str, PortfolioIndexEntry] = {}
+        self._portfolio: Optional[List[ClientPortfolioModel]] = None
+        self._loaded = False
+        # Companies changed while a reconcile reads the table
+        self._changed_companies: Optional[Set[str]] = None
+        # Removals of each company, see `generation`
+        self._generations: Dict[str, int] = {}
+        self._stopped: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._hits = 0
+        self._misses = 0
+        self._reconcile_count = 0
+        self._failed_reconcile_count = 0
+        self._last_reconcile_drift = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self, company_id: str) -> Optional[PortfolioIndexEntry]:
+        """Active entry of a company, None if not monitored or not loaded yet."""
+        entry = self._entries.get(company_id) if self._loaded else None
+        if entry is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return entry
+
+    def generation(self, company_id: str) -> int:
+        """Number of removals of a company, to read before querying its entry."""
+        return self._generations.get(company_id, 0)
+
+    def add(self, row: Mapping[str, Any], generation: Optional[int] = None) -> bool:
+        """Record the active entry of a company, read back after add_company.
+
+        The entry is not recorded, and False is returned, if the company was
+        removed since its `generation` was read: the row may predate it.
+        """
+        company_id = row["company_id"]
+        if generation is not None and generation != self.generation(company_id):
+            return False
+        self._entries[company_id] = PortfolioIndexEntry(
+            portfolio_entry_id=row["portfolio_entry_id"],
+            validity_start_date=row["validity_start_date"],
+        )
+        self._changed(company_id)
+        return True
+
+    def remove(self, company_id: str) -> None:
+        self._entries.pop(company_id, None)
+        self._generations[company_id] = self.generation(company_id) + 1
+        self._changed(company_id)
+
+    def _changed(self, company_id: str) -> None:
+        self._portfolio = None
+        if self._changed_companies is not None:
+            self._changed_companies.add(company_id)
+
+    def portfolio(self) -> List[ClientPortfolioModel]:
+        """Active entries by portfolio entry, as returned by get_portfolio."""
+        if self._portfolio is None:
+            entries = sorted(
+                self._entries.items(), key=lambda item: item[1].portfolio_entry_id
+            )
+            self._portfolio = [
+                ClientPortfolioModel(
+                    company_id=company_id,
+                    validity_start_date=entry.validity_start_date.isoformat(),
+                )
+                for company_id, entry in entries
+            ]
+        return self._portfolio
+
+    async def reconcile(self) -> None:
+        """Replace the entries by the active ones of the table.
+
+        Companies added or removed while the table is read keep their entry
+        of the index, as the rows read may predate the change.
+        """
+        assert self.loader is not None
+        self._changed_companies = set()
+        try:
+            rows = await self.loader()
+        except Exception as e:
+            self._failed_reconcile_count += 1
+            logger.error(f"Reconcile of the active portfolio index failed: {e}")
+            raise
+        else:
+            entries = {
+                row["company_id"]: PortfolioIndexEntry(
+                    portfolio_entry_id=row["portfolio_entry_id"],
+                    validity_start_date=row["validity_start_date"],
+                )
+                for row in rows
+            }
+            for company_id in self._changed_companies:
+                entry = self._entries.get(company_id)
+                if entry is None:
+                    entries.pop(company_id, None)
+                else:
+                    entries[company_id] = entry
+            self._last_reconcile_drift = (
+                len(entries.keys() - self._entries.keys())
+                + len(self._entries.keys() - entries.keys())
+                if self._loaded
+                else 0
+            )
+            self._entries = entries
+            self._portfolio = None
+            self._loaded = True
+            self._reconcile_count += 1
+        finally:
+            self._changed_companies = None
+
+    async def _run(self) -> None:
+        assert self._stopped is not None
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopped.wait(), timeout=self.config.reconcile_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            if self._stopped.is_set():
+                break
+            try:
+                await self.reconcile()
+            except Exception:
+                # Already logged, the index is reconciled again on next run
+                pass
+
+    async def start(self) -> None:
+        """Load the index, then reconcile it periodically."""
+        if self._task is None:
+            try:
+                await self.reconcile()
+            except Exception:
+                # The database may still be starting, the next reconcile loads it
+                pass
+            self._stopped = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            assert self._stopped is not None
+            self._stopped.set()
+            await self._task
+            self._task = None
+            self._stopped = None
+
+    def stats(self) -> PortfolioIndexStats:
+        return PortfolioIndexStats(
+            size=len(self._entries),
+            hits=self._hits,
+            misses=self._misses,
+            reconcile_count=self._reconcile_count,
+            failed_reconcile_count=self._failed_reconcile_count,
+            last_reconcile_drift=self._last_reconcile_drift,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_portfolio_index() -> Optional[ActivePortfolioIndex]:
+    """Process-wide active portfolio index, None when it is disabled."""
+    config = get_portfolio_index_config()
+    if not config.enabled:
+        return None
+    return ActivePortfolioIndex(config=config)
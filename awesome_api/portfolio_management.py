@@ -1,18 +1,29 @@
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
-import pandas as pd
 from pandas import DataFrame
+from pydantic import TypeAdapter
 
-from awesome_api.errors import MultipleMonitoringError
+from awesome_api.constants import MAX_CHUNK_SIZE
 from awesome_api.models import (
+    AsyncPortfolioManager,
+    AsyncSqlRequestExecutor,
     ClientOrder,
     ClientPortfolioModel,
     OrderType,
     PortfolioManager,
     TransactionalQuery,
 )
+from awesome_api.portfolio_index import ActivePortfolioIndex
+from awesome_api.utils.parallel_extraction import values_chunker
 from awesome_api.utils.postgres_utils import SqlRequestExecutor
+from awesome_api.utils.sql_utils import (
+    generate_rows_param_dict,
+    named_query,
+    parametrized_values_clause,
+)
+
+PORTFOLIO_ADAPTER = TypeAdapter(List[ClientPortfolioModel])
 
 
 class SqlPortfolioManager(PortfolioManager):
@@ -21,75 +32,210 @@ class SqlPortfolioManager(PortfolioManager):
         self.executor: SqlRequestExecutor = executor
 
     @staticmethod
-    def _build_insert_company_query(
-        company_id: str, insertion_date: datetime
+    def _build_monitor_company_query(
+        company_id: str, insertion_date: datetime, order_type: Optional[OrderType]
     ) -> TransactionalQuery:
-        query = """
-        INSERT INTO client_portfolio (company_id, validity_start_date, is_valid)
-         Values (:company_id, :insertion_date, :is_valid);
+        """Monitor a company (or renew a stopped monitoring) and log the order.
+
+        The insertion relies on the unique index of active portfolio entries:
+        an already monitored company is left untouched, otherwise a new entry
+        is created and the previous one, if any, is flagged as not valid.
         """
-        params = {
+        query = """
+        WITH inserted_entry AS (
+            INSERT INTO client_portfolio (company_id, validity_start_date, is_valid)
+            VALUES (:company_id, :insertion_date, 1)
+            ON CONFLICT (company_id) WHERE validity_end_date IS NULL DO NOTHING
+            RETURNING portfolio_entry_id
+        )"""
+        invalidation_query = """
+        UPDATE client_portfolio
+        SET
+            is_valid = 0
+        WHERE
+            company_id = :company_id
+            AND is_valid = 1
+            AND validity_end_date IS NOT NULL
+            AND EXISTS (SELECT 1 FROM inserted_entry)"""
+        params: Dict[str, Any] = {
             "company_id": company_id,
             "insertion_date": insertion_date,
-            "is_valid": 1,
         }
-        return TransactionalQuery(query=query, params=params)
+        if order_type is None:
+            query += invalidation_query + ";"
+            name = "monitor_company"
+        else:
+            query += f"""
+        , invalidated_entry AS ({invalidation_query}
+        )
+        INSERT INTO client_orders (COMPANY_ID, ORDER_DATE, ORDER_TYPE)
+        VALUES (:company_id, :insertion_date, :order_type);"""
+            params["order_type"] = order_type.value
+            name = "monitor_company_with_order"
+        return TransactionalQuery(query=named_query(name, query), params=params)
 
     @staticmethod
-    def _build_insert_order_query(order: ClientOrder) -> TransactionalQuery:
-        query = """
+    def _build_insert_orders_query(
+        orders: List[ClientOrder], dialect: str = "postgresql"
+    ) -> TransactionalQuery:
+        if dialect == "postgresql":
+            # One array per column: the same statement for any number of orders
+            query = """
+            INSERT INTO client_orders (COMPANY_ID, ORDER_DATE, ORDER_TYPE)
+            SELECT * FROM unnest(
+                CAST(:company_ids AS VARCHAR[]),
+                CAST(:order_dates AS TIMESTAMP[]),
+                CAST(:order_types AS VARCHAR[])
+            );
+            """
+            params = {
+                "company_ids": [order.company_id for order in orders],
+                "order_dates": [order.order_date for order in orders],
+                "order_types": [order.order_type.value for order in orders],
+            }
+            return TransactionalQuery(
+                query=named_query("insert_client_orders", query), params=params
+            )
+        prefix = "order"
+        columns = ["company_id", "order_date", "order_type"]
+        values_clause = parametrized_values_clause(
+            size=len(orders), columns=columns, prefix=prefix
+        )
+        query = f"""
         INSERT INTO client_orders (COMPANY_ID, ORDER_DATE, ORDER_TYPE)
-         Values (:company_id, :order_date, :order_type);
+        {values_clause};
         """
-        params = {
-            "company_id": order.company_id,
-            "order_date": order.order_date,
-            "order_type": order.order_type.value,
-        }
+        params = generate_rows_param_dict(
+            rows=[
+                {
+                    "company_id": order.company_id,
+                    "order_date": order.order_date,
+                    "order_type": order.order_type.value,
+                }
+                for order in orders
+            ],
+            prefix=prefix,
+        )
         return TransactionalQuery(query=query, params=params)
 
     @staticmethod
     def _build_stop_monitoring_query(
-        end_date: datetime, portfolio_entry_id: Any
+        company_id: str, end_date: datetime
     ) -> TransactionalQuery:
         query = """
         UPDATE client_portfolio
         SET
             validity_end_date = :end_date
         WHERE
-            portfolio_entry_id = :portfolio_entry_id;
+            company_id = :company_id
+            AND is_valid = 1
+            AND validity_end_date IS NULL;
         """
         params = {
+            "company_id": company_id,
             "end_date": end_date,
-            "portfolio_entry_id": portfolio_entry_id,
         }
-        return TransactionalQuery(query=query, params=params)
+        return TransactionalQuery(
+            query=named_query("stop_monitoring_company", query), params=params
+        )
 
     @staticmethod
-    def _build_change_last_valid_monitoring_query(
-        portfolio_entry_id: Any,
+    def _build_company_data_query(company_id: str) -> TransactionalQuery:
+        query = """
+        SELECT * FROM client_portfolio
+        WHERE company_id = :company_id
+        AND is_valid = 1;
+        """
+        params = {"company_id": company_id}
+        return TransactionalQuery(
+            query=named_query("company_portfolio_entries", query), params=params
+        )
+
+    @staticmethod
+    def _build_active_entry_query(company_id: str) -> TransactionalQuery:
+        query = """
+        SELECT company_id, validity_start_date, portfolio_entry_id
+        FROM client_portfolio
+        WHERE company_id = :company_id
+        AND validity_end_date IS NULL;
+        """
+        params = {"company_id": company_id}
+        return TransactionalQuery(
+            query=named_query("active_portfolio_entry", query), params=params
+        )
+
+    @staticmethod
+    def _build_portfolio_query() -> TransactionalQuery:
+        query = "select * from client_portfolio where validity_end_date is null;"
+        return TransactionalQuery(query=named_query("active_portfolio", query))
+
+    @staticmethod
+    def _build_portfolio_page_query(
+        limit: int, after_portfolio_entry_id: int
     ) -> TransactionalQuery:
+        # One extra row tells whether there is a next page
         query = """
-        UPDATE client_portfolio
-        SET
-            IS_VALID = :is_valid
-        WHERE
-            portfolio_entry_id = :portfolio_entry_id;
+        SELECT company_id, validity_start_date, portfolio_entry_id
+        FROM client_portfolio
+        WHERE validity_end_date IS NULL
+        AND portfolio_entry_id > :after_portfolio_entry_id
+        ORDER BY portfolio_entry_id
+        LIMIT :limit;
         """
         params = {
-            "is_valid": 0,
-            "portfolio_entry_id": portfolio_entry_id,
+            "after_portfolio_entry_id": after_portfolio_entry_id,
+            "limit": limit + 1,
         }
-        return TransactionalQuery(query=query, params=params)
+        return TransactionalQuery(
+            query=named_query("active_portfolio_page", query), params=params
+        )
+
+    @classmethod
+    def _to_portfolio_page(
+        cls, rows: Sequence[Mapping[str, Any]], limit: int
+    ) -> Tuple[List[ClientPortfolioModel], Optional[int]]:
+        page = PORTFOLIO_ADAPTER.validate_python(
+            cls._to_portfolio_records(rows[:limit])
+        )
+        if len(rows) > limit:
+            return page, rows[limit - 1]["portfolio_entry_id"]
+        return page, None
+
+    @classmethod
+    def _build_add_orders_queries(
+        cls, orders: List[ClientOrder], dialect: str = "postgresql"
+    ) -> List[TransactionalQuery]:
+        return [
+            cls._build_insert_orders_query(orders=list(chunk), dialect=dialect)
+            for chunk in values_chunker(values=orders, chunk_size=MAX_CHUNK_SIZE)
+        ]
+
+    @staticmethod
+    def _to_portfolio_records(
+        rows: Iterable[Mapping[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                "company_id": row["company_id"],
+                "validity_start_date": row["validity_start_date"].isoformat(),
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _to_portfolio_models(df: DataFrame) -> List[ClientPortfolioModel]:
+        for col in ["validity_start_date"]:
+            df[col] = df[col].apply(lambda x: x.isoformat())
+        return [
+            ClientPortfolioModel.model_validate(record)
+            for record in df.to_dict("records")
+        ]
 
     def get_company_data(self, company_id: str) -> DataFrame:
-        params = {"company_id": company_id}
-        query = """
-        SELECT * FROM client_portfolio
-        WHERE company_id = :company_id
-        AND is_valid = 1;
-        """
-        return self.executor.run_select_query(query=query, params=params)
+        company_data_query = self._build_company_data_query(company_id=company_id)
+        return self.executor.run_select_query(
+            query=company_data_query.query, params=company_data_query.params
+        )
 
     def add_company(
         self,
@@ -97,74 +243,140 @@ class SqlPortfolioManager(PortfolioManager):
         insertion_date: datetime,
         order_type: Optional[OrderType] = None,
     ) -> None:
-        df = self.get_company_data(company_id=company_id)
+        query = self._build_monitor_company_query(
+            company_id=company_id, insertion_date=insertion_date, order_type=order_type
+        )
+        self.executor.run_queries_in_one_transaction(queries=[query])
 
-        if len(df) > 1:
-            raise MultipleMonitoringError(
-                company_id=company_id, number_of_records=len(df)
-            )
+    def remove_company(self, company_id: str, removal_date: datetime) -> None:
+        query = self._build_stop_monitoring_query(
+            company_id=company_id, end_date=removal_date
+        )
+        self.executor.run_update_query(query=query.query, params=query.params)
 
-        if order_type is None:
-            queries: List[TransactionalQuery] = []
-        else:
-            queries = [
-                self._build_insert_order_query(
-                    order=ClientOrder(
-                        company_id=company_id,
-                        order_type=order_type,
-                        order_date=insertion_date,
-                    )
-                )
-            ]
+    def add_orders(self, orders: List[ClientOrder]):
+        if len(orders) == 0:
+            return
+        queries = self._build_add_orders_queries(
+            orders=orders, dialect=self.executor.dialect
+        )
+        self.executor.run_queries_in_one_transaction(queries=queries)
 
-        if len(df) == 0:
-            queries.append(
-                self._build_insert_company_query(
-                    company_id=company_id, insertion_date=insertion_date
-                )
-            )
-        else:
-            if not pd.isnull(df["validity_end_date"].iloc[0]):
-                queries += [
-                    self._build_change_last_valid_monitoring_query(
-                        portfolio_entry_id=df["portfolio_entry_id"].iloc[0]
-                    ),
-                    self._build_insert_company_query(
-                        company_id=company_id, insertion_date=insertion_date
-                    ),
-                ]
+    def get_portfolio(
+        self, only_active_companies: bool = True
+    ) -> List[ClientPortfolioModel]:
+        portfolio_query = self._build_portfolio_query()
+        df = self.executor.run_select_query(query=portfolio_query.query)
+        return self._to_portfolio_models(df)
 
-        self.executor.run_queries_in_one_transaction(queries=queries)
+    def get_portfolio_page(
+        self, limit: int, after_portfolio_entry_id: int = 0
+    ) -> Tuple[List[ClientPortfolioModel], Optional[int]]:
+        page_query = self._build_portfolio_page_query(
+            limit=limit, after_portfolio_entry_id=after_portfolio_entry_id
+        )
+        rows = self.executor.run_select_rows(
+            query=page_query.query, params=page_query.params
+        )
+        return self._to_portfolio_page(rows=rows, limit=limit)
 
-    def remove_company(self, company_id: str, removal_date: datetime) -> None:
-        df = self.get_company_data(company_id=company_id)
-        if len(df) > 1:
-            raise MultipleMonitoringError(
-                company_id=company_id, number_of_records=len(df)
-            )
-        elif len(df) == 1:
-            if pd.isnull(df["validity_end_date"].iloc[0]):
-                self.executor.run_queries_in_one_transaction(
-                    queries=[
-                        self._build_stop_monitoring_query(
-                            end_date=removal_date,
-                            portfolio_entry_id=int(df["portfolio_entry_id"].iloc[0]),
+
+class AsyncSqlPortfolioManager(AsyncPortfolioManager):
+    """Asynchronous counterpart of SqlPortfolioManager, sharing its queries.
+
+    With an active portfolio index, add_company skips the portfolio queries
+    of already monitored companies and get_portfolio is served from memory.
+    """
+
+    def __init__(
+        self,
+        executor: AsyncSqlRequestExecutor,
+        index: Optional[ActivePortfolioIndex] = None,
+    ):
+        self.executor: AsyncSqlRequestExecutor = executor
+        self.index: Optional[ActivePortfolioIndex] = index
+
+    async def get_company_data(self, company_id: str) -> DataFrame:
+        company_data_query = SqlPortfolioManager._build_company_data_query(
+            company_id=company_id
+        )
+        return await self.executor.run_select_query(
+            query=company_data_query.query, params=company_data_query.params
+        )
+
+    async def add_company(
+        self,
+        company_id: str,
+        insertion_date: datetime,
+        order_type: Optional[OrderType] = None,
+    ) -> None:
+        if self.index is not None and self.index.get(company_id) is not None:
+            # Already monitored, only the order is left to log
+            if order_type is not None:
+                await self.add_orders(
+                    orders=[
+                        ClientOrder(
+                            company_id=company_id,
+                            order_type=order_type,
+                            order_date=insertion_date,
                         )
                     ]
                 )
+            return
+        # Read first, so that a concurrent removal discards the entry read back
+        generation = None if self.index is None else self.index.generation(company_id)
+        query = SqlPortfolioManager._build_monitor_company_query(
+            company_id=company_id, insertion_date=insertion_date, order_type=order_type
+        )
+        await self.executor.run_queries_in_one_transaction(queries=[query])
+        if self.index is not None and self.index.loaded:
+            entry_query = SqlPortfolioManager._build_active_entry_query(
+                company_id=company_id
+            )
+            rows = await self.executor.run_select_rows(
+                query=entry_query.query, params=entry_query.params
+            )
+            if rows:
+                self.index.add(rows[0], generation=generation)
 
-    def add_orders(self, orders: List[ClientOrder]):
-        queries = [self._build_insert_order_query(order=order) for order in orders]
-        self.executor.run_queries_in_one_transaction(queries=queries)
+    async def remove_company(self, company_id: str, removal_date: datetime) -> None:
+        query = SqlPortfolioManager._build_stop_monitoring_query(
+            company_id=company_id, end_date=removal_date
+        )
+        await self.executor.run_update_query(query=query.query, params=query.params)
+        if self.index is not None:
+            self.index.remove(company_id)
 
-    def get_portfolio(
+    async def add_orders(self, orders: List[ClientOrder]):
+        if len(orders) == 0:
+            return
+        queries = SqlPortfolioManager._build_add_orders_queries(
+            orders=orders, dialect=self.executor.dialect
+        )
+        await self.executor.run_queries_in_one_transaction(queries=queries)
+
+    async def get_active_entries(self) -> Sequence[Mapping[str, Any]]:
+        """Rows of the active portfolio entries, e.g. to load the index."""
+        portfolio_query = SqlPortfolioManager._build_portfolio_query()
+        return await self.executor.run_select_rows(query=portfolio_query.query)
+
+    async def get_portfolio(
         self, only_active_companies: bool = True
     ) -> List[ClientPortfolioModel]:
-        query = "select * from client_portfolio where validity_end_date is null;"
-        df = self.executor.run_select_query(query=query)
-        for col in ["validity_start_date"]:
-            df[col] = df[col].apply(lambda x: x.isoformat())
-        return [
-            ClientPortfolioModel.model_validate(record)
-            for record in df.to_dict("records")
-        ]
+        if self.index is not None and self.index.loaded:
+            return list(self.index.portfolio())
+        rows = await self.get_active_entries()
+        return PORTFOLIO_ADAPTER.validate_python(
+            SqlPortfolioManager._to_portfolio_records(rows)
+        )
+
+    async def get_portfolio_page(
+        self, limit: int, after_portfolio_entry_id: int = 0
+    ) -> Tuple[List[ClientPortfolioModel], Optional[int]]:
+        page_query = SqlPortfolioManager._build_portfolio_page_query(
+            limit=limit, after_portfolio_entry_id=after_portfolio_entry_id
+        )
+        rows = await self.executor.run_select_rows(
+            query=page_query.query, params=page_query.params
+        )
+        return SqlPortfolioManager._to_portfolio_page(rows=rows, limit=limit)
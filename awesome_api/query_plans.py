@@ -0,0 +1,183 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy.sql import text
+
+from awesome_api.change_feed import (
+    build_claim_changes_query,
+    build_score_changes_query,
+)
+from awesome_api.claims_management import build_company_claims_query
+from awesome_api.models import OrderType, QueryPlanReport, TransactionalQuery
+from awesome_api.portfolio_management import SqlPortfolioManager
+from awesome_api.score_management import build_company_scores_query
+from awesome_api.update_management import (
+    _build_claim_snapshot_chunk_query,
+    _build_claim_updates_chunk_query,
+    _build_score_snapshot_chunk_query,
+    _build_score_updates_chunk_query,
+)
+from awesome_api.utils.postgres_utils import PostgresDataSource
+
+SAMPLE_COMPANIES = ["NVH0D651WH34", "5U0YGGPQNRT6", "H5BG77SAYJN0", "XOLEJ1U4XNHU"]
+# Partial indexes restricted to active (not stopped) portfolio entries
+ACTIVE_PORTFOLIO_INDEXES = [
+    "client_portfolio_active_company_idx",
+    "client_portfolio_active_entry_idx",
+]
+
+
+def get_hot_queries() -> Dict[str, Tuple[TransactionalQuery, List[str]]]:
+    """Queries of the API views and updates, with the indexes they should use."""
+    call_date = datetime.now()
+    cutoff_date = call_date - timedelta(days=5 * 365)
+    update_date = call_date - timedelta(days=1)
+    company_id = SAMPLE_COMPANIES[0]
+    return {
+        "company_scores": (
+            build_company_scores_query(company_id=company_id, cutoff_date=cutoff_date),
+            ["company_credit_scores_company_date_idx"],
+        ),
+        "company_scores_page": (
+            build_company_scores_query(
+                company_id=company_id,
+                cutoff_date=cutoff_date,
+                limit=101,
+                after=[cutoff_date, "X", 3, 1],
+            ),
+            ["company_credit_scores_company_date_idx"],
+        ),
+        "company_claims": (
+            build_company_claims_query(company_id=company_id, cutoff_date=cutoff_date),
+            ["claims_debtor_creation_date_idx"],
+        ),
+        "company_claims_page": (
+            build_company_claims_query(
+                company_id=company_id,
+                cutoff_date=cutoff_date,
+                limit=101,
+                after=[cutoff_date, "C0000000000"],
+            ),
+            ["claims_debtor_creation_date_idx"],
+        ),
+        "score_updates": (
+            _build_score_updates_chunk_query(
+                chunk=SAMPLE_COMPANIES, update_date=update_date, call_date=call_date
+            ),
+            # A one day window, either by company or by date first
+            [
+                "company_credit_scores_company_date_idx",
+                "company_credit_scores_date_company_idx",
+            ],
+        ),
+        "claim_updates": (
+            _build_claim_updates_chunk_query(
+                chunk=SAMPLE_COMPANIES, update_date=update_date, call_date=call_date
+            ),
+            [
+                "claims_debtor_update_date_idx",
+                "claims_debtor_creation_date_idx",
+                "claims_update_date_idx",
+            ],
+        ),
+        "score_update_snapshot": (
+            _build_score_snapshot_chunk_query(
+                chunk=SAMPLE_COMPANIES, update_date=update_date, call_date=call_date
+            ),
+            ["score_update_snapshots_date_company_idx"],
+        ),
+        "claim_update_snapshot": (
+            _build_claim_snapshot_chunk_query(
+                chunk=SAMPLE_COMPANIES, update_date=update_date, call_date=call_date
+            ),
+            ["claim_update_snapshots_date_debtor_idx"],
+        ),
+        "score_changes": (
+            build_score_changes_query(
+                cutoff_date=cutoff_date, limit=501, after_change_id=1
+            ),
+            # In change id order, or by monitored company then sorted
+            [
+                "company_credit_scores_change_idx",
+                "company_credit_scores_company_date_idx",
+            ],
+        ),
+        "claim_changes": (
+            build_claim_changes_query(
+                cutoff_date=cutoff_date, limit=501, after_change_id=1
+            ),
+            ["claims_change_idx", "claims_debtor_creation_date_idx"],
+        ),
+        "monitor_company": (
+            SqlPortfolioManager._build_monitor_company_query(
+                company_id=company_id,
+                insertion_date=call_date,
+                order_type=OrderType.SCORES,
+            ),
+            ["client_portfolio_valid_company_idx"],
+        ),
+        "stop_monitoring": (
+            SqlPortfolioManager._build_stop_monitoring_query(
+                company_id=company_id, end_date=call_date
+            ),
+            ACTIVE_PORTFOLIO_INDEXES,
+        ),
+        "company_data": (
+            SqlPortfolioManager._build_company_data_query(company_id=company_id),
+            ["client_portfolio_valid_company_idx"],
+        ),
+        "portfolio": (
+            SqlPortfolioManager._build_portfolio_query(),
+            ACTIVE_PORTFOLIO_INDEXES,
+        ),
+        "portfolio_page": (
+            SqlPortfolioManager._build_portfolio_page_query(
+                limit=100, after_portfolio_entry_id=0
+            ),
+            ["client_portfolio_active_entry_idx"],
+        ),
+    }
+
+
+def get_plan_indexes(plan: Dict[str, Any]) -> List[str]:
+    """Names of the indexes scanned by an EXPLAIN (FORMAT JSON) plan node."""
+    indexes = [plan["Index Name"]] if "Index Name" in plan else []
+    for sub_plan in plan.get("Plans", []):
+        indexes.extend(get_plan_indexes(sub_plan))
+    return indexes
+
+
+def check_query_plans(
+    db: PostgresDataSource, force_index_scan: bool = True
+) -> List[QueryPlanReport]:
+    """EXPLAIN every hot query and report the indexes it uses.
+
+    On small tables the planner rightly prefers sequential scans, so they are
+    disabled by default to check that an index matches each access path.
+    Nothing is executed: plans are computed without ANALYZE and the
+    transaction is rolled back.
+    """
+    reports = []
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            if force_index_scan:
+                connection.execute(text("SET LOCAL enable_seqscan = off;"))
+            for name, (query, expected_indexes) in get_hot_queries().items():
+                result = connection.execute(
+                    text(f"EXPLAIN (FORMAT JSON) {query.query}"), query.params
+                )
+                plan = result.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                reports.append(
+                    QueryPlanReport(
+                        name=name,
+                        expected_indexes=expected_indexes,
+                        used_indexes=get_plan_indexes(plan[0]["Plan"]),
+                    )
+                )
+        finally:
+            transaction.rollback()
+    return reports
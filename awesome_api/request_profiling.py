@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from awesome_api.constants import (
+    ENV_VAR_PROFILING_ENABLED,
+    ENV_VAR_PROFILING_INTERVAL,
+    ENV_VAR_PROFILING_OUTPUT_DIR,
+    ENV_VAR_PROFILING_SAMPLE_RATE,
+)
+from awesome_api.models import ProfileSummary, ProfilingConfig
+from awesome_api.utils.profiling import StackProfile, TaskSampler
+
+logger = logging.getLogger(__name__)
+
+PROFILING_CONFIG_ENV_VARS = {
+    "enabled": ENV_VAR_PROFILING_ENABLED,
+    "sample_rate": ENV_VAR_PROFILING_SAMPLE_RATE,
+    "interval": ENV_VAR_PROFILING_INTERVAL,
+    "output_dir": ENV_VAR_PROFILING_OUTPUT_DIR,
+}
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Functions of the hot paths broken down in profile summaries
+HOT_PATHS = {
+    "sql": {
+        "run_select_query",
+        "run_select_rows",
+        "run_insert_query",
+        "run_update_query",
+        "run_queries_in_one_transaction",
+    },
+    "claim_info": {
+        "get_claim_info_cp",
+        "get_claim_info",
+        "get_claim_info_records",
+        "preprocess_cp",
+    },
+    "serialization": {
+        "json_response",
+        "stream_client_update",
+        "serialize_response",
+        "jsonable_encoder",
+    },
+}
+
+
+def get_profiling_config() -> ProfilingConfig:
+    """Build the request profiling configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in PROFILING_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return ProfilingConfig.model_validate(values)
+
+
+class RequestProfiler:
+    """Pick the requests to profile, and store their profiles.
+
+    A request is profiled when it has a true `X-Profile` header, or else with
+    probability `sample_rate`. Profiles are stored in `output_dir` as
+    `<profile_id>.folded` collapsed stacks, for flame graphs, and a
+    `<profile_id>.json` ProfileSummary.
+    """
+
+    def __init__(self, config: ProfilingConfig):
+        self.config: ProfilingConfig = config
+
+    def should_profile(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.lower() in (b"1", b"true")
+        return random.random() < self.config.sample_rate
+
+    def save(
+        self, profile_id: str, method: str, path: str, profile: StackProfile
+    ) -> ProfileSummary:
+        summary = ProfileSummary(
+            profile_id=profile_id,
+            method=method,
+            path=path,
+            seconds=profile.seconds,
+            samples=profile.samples,
+            hot_paths=profile.breakdown(HOT_PATHS),
+            packages=profile.package_breakdown(),
+        )
+        os.makedirs(self.config.output_dir, exist_ok=True)
+        file_path = os.path.join(self.config.output_dir, profile_id)
+        with open(f"{file_path}.folded", "w") as file:
+            file.write(profile.collapsed())
+        with open(f"{file_path}.json", "w") as file:
+            file.write(summary.model_dump_json(indent=2))
+        return summary
+
+
+class RequestProfilingMiddleware:
+    """Profile picked requests until their response is sent.
+
+    One request is profiled at a time, others go straight through, as do all
+    requests when profiling is disabled. Profiled responses carry their
+    profile id in the `X-Profile-Id` header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app: ASGIApp = app
+        self._profiling = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profiler = get_request_profiler()
+        if (
+            profiler is None
+            or scope["type"] != "http"
+            or self._profiling
+            or not profiler.should_profile(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid4().hex[:8]}"
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER, profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self._profiling = True
+        task = asyncio.current_task()
+        assert task is not None
+        sampler = TaskSampler(task=task, interval=profiler.config.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile = sampler.stop()
+            self._profiling = False
+            summary = await asyncio.to_thread(
+                profiler.save,
+                profile_id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                profile=profile,
+            )
+            logger.info(f"Request profile: {summary.model_dump_json()}")
+
+
+@lru_cache(maxsize=None)
+def get_request_profiler() -> Optional[RequestProfiler]:
+    """Process-wide request profiler, None when profiling is disabled."""
+    config = get_profiling_config()
+    if not config.enabled:
+        return None
+    return RequestProfiler(config=config)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from awesome_api.models import TransactionalQuery
+
+# Keyset of a company scores page, score type and score are nullable, and
+# score_id (migration 6) tells identical scores apart
+SCORE_KEYSET = "score_date, COALESCE(score_type, ''), COALESCE(score, -1), score_id"
+
+
+def build_company_scores_query(
+    company_id: str,
+    cutoff_date: datetime,
+    limit: Optional[int] = None,
+    after: Optional[Sequence[Any]] = None,
+) -> TransactionalQuery:
+    """Scores of a company since `cutoff_date`.
+
+    With a `limit`, `limit` rows are returned in keyset order, starting after
+    the (score_date, score_type, score, score_id) keyset `after` when given.
+    """
+    params: Dict[str, Any] = {"company_id": company_id, "cutoff_date": cutoff_date}
+    query = (
+        "SELECT score_date, score, company_id, score_type, score_id"
+        " FROM company_credit_scores"
+        " WHERE company_id = :company_id"
+        " and score_date >= :cutoff_date"
+    )
+    if after is not None:
+        after_score_date, after_score_type, after_score, after_score_id = after
+        params.update(
+            after_score_date=after_score_date,
+            after_score_type=after_score_type,
+            after_score=after_score,
+            after_score_id=after_score_id,
+        )
+        query += (
+            f" and ({SCORE_KEYSET}) >"
+            " (:after_score_date, :after_score_type, :after_score, :after_score_id)"
+        )
+    if limit is not None:
+        params["limit"] = limit
+        query += f" ORDER BY {SCORE_KEYSET} LIMIT :limit"
+    return TransactionalQuery(query=query + ";", params=params)
+
+
+def get_score_keyset(row: Mapping[str, Any]) -> List[Any]:
+    """Keyset values of a score row, see SCORE_KEYSET."""
+    return [
+        row["score_date"],
+        row["score_type"] or "",
+        -1 if row["score"] is None else row["score"],
+        row["score_id"],
+    ]
+
+
+def get_score_records(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """ScoreModel records built from database rows without pandas."""
+    return [
+        {
+            "score_date": row["score_date"].isoformat(),
+            "score": row["score"],
+            "company_id": row["company_id"],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,169 @@
+import os
+import time
+from functools import lru_cache
+from threading import Lock
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.sql import text
+
+from awesome_api.constants import (
+    ENV_VAR_CONSOLE_CACHE_MAX_SIZE,
+    ENV_VAR_CONSOLE_CACHE_TTL,
+    ENV_VAR_CONSOLE_CHUNK_SIZE,
+    ENV_VAR_CONSOLE_DATABASE_URL,
+    ENV_VAR_CONSOLE_MAX_ROWS,
+    ENV_VAR_CONSOLE_POOL_SIZE,
+    ENV_VAR_CONSOLE_STATEMENT_TIMEOUT,
+)
+from awesome_api.models import CacheStore, ConsoleConfig
+from awesome_api.utils.cache import LruTtlCacheStore
+from awesome_api.utils.postgres_utils import get_db_url
+
+CONSOLE_CONFIG_ENV_VARS = {
+    "database_url": ENV_VAR_CONSOLE_DATABASE_URL,
+    "max_rows": ENV_VAR_CONSOLE_MAX_ROWS,
+    "statement_timeout": ENV_VAR_CONSOLE_STATEMENT_TIMEOUT,
+    "chunk_size": ENV_VAR_CONSOLE_CHUNK_SIZE,
+    "pool_size": ENV_VAR_CONSOLE_POOL_SIZE,
+    "cache_ttl": ENV_VAR_CONSOLE_CACHE_TTL,
+    "cache_max_size": ENV_VAR_CONSOLE_CACHE_MAX_SIZE,
+}
+
+
+class ConsoleResult(NamedTuple):
+    df: DataFrame
+    truncated: bool  # more rows than max_rows, only the first ones are kept
+    seconds: float
+    cached: bool
+
+
+def get_console_config() -> ConsoleConfig:
+    """Build the SQL console configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in CONSOLE_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return ConsoleConfig.model_validate(values)
+
+
+class ConsoleDataSource:
+    """Read-only connections of the SQL console, pooled apart from the API ones.
+
+    Queries run in read-only transactions that are always rolled back, under
+    the `statement_timeout` of the configuration, and their rows are fetched
+    `chunk_size` at a time from a server-side cursor (which only accepts
+    SELECT and VALUES queries).
+    """
+
+    def __init__(self, config: ConsoleConfig):
+        self.config: ConsoleConfig = config
+        self._engine: Optional[Engine] = None
+        self._engine_lock = Lock()
+
+    @property
+    def engine(self) -> Engine:
+        with self._engine_lock:
+            if self._engine is None:
+                self._engine = self._create_db_engine()
+            return self._engine
+
+    def _create_db_engine(self) -> Engine:
+        timeout_ms = int(self.config.statement_timeout * 1000)
+        return create_engine(
+            self.config.database_url or get_db_url(),
+            pool_size=self.config.pool_size,
+            max_overflow=0,
+            pool_pre_ping=True,
+            connect_args={
+                "options": (
+                    f"-c statement_timeout={timeout_ms}"
+                    " -c default_transaction_read_only=on"
+                )
+            },
+            execution_options={"postgresql_readonly": True},
+        )
+
+    def iter_chunks(self, query: str, limit: int) -> Iterator[DataFrame]:
+        """DataFrames of at most `chunk_size` rows, up to `limit` rows in all."""
+        with self.engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True, max_row_buffer=self.config.chunk_size
+            ).execute(text(query))
+            columns = list(result.keys())
+            remaining = limit
+            for rows in result.partitions(self.config.chunk_size):
+                chunk = rows[:remaining]
+                remaining -= len(chunk)
+                yield DataFrame(chunk, columns=columns)
+                if remaining <= 0:
+                    break
+            if remaining == limit:
+                # No rows, the columns are still shown
+                yield DataFrame([], columns=columns)
+            result.close()
+            # Leaving the block rolls the transaction back
+
+    def dispose(self) -> None:
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+def get_cache_key(query: str) -> str:
+    return query.strip().rstrip(";").strip()
+
+
+def run_console_query(
+    source: ConsoleDataSource,
+    cache: CacheStore,
+    query: str,
+    on_chunk: Optional[Callable[[DataFrame], None]] = None,
+) -> ConsoleResult:
+    """Rows of `query`, cached by SQL text and capped to `max_rows`.
+
+    On cache misses, `on_chunk` is called with each chunk as it is fetched,
+    for incremental rendering.
+    """
+    key = get_cache_key(query)
+    cached_result = cache.get(key)
+    if cached_result is not None:
+        return cached_result._replace(cached=True)
+    start = time.perf_counter()
+    max_rows = source.config.max_rows
+    chunks: List[DataFrame] = []
+    fetched_rows = shown_rows = 0
+    # One more row than shown tells whether the result is truncated
+    for chunk in source.iter_chunks(query=query, limit=max_rows + 1):
+        fetched_rows += len(chunk)
+        chunk = chunk.iloc[: max_rows - shown_rows]
+        shown_rows += len(chunk)
+        if len(chunk) and on_chunk is not None:
+            on_chunk(chunk)
+        chunks.append(chunk)
+    df = pd.concat(chunks, ignore_index=True) if chunks else DataFrame()
+    result = ConsoleResult(
+        df=df,
+        truncated=fetched_rows > max_rows,
+        seconds=time.perf_counter() - start,
+        cached=False,
+    )
+    cache.set(key, result)
+    return result
+
+
+@lru_cache(maxsize=None)
+def get_console_data_source() -> ConsoleDataSource:
+    """Process-wide console data source, shared by the Streamlit sessions."""
+    return ConsoleDataSource(config=get_console_config())
+
+
+@lru_cache(maxsize=None)
+def get_console_cache() -> CacheStore:
+    """Process-wide cache of console results, keyed by SQL text."""
+    config = get_console_config()
+    return LruTtlCacheStore(max_size=config.cache_max_size, ttl=config.cache_ttl)
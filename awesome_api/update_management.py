@@ -1,18 +1,45 @@
+import asyncio
 from datetime import datetime, timedelta
 from functools import partial
-from typing import List, Sequence
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from pandas import DataFrame
 
-from awesome_api.claims_management import get_claim_info_cp
-from awesome_api.models import ClaimInfo, ScoreModel
-from awesome_api.utils.parallel_extraction import parallel_execution
-from awesome_api.utils.postgres_utils import PostgresDataSource
-from awesome_api.utils.sql_utils import generate_param_dict, parametrized_in_clause
+from awesome_api.claims_management import get_claim_info_cp, get_claim_info_records
+from awesome_api.constants import MAX_CHUNK_SIZE
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    ClaimInfo,
+    ClientUpdate,
+    ScoreModel,
+    SqlRequestExecutor,
+    TransactionalQuery,
+)
+from awesome_api.score_management import get_score_records
+from awesome_api.utils.arrow_transfer import parallel_execution_arrow
+from awesome_api.utils.parallel_extraction import (
+    ExecutorBackend,
+    parallel_execution,
+    values_chunker,
+)
+from awesome_api.utils.postgres_utils import get_data_source
+from awesome_api.utils.sql_utils import array_in_clause, named_query
 
 
 def get_score_update(
-    company_id: str, update_date: datetime, call_date: datetime
+    company_id: str,
+    update_date: datetime,
+    call_date: datetime,
+    executor: Optional[SqlRequestExecutor] = None,
 ) -> List[ScoreModel]:
     cutoff_date = call_date - timedelta(days=5 * 365)
     next_day = update_date + timedelta(days=1)
@@ -22,7 +49,7 @@ def get_score_update(
         "update_date": update_date,
         "next_day": next_day,
     }
-    db = PostgresDataSource()
+    db = executor or get_data_source()
     df = db.run_select_query(
         query="SELECT score_date, score, company_id FROM company_credit_scores"
         " WHERE company_id = :company_id"
@@ -37,7 +64,10 @@ def get_score_update(
 
 
 def get_claim_update(
-    company_id: str, update_date: datetime, call_date: datetime
+    company_id: str,
+    update_date: datetime,
+    call_date: datetime,
+    executor: Optional[SqlRequestExecutor] = None,
 ) -> List[ClaimInfo]:
     cutoff_date = call_date - timedelta(days=5 * 365)
     next_day = update_date + timedelta(days=1)
@@ -48,12 +78,13 @@ def get_claim_update(
         "next_day": next_day,
     }
 
-    db = PostgresDataSource()
+    db = executor or get_data_source()
     df = db.run_select_query(
         query="""SELECT
         claim_creation_date,
         debtor_id,
         claim_id,
+        hashed_claim_id,
         initial_claim_amount,
         current_claim_amount,
         last_update_date
@@ -69,59 +100,382 @@ def get_claim_update(
     return get_claim_info_cp(df)
 
 
-def get_score_updates_companies_chunk(
-    chunk: Sequence[str], update_date: datetime, call_date: datetime
-) -> DataFrame:
+def _check_chunk(chunk: Sequence[str]) -> None:
     if len(chunk) == 0:
         raise ValueError("Chunk must not be empty")
-    if len(chunk) > 1000:
-        raise ValueError("Chunk size must not exceed 1000")
+    if len(chunk) > MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size must not exceed {MAX_CHUNK_SIZE}")
+
+
+def _build_score_updates_chunk_query(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    dialect: str = "postgresql",
+) -> TransactionalQuery:
+    _check_chunk(chunk)
     cutoff_date = call_date - timedelta(days=5 * 365)
     next_day = update_date + timedelta(days=1)
-    db = PostgresDataSource()
-    prefix = "company"
-    in_clause = parametrized_in_clause(size=len(chunk), prefix=prefix)
-    company_param_dict = generate_param_dict(values=chunk, prefix=prefix)
+    in_clause, company_params = array_in_clause(
+        values=chunk, name="company_ids", dialect=dialect
+    )
     params = {
         "cutoff_date": cutoff_date,
         "update_date": update_date,
         "next_day": next_day,
-        **company_param_dict,
+        **company_params,
     }
-    df = db.run_select_query(
-        query="SELECT score_date, score, company_id FROM company_credit_scores"
+    query = (
+        "SELECT score_date, score, company_id FROM company_credit_scores"
         f" WHERE company_id {in_clause}"
         " and score_date >= :cutoff_date"
         " and score_date >= :update_date"
-        " and score_date < :next_day",
+        " and score_date < :next_day"
+    )
+    return TransactionalQuery(
+        query=named_query("score_updates_chunk", query, dialect=dialect),
+        params=params,
+    )
+
+
+def _build_claim_updates_chunk_query(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    dialect: str = "postgresql",
+) -> TransactionalQuery:
+    _check_chunk(chunk)
+    cutoff_date = call_date - timedelta(days=5 * 365)
+    next_day = update_date + timedelta(days=1)
+    in_clause, company_params = array_in_clause(
+        values=chunk, name="company_ids", dialect=dialect
+    )
+    params = {
+        "cutoff_date": cutoff_date,
+        "update_date": update_date,
+        "next_day": next_day,
+        **company_params,
+    }
+    query = f"""SELECT
+        claim_creation_date,
+        debtor_id,
+        claim_id,
+        hashed_claim_id,
+        initial_claim_amount,
+        current_claim_amount,
+        last_update_date
+        FROM
+        claims
+        WHERE
+        debtor_id {in_clause}
+        and claim_creation_date >= :cutoff_date
+        and last_update_date >= :update_date
+        and last_update_date < :next_day"""
+    return TransactionalQuery(
+        query=named_query("claim_updates_chunk", query, dialect=dialect),
+        params=params,
+    )
+
+
+def _build_score_snapshot_chunk_query(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    dialect: str = "postgresql",
+) -> TransactionalQuery:
+    _check_chunk(chunk)
+    in_clause, company_params = array_in_clause(
+        values=chunk, name="company_ids", dialect=dialect
+    )
+    params = {
+        "cutoff_date": call_date - timedelta(days=5 * 365),
+        "snapshot_date": update_date.date(),
+        **company_params,
+    }
+    query = (
+        "SELECT score_date, score, company_id FROM score_update_snapshots"
+        " WHERE update_date = :snapshot_date"
+        f" and company_id {in_clause}"
+        " and score_date >= :cutoff_date"
+    )
+    return TransactionalQuery(
+        query=named_query("score_snapshot_chunk", query, dialect=dialect),
+        params=params,
+    )
+
+
+def _build_claim_snapshot_chunk_query(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    dialect: str = "postgresql",
+) -> TransactionalQuery:
+    _check_chunk(chunk)
+    in_clause, company_params = array_in_clause(
+        values=chunk, name="company_ids", dialect=dialect
+    )
+    params = {
+        "cutoff_date": call_date - timedelta(days=5 * 365),
+        "snapshot_date": update_date.date(),
+        **company_params,
+    }
+    query = f"""SELECT
+        claim_creation_date,
+        debtor_id,
+        claim_id,
+        hashed_claim_id,
+        initial_claim_amount,
+        current_claim_amount,
+        last_update_date
+        FROM
+        claim_update_snapshots
+        WHERE
+        update_date = :snapshot_date
+        and debtor_id {in_clause}
+        and claim_creation_date >= :cutoff_date"""
+    return TransactionalQuery(
+        query=named_query("claim_snapshot_chunk", query, dialect=dialect),
         params=params,
     )
+
+
+def get_score_updates_companies_chunk(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: Optional[SqlRequestExecutor] = None,
+) -> DataFrame:
+    db = executor or get_data_source()
+    query = _build_score_updates_chunk_query(
+        chunk=chunk, update_date=update_date, call_date=call_date, dialect=db.dialect
+    )
+    df = db.run_select_query(query=query.query, params=query.params)
     df["score_date"] = df["score_date"].apply(lambda x: x.isoformat())
 
     return df
 
 
+def get_claim_updates_companies_chunk(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: Optional[SqlRequestExecutor] = None,
+) -> DataFrame:
+    db = executor or get_data_source()
+    query = _build_claim_updates_chunk_query(
+        chunk=chunk, update_date=update_date, call_date=call_date, dialect=db.dialect
+    )
+    return db.run_select_query(query=query.query, params=query.params)
+
+
+async def get_score_updates_companies_chunk_async(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: AsyncSqlRequestExecutor,
+    from_snapshot: bool = False,
+) -> List[Dict[str, Any]]:
+    build_query = (
+        _build_score_snapshot_chunk_query
+        if from_snapshot
+        else _build_score_updates_chunk_query
+    )
+    query = build_query(
+        chunk=chunk,
+        update_date=update_date,
+        call_date=call_date,
+        dialect=executor.dialect,
+    )
+    rows = await executor.run_select_rows(query=query.query, params=query.params)
+    return get_score_records(rows)
+
+
+async def get_claim_updates_companies_chunk_async(
+    chunk: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: AsyncSqlRequestExecutor,
+    from_snapshot: bool = False,
+) -> List[Dict[str, Any]]:
+    build_query = (
+        _build_claim_snapshot_chunk_query
+        if from_snapshot
+        else _build_claim_updates_chunk_query
+    )
+    query = build_query(
+        chunk=chunk,
+        update_date=update_date,
+        call_date=call_date,
+        dialect=executor.dialect,
+    )
+    rows = await executor.run_select_rows(query=query.query, params=query.params)
+    return get_claim_info_records(rows)
+
+
+def _run_chunks(
+    func: Callable[[Sequence[str]], DataFrame],
+    companies: Sequence[str],
+    chunk_size: int,
+    pool_size: int,
+    backend: ExecutorBackend,
+) -> DataFrame:
+    """Worker processes send chunks back as Arrow files instead of pickles."""
+    if backend == ExecutorBackend.PROCESS:
+        table = parallel_execution_arrow(
+            func=func, values=companies, chunk_size=chunk_size, pool_size=pool_size
+        )
+        return table.to_pandas()
+    return parallel_execution(
+        func=func,
+        values=companies,
+        chunk_size=chunk_size,
+        pool_size=pool_size,
+        backend=backend,
+    )
+
+
 def get_score_updates_companies(
     companies: Sequence[str],
     update_date: datetime,
     call_date: datetime,
     chunk_size: int,
     pool_size: int,
+    backend: ExecutorBackend = ExecutorBackend.THREAD,
+    executor: Optional[SqlRequestExecutor] = None,
 ) -> List[ScoreModel]:
     extraction_func = partial(
         get_score_updates_companies_chunk,
         update_date=update_date,
         call_date=call_date,
+        executor=executor,
     )
-    res = parallel_execution(
+    res = _run_chunks(
         func=extraction_func,
-        values=companies,
+        companies=companies,
         chunk_size=chunk_size,
         pool_size=pool_size,
+        backend=backend,
     )
     return [ScoreModel.model_validate(record) for record in res.to_dict("records")]
 
 
+def get_claim_updates_companies(
+    companies: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    chunk_size: int,
+    pool_size: int,
+    backend: ExecutorBackend = ExecutorBackend.THREAD,
+    executor: Optional[SqlRequestExecutor] = None,
+) -> List[ClaimInfo]:
+    extraction_func = partial(
+        get_claim_updates_companies_chunk,
+        update_date=update_date,
+        call_date=call_date,
+        executor=executor,
+    )
+    res = _run_chunks(
+        func=extraction_func,
+        companies=companies,
+        chunk_size=chunk_size,
+        pool_size=pool_size,
+        backend=backend,
+    )
+    return get_claim_info_cp(res)
+
+
+def get_client_update(
+    companies: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    chunk_size: int = MAX_CHUNK_SIZE,
+    executor: Optional[SqlRequestExecutor] = None,
+) -> ClientUpdate:
+    """Extract score and claim updates of `companies`, one query per chunk."""
+    client_update = ClientUpdate(update_date=update_date.isoformat())
+    for chunk in values_chunker(values=companies, chunk_size=chunk_size):
+        score_df = get_score_updates_companies_chunk(
+            chunk=chunk,
+            update_date=update_date,
+            call_date=call_date,
+            executor=executor,
+        )
+        client_update.score_updates.extend(
+            ScoreModel.model_validate(record)
+            for record in score_df.to_dict("records")
+        )
+        claim_df = get_claim_updates_companies_chunk(
+            chunk=chunk,
+            update_date=update_date,
+            call_date=call_date,
+            executor=executor,
+        )
+        client_update.claim_updates.extend(get_claim_info_cp(claim_df))
+    return client_update
+
+
+async def iter_client_update_async(
+    companies: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: AsyncSqlRequestExecutor,
+    chunk_size: int = MAX_CHUNK_SIZE,
+    from_snapshot: bool = False,
+) -> AsyncIterator[Tuple[Sequence[str], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Yield (chunk, score updates, claim updates) for each chunk of companies.
+
+    The score and claim queries of a chunk run concurrently, and rows are
+    turned into records directly, without DataFrames or pydantic models.
+    With `from_snapshot`, updates are read from the snapshot of `update_date`,
+    see update_snapshots.
+    """
+    for chunk in values_chunker(values=companies, chunk_size=chunk_size):
+        score_updates, claim_updates = await asyncio.gather(
+            get_score_updates_companies_chunk_async(
+                chunk=chunk,
+                update_date=update_date,
+                call_date=call_date,
+                executor=executor,
+                from_snapshot=from_snapshot,
+            ),
+            get_claim_updates_companies_chunk_async(
+                chunk=chunk,
+                update_date=update_date,
+                call_date=call_date,
+                executor=executor,
+                from_snapshot=from_snapshot,
+            ),
+        )
+        yield chunk, score_updates, claim_updates
+
+
+async def get_client_update_async(
+    companies: Sequence[str],
+    update_date: datetime,
+    call_date: datetime,
+    executor: AsyncSqlRequestExecutor,
+    chunk_size: int = MAX_CHUNK_SIZE,
+    from_snapshot: bool = False,
+) -> Dict[str, Any]:
+    """Async get_client_update returning a ClientUpdate record."""
+    client_update: Dict[str, Any] = {
+        "update_date": update_date.isoformat(),
+        "score_updates": [],
+        "claim_updates": [],
+    }
+    async for _, score_updates, claim_updates in iter_client_update_async(
+        companies=companies,
+        update_date=update_date,
+        call_date=call_date,
+        executor=executor,
+        chunk_size=chunk_size,
+        from_snapshot=from_snapshot,
+    ):
+        client_update["score_updates"].extend(score_updates)
+        client_update["claim_updates"].extend(claim_updates)
+    return client_update
+
+
 if __name__ == "__main__":
     example = get_score_updates_companies_chunk(
         chunk=["NVH0D651WH34", "5U0YGGPQNRT6", "H5BG77SAYJN0", "XOLEJ1U4XNHU"],
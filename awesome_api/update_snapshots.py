@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    SqlRequestExecutor,
+    TransactionalQuery,
+)
+from awesome_api.utils.sql_utils import named_query
+
+
+def is_snapshot_date(update_date: datetime, call_date: datetime) -> bool:
+    """Updates of past days are served from snapshots, today's are live."""
+    return update_date.date() < call_date.date()
+
+
+def build_update_snapshot_query(
+    update_date: datetime, created_at: datetime
+) -> TransactionalQuery:
+    """Materialize score and claim updates of a day, unless already done.
+
+    The snapshot holds every update of the day: portfolio and cutoff date
+    filters are applied when it is read. Concurrent builds of the same day
+    wait for each other on the update_snapshots primary key.
+    """
+    query = """
+    WITH new_snapshot AS (
+        INSERT INTO update_snapshots (UPDATE_DATE, CREATED_AT)
+        VALUES (:snapshot_date, :created_at)
+        ON CONFLICT (UPDATE_DATE) DO NOTHING
+        RETURNING update_date
+    ), score_snapshot AS (
+        INSERT INTO score_update_snapshots (
+            UPDATE_DATE, SCORE_DATE, COMPANY_ID, SCORE
+        )
+        SELECT :snapshot_date, score_date, company_id, score
+        FROM company_credit_scores
+        WHERE score_date >= :update_date
+        and score_date < :next_day
+        and EXISTS (SELECT 1 FROM new_snapshot)
+    )
+    INSERT INTO claim_update_snapshots (
+        UPDATE_DATE,
+        CLAIM_ID,
+        CLAIM_CREATION_DATE,
+        DEBTOR_ID,
+        LAST_UPDATE_DATE,
+        INITIAL_CLAIM_AMOUNT,
+        CURRENT_CLAIM_AMOUNT
+    )
+    SELECT
+    :snapshot_date,
+    claim_id,
+    claim_creation_date,
+    debtor_id,
+    last_update_date,
+    initial_claim_amount,
+    current_claim_amount
+    FROM claims
+    WHERE last_update_date >= :update_date
+    and last_update_date < :next_day
+    and EXISTS (SELECT 1 FROM new_snapshot);
+    """
+    params = {
+        "snapshot_date": update_date.date(),
+        "update_date": update_date,
+        "next_day": update_date + timedelta(days=1),
+        "created_at": created_at,
+    }
+    return TransactionalQuery(
+        query=named_query("update_snapshot", query), params=params
+    )
+
+
+def build_delete_snapshot_queries(update_date: datetime) -> List[TransactionalQuery]:
+    params = {"snapshot_date": update_date.date()}
+    return [
+        TransactionalQuery(
+            query=f"DELETE FROM {table} WHERE update_date = :snapshot_date;",
+            params=params,
+        )
+        for table in [
+            "score_update_snapshots",
+            "claim_update_snapshots",
+            "update_snapshots",
+        ]
+    ]
+
+
+def rebuild_update_snapshot(
+    executor: SqlRequestExecutor, update_date: datetime
+) -> None:
+    """(Re)build the snapshot of a day, to run once its data has been loaded."""
+    queries = build_delete_snapshot_queries(update_date=update_date)
+    queries.append(
+        build_update_snapshot_query(update_date=update_date, created_at=datetime.now())
+    )
+    executor.run_queries_in_one_transaction(queries=queries)
+
+
+def build_snapshot_exists_query(update_date: datetime) -> TransactionalQuery:
+    query = (
+        "SELECT update_date FROM update_snapshots"
+        " WHERE update_date = :snapshot_date;"
+    )
+    return TransactionalQuery(query=query, params={"snapshot_date": update_date.date()})
+
+
+async def has_update_snapshot_async(
+    executor: AsyncSqlRequestExecutor, update_date: datetime
+) -> bool:
+    """Whether the snapshot job built the snapshot of a day."""
+    query = build_snapshot_exists_query(update_date=update_date)
+    rows = await executor.run_select_rows(query=query.query, params=query.params)
+    return len(rows) > 0
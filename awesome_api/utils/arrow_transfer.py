@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import pyarrow as pa
+from pandas import DataFrame
+
+from awesome_api.constants import ENV_VAR_ARROW_TRANSFER_DIR
+from awesome_api.utils.parallel_extraction import ExecutorBackend, get_chunk_executor
+
+# Memory backed on Linux, results written there never touch the disk. It is
+# small in containers (64 MB by default in Docker), files that do not fit are
+# written to the temporary directory instead.
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def get_transfer_dir() -> Optional[str]:
+    """Directory of the chunk result files, None for the temporary directory.
+
+    ARROW_TRANSFER_DIR overrides the shared memory default, an empty value
+    selects the temporary directory.
+    """
+    if ENV_VAR_ARROW_TRANSFER_DIR in os.environ:
+        return os.environ[ENV_VAR_ARROW_TRANSFER_DIR] or None
+    return SHARED_MEMORY_DIR
+
+
+class ArrowResultWriter:
+    """Run a DataFrame chunk function and write its result as an Arrow IPC file.
+
+    Workers return the file path instead of pickling the DataFrame back. Files
+    go to `fallback_directory` when `directory` has not enough free space.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Sequence[str]], DataFrame],
+        directory: str,
+        fallback_directory: Optional[str] = None,
+    ):
+        self.func = func
+        self.directory = directory
+        self.fallback_directory = fallback_directory
+
+    def _get_directory(self, table: pa.Table) -> str:
+        if self.fallback_directory is None:
+            return self.directory
+        # The IPC file is about the size of the table buffers
+        if shutil.disk_usage(self.directory).free > 2 * table.nbytes:
+            return self.directory
+        return self.fallback_directory
+
+    def __call__(self, chunk: Sequence[str]) -> str:
+        table = pa.Table.from_pandas(self.func(chunk), preserve_index=False)
+        directory = self._get_directory(table)
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.arrow")
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path
+
+
+def read_arrow_result(path: str) -> pa.Table:
+    """Map an ArrowResultWriter file without copying it, then unlink it.
+
+    The mapping lives as long as the returned table, the file name does not.
+    """
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    os.unlink(path)
+    return table
+
+
+def _iter_chunk_tables(
+    func: Callable[[Sequence[str]], DataFrame],
+    values: Sequence[str],
+    chunk_size: int,
+    pool_size: int,
+) -> Iterator[Tuple[int, pa.Table]]:
+    transfer_dir = get_transfer_dir()
+    directories = [tempfile.mkdtemp(prefix="awesome_api_", dir=transfer_dir)]
+    if transfer_dir is not None:
+        directories.append(tempfile.mkdtemp(prefix="awesome_api_"))
+    try:
+        executor = get_chunk_executor(
+            backend=ExecutorBackend.PROCESS, pool_size=pool_size
+        )
+        writer = ArrowResultWriter(
+            func=func,
+            directory=directories[0],
+            fallback_directory=directories[1] if len(directories) > 1 else None,
+        )
+        for chunk_result in executor.imap_unordered(
+            func=writer,
+            values=values,
+            chunk_size=chunk_size,
+        ):
+            yield chunk_result.chunk_index, read_arrow_result(chunk_result.result)
+    finally:
+        # Results of chunks still running after a failure are dropped with it
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def iter_record_batches(
+    func: Callable[[Sequence[str]], DataFrame],
+    values: Sequence[str],
+    chunk_size: int,
+    pool_size: int,
+) -> Iterator[pa.RecordBatch]:
+    """Record batches of `func` on chunks of `values`, computed by processes.
+
+    Chunks are yielded as soon as they are done, in any order.
+    """
+    for _, table in _iter_chunk_tables(
+        func=func, values=values, chunk_size=chunk_size, pool_size=pool_size
+    ):
+        yield from table.to_batches()
+
+
+def parallel_execution_arrow(
+    func: Callable[[Sequence[str]], DataFrame],
+    values: Sequence[str],
+    chunk_size: int,
+    pool_size: int,
+) -> pa.Table:
+    """parallel_execution returning one Arrow table, in chunk order.
+
+    Column types of chunks with no rows are unknown, these chunks are left
+    out unless all chunks are empty. Columns of the others are null typed
+    when they only hold nulls, and nullable integers are read as floats in
+    chunks with nulls: both are promoted to the types of the other chunks,
+    as pd.concat does.
+    """
+    tables = [
+        table
+        for _, table in sorted(
+            _iter_chunk_tables(
+                func=func, values=values, chunk_size=chunk_size, pool_size=pool_size
+            ),
+            key=lambda indexed_table: indexed_table[0],
+        )
+    ]
+    if not tables:
+        return pa.table({})
+    tables = [table for table in tables if table.num_rows > 0] or tables[:1]
+    return pa.concat_tables(tables, promote_options="permissive")
@@ -0,0 +1,355 @@
+"""Vectorized, seeded generation of scores, claims and client portfolio tables.
+
+Follows the distributions of generate_data.py and generate_claims.py, at any
+scale: companies are generated chunk by chunk, and each chunk is appended to
+the output files before the next one is generated.
+"""
+import os
+import string
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from numpy.random import Generator
+from pandas import DataFrame
+
+ID_ALPHABET = np.array(list(string.ascii_uppercase + string.digits))
+COMPANY_ID_SIZE = 12
+CLAIM_ID_SIZE = 20
+# Index permutations stay below 36 ** 12 so they fit in 12 id characters
+INDEX_MASK = np.uint64(2**62 - 1)
+SECONDS_PER_YEAR = 365 * 24 * 3600
+SCORE_HISTORY_YEARS = 10
+CLAIM_HISTORY_YEARS = 10
+MIN_SCORE_HISTORY = 10
+MIN_CLAIM_AMOUNT = 10000
+MAX_CLAIM_AMOUNT = 1000000
+MAX_MONITORING_PERIODS = 3
+PORTFOLIO_HISTORY_YEARS = 5
+ACTIVE_MONITORING_SHARE = 0.8
+CSV_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+OUTPUT_FILES = {
+    "scores": "company_credit_scores",
+    "claims": "company_claims",
+    "portfolio": "client_portfolio",
+}
+# Parquet column types, which pandas cannot tell for the text columns of an
+# empty chunk
+PARQUET_SCHEMAS = {
+    "scores": pa.schema(
+        [
+            ("SCORE_DATE", pa.timestamp("ns")),
+            ("COMPANY_ID", pa.string()),
+            ("SCORE", pa.int64()),
+            ("SCORE_TYPE", pa.string()),
+        ]
+    ),
+    "claims": pa.schema(
+        [
+            ("CLAIM_ID", pa.string()),
+            ("CLAIM_CREATION_DATE", pa.timestamp("ns")),
+            ("DEBTOR_ID", pa.string()),
+            ("CLIENT_ID", pa.string()),
+            ("LAST_UPDATE_DATE", pa.timestamp("ns")),
+            ("INITIAL_CLAIM_AMOUNT", pa.int64()),
+            ("CURRENT_CLAIM_AMOUNT", pa.int64()),
+        ]
+    ),
+    "portfolio": pa.schema(
+        [
+            ("COMPANY_ID", pa.string()),
+            ("VALIDITY_START_DATE", pa.timestamp("ns")),
+            ("VALIDITY_END_DATE", pa.timestamp("ns")),
+            ("IS_VALID", pa.int64()),
+        ]
+    ),
+}
+
+
+def _encode_ids(digits: np.ndarray) -> np.ndarray:
+    """Turn a (rows, size) array of ID_ALPHABET positions into id strings."""
+    chars = np.ascontiguousarray(ID_ALPHABET[digits])
+    return chars.view(f"<U{digits.shape[1]}")[:, 0].astype(object)
+
+
+def random_ids(rng: Generator, size: int, id_size: int) -> np.ndarray:
+    return _encode_ids(rng.integers(0, len(ID_ALPHABET), (size, id_size)))
+
+
+def unique_ids(indexes: np.ndarray, multiplier: int, offset: int) -> np.ndarray:
+    """12 character ids of `indexes`, distinct for distinct indexes.
+
+    An odd multiplier makes the affine map a permutation modulo 2 ** 62.
+    """
+    values = (indexes.astype(np.uint64) * np.uint64(multiplier | 1)) + np.uint64(
+        offset
+    )
+    values &= INDEX_MASK
+    digits = np.empty((len(indexes), COMPANY_ID_SIZE), dtype=np.int64)
+    for position in range(COMPANY_ID_SIZE - 1, -1, -1):
+        digits[:, position] = values % np.uint64(len(ID_ALPHABET))
+        values //= np.uint64(len(ID_ALPHABET))
+    return _encode_ids(digits)
+
+
+def _random_dates(
+    rng: Generator, reference_date: datetime, size: int, years: int
+) -> pd.DatetimeIndex:
+    seconds = rng.integers(0, years * SECONDS_PER_YEAR, size)
+    return pd.Timestamp(reference_date) - pd.to_timedelta(seconds, unit="s")
+
+
+def generate_scores(
+    rng: Generator, company_ids: np.ndarray, max_history: int, reference_date: datetime
+) -> DataFrame:
+    history_sizes = rng.integers(MIN_SCORE_HISTORY, max_history + 1, len(company_ids))
+    size = int(history_sizes.sum())
+    return DataFrame(
+        {
+            "SCORE_DATE": _random_dates(rng, reference_date, size, SCORE_HISTORY_YEARS),
+            "COMPANY_ID": np.repeat(company_ids, history_sizes),
+            "SCORE": rng.integers(0, 6, size),
+            "SCORE_TYPE": rng.choice(np.array(["X", "Y"], dtype=object), size),
+        }
+    )
+
+
+def get_scores_by_date(claims: DataFrame, scores: DataFrame) -> np.ndarray:
+    """First score after each claim creation date, else last score before it.
+
+    As-of joins computing generate_claims.get_score_by_date for every claim.
+    """
+    left = claims[["CLAIM_CREATION_DATE", "DEBTOR_ID"]].reset_index()
+    left = left.sort_values("CLAIM_CREATION_DATE")
+    right = scores[["SCORE_DATE", "COMPANY_ID", "SCORE"]].sort_values("SCORE_DATE")
+    as_of_params = dict(
+        left_on="CLAIM_CREATION_DATE",
+        right_on="SCORE_DATE",
+        left_by="DEBTOR_ID",
+        right_by="COMPANY_ID",
+    )
+    next_scores = pd.merge_asof(
+        left, right, direction="forward", allow_exact_matches=False, **as_of_params
+    )
+    previous_scores = pd.merge_asof(
+        left, right, direction="backward", **as_of_params
+    )
+    score = next_scores["SCORE"].fillna(previous_scores["SCORE"])
+    return score.set_axis(next_scores["index"]).sort_index().to_numpy()
+
+
+def generate_claims(
+    rng: Generator,
+    scores: DataFrame,
+    company_ids: np.ndarray,
+    claim_probability: float,
+    claim_dates: int,
+    first_claim_index: int,
+    claim_id_key: np.ndarray,
+    reference_date: datetime,
+) -> DataFrame:
+    """Claims of `company_ids`, each sampled at `claim_probability` per date.
+
+    A sampled claim is kept with probability 1 / (score + 2), its debtor
+    score being taken at the claim creation date.
+    """
+    draws = rng.binomial(claim_dates, claim_probability, len(company_ids))
+    size = int(draws.sum())
+    claims = DataFrame(
+        {
+            "CLAIM_CREATION_DATE": _random_dates(
+                rng, reference_date, size, CLAIM_HISTORY_YEARS
+            ),
+            "DEBTOR_ID": np.repeat(company_ids, draws),
+        }
+    )
+    score = get_scores_by_date(claims=claims, scores=scores)
+    claims = claims.loc[rng.random(size) <= 1 / (score + 2)].reset_index(drop=True)
+    size = len(claims)
+    creation_date = claims["CLAIM_CREATION_DATE"]
+    update_delay = (pd.Timestamp(reference_date) - creation_date) * rng.random(size)
+    last_update_date = creation_date.where(
+        rng.random(size) <= 0.5, creation_date + update_delay.dt.floor("D")
+    )
+    initial_amount = rng.integers(MIN_CLAIM_AMOUNT, MAX_CLAIM_AMOUNT + 1, size)
+    repaid_amount = rng.integers(100, initial_amount + 1)
+    claim_indexes = np.arange(first_claim_index, first_claim_index + size)
+    prefixes = random_ids(rng, size, CLAIM_ID_SIZE - COMPANY_ID_SIZE)
+    claims["CLAIM_ID"] = prefixes + unique_ids(claim_indexes, *claim_id_key)
+    claims["CLIENT_ID"] = random_ids(rng, size, COMPANY_ID_SIZE)
+    claims["LAST_UPDATE_DATE"] = last_update_date
+    claims["INITIAL_CLAIM_AMOUNT"] = initial_amount
+    claims["CURRENT_CLAIM_AMOUNT"] = np.where(
+        last_update_date > creation_date,
+        initial_amount - repaid_amount,
+        initial_amount,
+    )
+    return claims[
+        [
+            "CLAIM_ID",
+            "CLAIM_CREATION_DATE",
+            "DEBTOR_ID",
+            "CLIENT_ID",
+            "LAST_UPDATE_DATE",
+            "INITIAL_CLAIM_AMOUNT",
+            "CURRENT_CLAIM_AMOUNT",
+        ]
+    ]
+
+
+def generate_portfolio(
+    rng: Generator,
+    company_ids: np.ndarray,
+    portfolio_share: float,
+    reference_date: datetime,
+) -> DataFrame:
+    """Monitoring periods of a `portfolio_share` of `company_ids`.
+
+    As written by the portfolio managers: the last period of a company is
+    valid, and active (no end date) for most of them, previous periods are
+    stopped and no longer valid.
+    """
+    monitored_ids = company_ids[rng.random(len(company_ids)) < portfolio_share]
+    size = len(monitored_ids)
+    periods = rng.integers(1, MAX_MONITORING_PERIODS + 1, size)
+    bounds = np.sort(
+        rng.integers(
+            0,
+            PORTFOLIO_HISTORY_YEARS * SECONDS_PER_YEAR,
+            (size, 2 * MAX_MONITORING_PERIODS),
+        ),
+        axis=1,
+    )
+    is_period = np.arange(MAX_MONITORING_PERIODS) < periods[:, None]
+    is_last = np.arange(MAX_MONITORING_PERIODS) == periods[:, None] - 1
+    is_active = is_last & (rng.random(size) < ACTIVE_MONITORING_SHARE)[:, None]
+    start = pd.Timestamp(reference_date) - pd.Timedelta(
+        seconds=PORTFOLIO_HISTORY_YEARS * SECONDS_PER_YEAR
+    )
+    start_dates = start + pd.to_timedelta(bounds[:, 0::2][is_period], unit="s")
+    end_dates = start + pd.to_timedelta(bounds[:, 1::2][is_period], unit="s")
+    return DataFrame(
+        {
+            "COMPANY_ID": np.repeat(monitored_ids, periods),
+            "VALIDITY_START_DATE": start_dates,
+            "VALIDITY_END_DATE": end_dates.where(~is_active[is_period]),
+            "IS_VALID": is_last[is_period].astype(np.int64),
+        }
+    )
+
+
+def iter_dataset_chunks(
+    companies: int,
+    max_history: int = 100,
+    claim_dates: int = 500,
+    sample_size: int = 3,
+    portfolio_share: float = 0.3,
+    seed: int = 0,
+    reference_date: Optional[datetime] = None,
+    chunk_size: int = 100000,
+) -> Iterator[Dict[str, DataFrame]]:
+    """Yield scores, claims and portfolio of `chunk_size` companies at a time.
+
+    As in generate_claims.py, `sample_size` companies are sampled for each of
+    `claim_dates` claim dates. Tables only depend on the arguments: a same
+    seed, reference date and chunk size give the same dataset.
+    """
+    reference_date = reference_date or datetime.combine(
+        datetime.now().date(), datetime.min.time()
+    )
+    rng = np.random.default_rng(seed)
+    company_id_key = rng.integers(0, 2**62, 2)
+    claim_id_key = rng.integers(0, 2**62, 2)
+    claim_probability = min(sample_size / companies, 1.0)
+    claim_count = 0
+    for first_company in range(0, companies, chunk_size):
+        company_indexes = np.arange(
+            first_company, min(first_company + chunk_size, companies)
+        )
+        company_ids = unique_ids(company_indexes, *company_id_key)
+        scores = generate_scores(
+            rng=rng,
+            company_ids=company_ids,
+            max_history=max_history,
+            reference_date=reference_date,
+        )
+        claims = generate_claims(
+            rng=rng,
+            scores=scores,
+            company_ids=company_ids,
+            claim_probability=claim_probability,
+            claim_dates=claim_dates,
+            first_claim_index=claim_count,
+            claim_id_key=claim_id_key,
+            reference_date=reference_date,
+        )
+        claim_count += len(claims)
+        portfolio = generate_portfolio(
+            rng=rng,
+            company_ids=company_ids,
+            portfolio_share=portfolio_share,
+            reference_date=reference_date,
+        )
+        yield {"scores": scores, "claims": claims, "portfolio": portfolio}
+
+
+class _TableWriter:
+    """Append DataFrame chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str, output_format: str, schema: pa.Schema):
+        self.path = path
+        self.output_format = output_format
+        self.schema = schema
+        self.rows = 0
+        self._parquet_writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, df: DataFrame) -> None:
+        if self.output_format == "csv":
+            df.to_csv(
+                self.path,
+                mode="w" if self.rows == 0 else "a",
+                header=self.rows == 0,
+                index=False,
+                date_format=CSV_DATE_FORMAT,
+            )
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def write_dataset(
+    output_dir: str, output_format: str = "csv", **generation_params
+) -> Dict[str, int]:
+    """Write iter_dataset_chunks tables to `output_dir`, one file per table.
+
+    CSV files have the columns expected by init_db.sql. Returns row counts.
+    """
+    if output_format not in ["csv", "parquet"]:
+        raise ValueError(f"Unknown output format {output_format}")
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {
+        table: _TableWriter(
+            path=os.path.join(output_dir, f"{file_name}.{output_format}"),
+            output_format=output_format,
+            schema=PARQUET_SCHEMAS[table],
+        )
+        for table, file_name in OUTPUT_FILES.items()
+    }
+    try:
+        for chunk in iter_dataset_chunks(**generation_params):
+            for table, df in chunk.items():
+                writers[table].write(df)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {table: writer.rows for table, writer in writers.items()}
@@ -0,0 +1,108 @@
+"""Timing of executor queries, reported to their QueryObserver if any."""
+import re
+import time
+from typing import Any, Mapping, Optional, Sequence
+
+from pandas import DataFrame
+
+from awesome_api.models import QueryEvent, QueryObserver
+
+# First keyword of the statement, and first table read from or written to
+STATEMENT_PATTERN = re.compile(r"^\W*(\w+)", re.ASCII)
+TABLE_PATTERN = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][\w.]*)", re.ASCII | re.IGNORECASE
+)
+# Size counted for non-text values, about their size on the wire
+FIXED_VALUE_BYTES = 8
+
+
+def query_label(query: str) -> str:
+    """Low-cardinality name of a query, e.g. "select claims"."""
+    statement = STATEMENT_PATTERN.match(query)
+    table = TABLE_PATTERN.search(query)
+    return " ".join(
+        match.group(1).lower() for match in [statement, table] if match is not None
+    )
+
+
+def estimate_rows_bytes(rows: Sequence[Mapping[str, Any]]) -> int:
+    """Size of the rows, estimated from the first one to keep it cheap."""
+    if not rows:
+        return 0
+    row_bytes = sum(
+        len(value) if isinstance(value, (str, bytes)) else FIXED_VALUE_BYTES
+        for value in rows[0].values()
+    )
+    return row_bytes * len(rows)
+
+
+class QueryTimer:
+    """Measures one query of an executor, from connection checkout to results."""
+
+    def __init__(self, observer: QueryObserver, method: str, query: str):
+        self.observer: QueryObserver = observer
+        self.method: str = method
+        self.query: str = query
+        self.rows = 0
+        self.bytes = 0
+        self._connected_at: Optional[float] = None
+
+    def __enter__(self) -> "QueryTimer":
+        self._started_at = time.perf_counter()
+        return self
+
+    def connected(self) -> None:
+        """Mark the end of the wait for a connection."""
+        self._connected_at = time.perf_counter()
+
+    def set_rows(self, rows: Sequence[Mapping[str, Any]]) -> None:
+        self.rows = len(rows)
+        self.bytes = estimate_rows_bytes(rows)
+
+    def set_df(self, df: DataFrame) -> None:
+        self.rows = len(df)
+        self.bytes = int(df.memory_usage(index=False).sum())
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        ended_at = time.perf_counter()
+        connected_at = self._connected_at or ended_at
+        self.observer.observe_query(
+            QueryEvent(
+                method=self.method,
+                label=query_label(self.query),
+                seconds=ended_at - self._started_at,
+                connection_wait_seconds=connected_at - self._started_at,
+                rows=self.rows,
+                bytes=self.bytes,
+                failed=exc_type is not None,
+            )
+        )
+
+
+class _NullQueryTimer:
+    """QueryTimer of executors without observer, doing nothing."""
+
+    def __enter__(self) -> "_NullQueryTimer":
+        return self
+
+    def connected(self) -> None:
+        pass
+
+    def set_rows(self, rows: Sequence[Mapping[str, Any]]) -> None:
+        pass
+
+    def set_df(self, df: DataFrame) -> None:
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+NULL_QUERY_TIMER = _NullQueryTimer()
+
+
+def time_query(observer: Optional[QueryObserver], method: str, query: str):
+    """Context manager timing a query, a shared no-op without observer."""
+    if observer is None:
+        return NULL_QUERY_TIMER
+    return QueryTimer(observer=observer, method=method, query=query)
@@ -0,0 +1,181 @@
+"""Counters and histograms kept in memory, rendered in Prometheus text format."""
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, from a cached query to a full update extraction
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = Lock()
+
+    def _check_labels(self, labelvalues: Sequence[str]) -> Tuple[str, ...]:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {labelvalues}"
+            )
+        return tuple(labelvalues)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        key = self._check_labels(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(tuple(labelvalues), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count of the observed values."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(map(float, buckets)))
+        # Per label values: count of each bucket (not cumulative), sum, count
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._check_labels(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            bucket_counts, totals = self._values[key]
+            bucket_counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        values = self._values.get(tuple(labelvalues))
+        return 0 if values is None else int(values[1][1])
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), list(totals)))
+                for key, (counts, totals) in self._values.items()
+            )
+        lines = []
+        bucket_labels = (*self.labelnames, "le")
+        for key, (bucket_counts, (total, count)) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*self.buckets, float("inf")), bucket_counts
+            ):
+                cumulative += bucket_count
+                labels = format_labels(bucket_labels, (*key, format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+def render_gauge(name: str, documentation: str, value: float) -> List[str]:
+    """Lines of a gauge without labels, read from elsewhere at render time."""
+    return [
+        f"# HELP {name} {_escape(documentation)}",
+        f"# TYPE {name} gauge",
+        f"{name} {format_value(value)}",
+    ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        counter = Counter(name, documentation, labelnames)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render_lines(self) -> List[str]:
+        return [line for metric in self.metrics for line in metric.render()]
@@ -0,0 +1,32 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, Callable, List, Sequence
+
+from awesome_api.errors import WrongCursorFormat
+
+
+def optional(converter: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Cursor value converter letting None through."""
+    return lambda value: None if value is None else converter(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor holding the keyset values of the last returned row."""
+    payload = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, converters: Sequence[Callable[[Any], Any]]) -> List[Any]:
+    """Decode a cursor built by encode_cursor, converting each keyset value."""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(converters):
+            raise ValueError("Unexpected number of cursor values")
+        return [converter(value) for converter, value in zip(converters, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise WrongCursorFormat(cursor=cursor, message="Invalid pagination cursor")
@@ -1,32 +1,189 @@
-from multiprocessing import Pool
-from typing import Callable, Iterable, Sequence
+import atexit
+import logging
+import os
+import time
+import traceback
+from enum import Enum
+from functools import lru_cache
+from multiprocessing.pool import Pool, ThreadPool
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 import pandas as pd
 from pandas import DataFrame
 
+from awesome_api.errors import ChunkExecutionError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ExecutorBackend(Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class ChunkResult(NamedTuple):
+    chunk_index: int
+    chunk: Sequence[Any]
+    result: Any
+    seconds: float
+
 
 def values_chunker(
-    values: Sequence[str],
+    values: Sequence[T],
     chunk_size: int,
-) -> Iterable[Sequence[str]]:
+) -> Iterable[Sequence[T]]:
     n_chunks = len(values) // chunk_size
-    if (n_chunks % chunk_size) > 0:
+    if (len(values) % chunk_size) > 0:
         n_chunks += 1
     for i in range(n_chunks):
         chunk = values[i * chunk_size : (i + 1) * chunk_size]  # noqa E203
         yield chunk
 
 
+def _run_chunk(
+    func: Callable[[Sequence[T]], R], indexed_chunk: Tuple[int, Sequence[T]]
+) -> Tuple[int, Optional[R], float, Optional[str]]:
+    # Exceptions are returned as text: they may not be picklable
+    index, chunk = indexed_chunk
+    start = time.perf_counter()
+    try:
+        result: Optional[R] = func(chunk)
+        error = None
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+    return index, result, time.perf_counter() - start, error
+
+
+class ChunkExecutor:
+    """Long-lived pool running a function on chunks of values.
+
+    Threads suit chunk queries, which mostly wait for the database, processes
+    suit CPU-bound work. The pool is created on first use, and recreated in
+    a forked child process.
+    """
+
+    def __init__(self, backend: ExecutorBackend, pool_size: int):
+        self.backend: ExecutorBackend = backend
+        self.pool_size: int = pool_size
+        self._pool: Optional[Pool] = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = Lock()
+
+    @property
+    def pool(self) -> Pool:
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid != os.getpid():
+                # Workers belong to the parent process
+                self._pool = None
+            if self._pool is None:
+                if self.backend == ExecutorBackend.THREAD:
+                    self._pool = ThreadPool(self.pool_size)
+                else:
+                    self._pool = Pool(self.pool_size)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def imap_unordered(
+        self,
+        func: Callable[[Sequence[T]], R],
+        values: Sequence[T],
+        chunk_size: int,
+    ) -> Iterator[ChunkResult]:
+        """Yield chunk results as soon as they are computed, in any order.
+
+        Raises ChunkExecutionError, identifying the chunk, when `func` fails.
+        """
+        chunks = list(values_chunker(values=values, chunk_size=chunk_size))
+        run = _ChunkRunner(func)
+        for index, result, seconds, error in self.pool.imap_unordered(
+            run, enumerate(chunks)
+        ):
+            chunk = chunks[index]
+            if error is not None:
+                raise ChunkExecutionError(
+                    chunk_index=index,
+                    chunk=chunk,
+                    message=f"Chunk {index} of {len(chunks)} failed:\n{error}",
+                )
+            logger.debug(f"Chunk {index} of {len(chunks)} done in {seconds:.3f}s")
+            yield ChunkResult(
+                chunk_index=index, chunk=chunk, result=result, seconds=seconds
+            )
+
+    def map(
+        self,
+        func: Callable[[Sequence[T]], R],
+        values: Sequence[T],
+        chunk_size: int,
+    ) -> List[ChunkResult]:
+        """imap_unordered results, in chunk order."""
+        return sorted(
+            self.imap_unordered(func=func, values=values, chunk_size=chunk_size),
+            key=lambda chunk_result: chunk_result.chunk_index,
+        )
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.close()
+                self._pool.join()
+            self._pool = None
+            self._pool_pid = None
+
+
+class _ChunkRunner:
+    """Picklable partial of _run_chunk."""
+
+    def __init__(self, func: Callable[[Sequence[Any]], Any]):
+        self.func = func
+
+    def __call__(
+        self, indexed_chunk: Tuple[int, Sequence[Any]]
+    ) -> Tuple[int, Any, float, Optional[str]]:
+        return _run_chunk(self.func, indexed_chunk)
+
+
+@lru_cache(maxsize=None)
+def get_chunk_executor(backend: ExecutorBackend, pool_size: int) -> ChunkExecutor:
+    """Process-wide executor, shared by every call with the same settings."""
+    executor = ChunkExecutor(backend=backend, pool_size=pool_size)
+    atexit.register(executor.close)
+    return executor
+
+
 def parallel_execution(
     func: Callable[..., DataFrame],
     values: Sequence[str],
     chunk_size: int,
     pool_size: int,
+    backend: ExecutorBackend = ExecutorBackend.PROCESS,
 ) -> DataFrame:
-    with Pool(pool_size) as p:
-        df_list = p.map(func, values_chunker(values=values, chunk_size=chunk_size))
-    df = pd.concat(df_list).reset_index(drop=True)
-    return df
+    executor = get_chunk_executor(backend=backend, pool_size=pool_size)
+    chunk_results = executor.map(func=func, values=values, chunk_size=chunk_size)
+    if not chunk_results:
+        return DataFrame()
+    # Chunks with no rows are left out unless all chunks are empty, as
+    # parallel_execution_arrow does
+    dfs = [chunk_result.result for chunk_result in chunk_results]
+    dfs = [df for df in dfs if not df.empty] or dfs[:1]
+    df = pd.concat(dfs)
+    return df.reset_index(drop=True)
 
 
 def dummy_func(chunk: Sequence[str]) -> DataFrame:
@@ -1,103 +1,357 @@
+import asyncio
+import logging
 import os
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Dict, List, Mapping, Optional, Sequence, cast
 
 import pandas as pd
 from dotenv import load_dotenv
 from pandas import DataFrame
-from sqlalchemy import create_engine
+from sqlalchemy import Connection, Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.sql import text
 
 from awesome_api.constants import (
+    ENV_VAR_DB_MAX_OVERFLOW,
+    ENV_VAR_DB_POOL_PRE_PING,
+    ENV_VAR_DB_POOL_RECYCLE,
+    ENV_VAR_DB_POOL_SIZE,
+    ENV_VAR_DB_POOL_TIMEOUT,
+    ENV_VAR_DB_POOL_WARM_UP,
     ENV_VAR_POSTGRES_DATABASE_URL,
     ENV_VAR_POSTGRES_DB,
     ENV_VAR_POSTGRES_PASSWORD,
     ENV_VAR_POSTGRES_USER,
 )
-from awesome_api.models import SqlRequestExecutor, TransactionalQuery
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    PoolConfig,
+    QueryObserver,
+    SqlRequestExecutor,
+    TransactionalQuery,
+)
+from awesome_api.utils.instrumentation import time_query
+from awesome_api.utils.sql_utils import PREPARED_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVER_NAME = "postgresql+asyncpg"
+# Key of the names of the statements prepared on a DBAPI connection, in its info
+PREPARED_STATEMENTS_INFO_KEY = "prepared_statements"
+
+POOL_CONFIG_ENV_VARS = {
+    "pool_size": ENV_VAR_DB_POOL_SIZE,
+    "max_overflow": ENV_VAR_DB_MAX_OVERFLOW,
+    "pool_timeout": ENV_VAR_DB_POOL_TIMEOUT,
+    "pool_recycle": ENV_VAR_DB_POOL_RECYCLE,
+    "pool_pre_ping": ENV_VAR_DB_POOL_PRE_PING,
+    "warm_up": ENV_VAR_DB_POOL_WARM_UP,
+}
+
+
+def get_pool_config() -> PoolConfig:
+    """Build the connection pool configuration from environment variables."""
+    values = {
+        field: os.environ[env_var]
+        for field, env_var in POOL_CONFIG_ENV_VARS.items()
+        if env_var in os.environ
+    }
+    return PoolConfig.model_validate(values)
+
+
+def get_db_url() -> str:
+    if ENV_VAR_POSTGRES_DATABASE_URL in os.environ:
+        # docker mode
+        db_url = os.environ[ENV_VAR_POSTGRES_DATABASE_URL]
+    else:
+        # local mode
+        load_dotenv(".env")
+        user = os.environ[ENV_VAR_POSTGRES_USER]
+        password = os.environ[ENV_VAR_POSTGRES_PASSWORD]
+        db_name = os.environ[ENV_VAR_POSTGRES_DB]
+        host = "localhost"
+        db_url = f"postgresql://{user}:{password}@{host}:5432/{db_name}"
+    return db_url
 
 
 class PostgresDataSource(SqlRequestExecutor):
-    """PostgreSQL implementation of BaseDataSource."""
+    """PostgreSQL implementation of BaseDataSource.
+
+    The engine (and its connection pool) is created lazily on first use and
+    reused by every query until `dispose` is called.
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_config: Optional[PoolConfig] = None,
+        observer: Optional[QueryObserver] = None,
+    ):
         """Class init"""
+        self.pool_config: PoolConfig = pool_config or get_pool_config()
+        self.observer: Optional[QueryObserver] = observer
+        self._engine: Optional[Engine] = None
+        self._engine_pid: Optional[int] = None
+        self._engine_lock = Lock()
+
+    @property
+    def engine(self) -> Engine:
+        with self._engine_lock:
+            if self._engine is not None and self._engine_pid != os.getpid():
+                # The engine was inherited from a parent process: connections
+                # belong to the parent and must not be closed from here.
+                self._engine.dispose(close=False)
+                self._engine = None
+            if self._engine is None:
+                self._engine = self._create_db_engine()
+                self._engine_pid = os.getpid()
+            return self._engine
 
     def run_select_query(
         self, query: str, params: Optional[Dict[str, Any]] = None
     ) -> DataFrame:
-        # Get database url
-        engine = self._create_db_engine()
-
         # Execute the query and load results into a Pandas DataFrame
-        if params:
-            df = pd.read_sql(text(query), engine, params=params)
-        else:
-            df = pd.read_sql(text(query), engine)
-        # Close the connection
-        engine.dispose()
-
+        with time_query(self.observer, "run_select_query", query) as timer:
+            with self.engine.connect() as connection:
+                timer.connected()
+                query = self._prepare(connection, query)
+                df = pd.read_sql(text(query), connection, params=params)
+            timer.set_df(df)
         return df
 
+    def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        with time_query(self.observer, "run_select_rows", query) as timer:
+            with self.engine.connect() as connection:
+                timer.connected()
+                query = self._prepare(connection, query)
+                result = connection.execute(text(query), params)
+                # RowMapping keys may also be columns, rows are read by name
+                rows = cast(Sequence[Mapping[str, Any]], result.mappings().all())
+            timer.set_rows(rows)
+        return rows
+
     def run_insert_query(
         self, query: str, params: Optional[Dict[str, Any]] = None
     ) -> None:
-        engine = self._create_db_engine()
-        with engine.connect() as connection:
-            if params:
-                connection.execute(text(query), params)
-            else:
-                connection.execute(text(query))
-        engine.dispose()
+        with time_query(self.observer, "run_insert_query", query) as timer:
+            with self.engine.begin() as connection:
+                timer.connected()
+                connection.execute(text(self._prepare(connection, query)), params)
 
     def run_update_query(
         self, query: str, params: Optional[Dict[str, Any]] = None
     ) -> None:
-        engine = self._create_db_engine()
-        with engine.connect() as connection:
-            if params:
-                connection.execute(text(query), params)
-            else:
-                connection.execute(text(query))
-        engine.dispose()
-
-    def _create_db_engine(self):
+        with time_query(self.observer, "run_update_query", query) as timer:
+            with self.engine.begin() as connection:
+                timer.connected()
+                connection.execute(text(self._prepare(connection, query)), params)
+
+    @staticmethod
+    def _prepare(connection: Connection, query: str) -> str:
+        """Query to run for `query`, prepared on the connection if registered.
+
+        Queries of PREPARED_STATEMENTS are prepared once per pooled connection
+        and then run by EXECUTE, skipping their parsing and planning.
+        """
+        statement = PREPARED_STATEMENTS.get(query)
+        if statement is None:
+            return query
+        prepared_names = connection.info.setdefault(PREPARED_STATEMENTS_INFO_KEY, set())
+        if statement.name not in prepared_names:
+            connection.exec_driver_sql(f"PREPARE {statement.name} AS {statement.query}")
+            prepared_names.add(statement.name)
+        return statement.execute_query
+
+    def _create_db_engine(self) -> Engine:
         database_url = self.get_db_url()
-        # Create a database engine
-        engine = create_engine(database_url)
+        # Create a database engine backed by a connection pool
+        engine = create_engine(
+            database_url,
+            pool_size=self.pool_config.pool_size,
+            max_overflow=self.pool_config.max_overflow,
+            pool_timeout=self.pool_config.pool_timeout,
+            pool_recycle=self.pool_config.pool_recycle,
+            pool_pre_ping=self.pool_config.pool_pre_ping,
+        )
         return engine
 
     def run_queries_in_one_transaction(self, queries: List[TransactionalQuery]) -> None:
-        engine = self._create_db_engine()
-        with engine.connect() as connection:
-            transaction = connection.begin()  # Start the transaction
-            try:
-                # Execute multiple queries
-                for query in queries:
-                    connection.execute(text(query.query), query.params)
-                # Commit the transaction if all queries succeed
-                transaction.commit()
-            except Exception as e:
-                # Roll back the transaction in case of any error
-                transaction.rollback()
-                print(f"Transaction rolled back due to: {e}")
-                raise e
+        label_query = queries[0].query if queries else ""
+        with time_query(
+            self.observer, "run_queries_in_one_transaction", label_query
+        ) as timer:
+            with self.engine.connect() as connection:
+                timer.connected()
+                transaction = connection.begin()  # Start the transaction
+                try:
+                    # Execute multiple queries
+                    for query in queries:
+                        connection.execute(
+                            text(self._prepare(connection, query.query)), query.params
+                        )
+                    # Commit the transaction if all queries succeed
+                    transaction.commit()
+                except Exception as e:
+                    # Roll back the transaction in case of any error
+                    transaction.rollback()
+                    logger.warning(f"Transaction rolled back due to: {e}")
+                    raise e
+
+    def warm_up(self) -> None:
+        """Open `pool_size` connections so that first requests skip the handshake."""
+        connections = []
+        try:
+            for _ in range(self.pool_config.pool_size):
+                connection = self.engine.connect()
+                connections.append(connection)
+                connection.execute(text("SELECT 1;"))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def dispose(self) -> None:
+        """Close every pooled connection; the engine is rebuilt on next use."""
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+                self._engine_pid = None
 
     def get_db_url(self) -> str:
-        if ENV_VAR_POSTGRES_DATABASE_URL in os.environ:
-            # docker mode
-            db_url = os.environ[ENV_VAR_POSTGRES_DATABASE_URL]
-        else:
-            # local mode
-            load_dotenv(".env")
-            user = os.environ[ENV_VAR_POSTGRES_USER]
-            password = os.environ[ENV_VAR_POSTGRES_PASSWORD]
-            db_name = os.environ[ENV_VAR_POSTGRES_DB]
-            host = "localhost"
-            db_url = f"postgresql://{user}:{password}@{host}:5432/{db_name}"
-        return db_url
+        return get_db_url()
 
     def run_sql_example(self) -> None:
         df = self.run_select_query(
             query="SELECT * FROM company_credit_scores LIMIT 10;"
         )
         print(df)
+
+
+class AsyncPostgresDataSource(AsyncSqlRequestExecutor):
+    """PostgreSQL implementation of AsyncSqlRequestExecutor, backed by asyncpg.
+
+    Like PostgresDataSource, the pooled engine is created lazily and reused
+    until `dispose` is called. Its connections are bound to the event loop
+    they were opened in. The asyncpg driver already prepares every query once
+    per connection, caching its statements by query text.
+    """
+
+    def __init__(
+        self,
+        pool_config: Optional[PoolConfig] = None,
+        observer: Optional[QueryObserver] = None,
+    ):
+        """Class init"""
+        self.pool_config: PoolConfig = pool_config or get_pool_config()
+        self.observer: Optional[QueryObserver] = observer
+        self._engine: Optional[AsyncEngine] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = self._create_db_engine()
+        return self._engine
+
+    def _create_db_engine(self) -> AsyncEngine:
+        database_url = make_url(get_db_url()).set(drivername=ASYNC_DRIVER_NAME)
+        return create_async_engine(
+            database_url,
+            pool_size=self.pool_config.pool_size,
+            max_overflow=self.pool_config.max_overflow,
+            pool_timeout=self.pool_config.pool_timeout,
+            pool_recycle=self.pool_config.pool_recycle,
+            pool_pre_ping=self.pool_config.pool_pre_ping,
+        )
+
+    async def run_select_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> DataFrame:
+        with time_query(self.observer, "run_select_query", query) as timer:
+            async with self.engine.connect() as connection:
+                timer.connected()
+                result = await connection.execute(text(query), params)
+                df = DataFrame(result.fetchall(), columns=list(result.keys()))
+            timer.set_df(df)
+        return df
+
+    async def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        with time_query(self.observer, "run_select_rows", query) as timer:
+            async with self.engine.connect() as connection:
+                timer.connected()
+                result = await connection.execute(text(query), params)
+                rows = cast(Sequence[Mapping[str, Any]], result.mappings().all())
+            timer.set_rows(rows)
+        return rows
+
+    async def run_insert_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with time_query(self.observer, "run_insert_query", query) as timer:
+            async with self.engine.begin() as connection:
+                timer.connected()
+                await connection.execute(text(query), params)
+
+    async def run_update_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with time_query(self.observer, "run_update_query", query) as timer:
+            async with self.engine.begin() as connection:
+                timer.connected()
+                await connection.execute(text(query), params)
+
+    async def run_queries_in_one_transaction(
+        self, queries: List[TransactionalQuery]
+    ) -> None:
+        label_query = queries[0].query if queries else ""
+        with time_query(
+            self.observer, "run_queries_in_one_transaction", label_query
+        ) as timer:
+            async with self.engine.connect() as connection:
+                timer.connected()
+                transaction = await connection.begin()  # Start the transaction
+                try:
+                    # Execute multiple queries
+                    for query in queries:
+                        await connection.execute(text(query.query), query.params)
+                    # Commit the transaction if all queries succeed
+                    await transaction.commit()
+                except Exception as e:
+                    # Roll back the transaction in case of any error
+                    await transaction.rollback()
+                    logger.warning(f"Transaction rolled back due to: {e}")
+                    raise e
+
+    async def warm_up(self) -> None:
+        """Open `pool_size` connections so that first requests skip the handshake."""
+        connections = [
+            self.engine.connect() for _ in range(self.pool_config.pool_size)
+        ]
+        try:
+            await asyncio.gather(*[connection.start() for connection in connections])
+            for connection in connections:
+                await connection.execute(text("SELECT 1;"))
+        finally:
+            for connection in connections:
+                await connection.close()
+
+    async def dispose(self) -> None:
+        """Close every pooled connection; the engine is rebuilt on next use."""
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
+@lru_cache(maxsize=None)
+def get_data_source() -> PostgresDataSource:
+    """Process-wide data source shared by scripts and worker processes."""
+    return PostgresDataSource()
+
+
+@lru_cache(maxsize=None)
+def get_async_data_source() -> AsyncPostgresDataSource:
+    """Process-wide asynchronous data source shared by the API handlers."""
+    return AsyncPostgresDataSource()
@@ -0,0 +1,196 @@
+"""Sampling profiler of an asyncio task, writing collapsed stacks.
+
+Collapsed stacks have one `frame;frame;...;frame count` line per distinct
+stack, from the root frame, as read by flamegraph.pl, speedscope or inferno.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from types import FrameType
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+Stack = Tuple[str, ...]
+
+# Leaf frame of the task while it is suspended on an await
+AWAIT_FRAME = "(await)"
+# Leaf frames (file name, function) of threads waiting for work or I/O
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("pool.py", "worker"),
+    ("connection.py", "_recv"),
+}
+
+
+def frame_label(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def frame_stack(leaf: FrameType, root: Optional[FrameType] = None) -> Stack:
+    """Labels of the frames from `root` (default the thread start) to `leaf`."""
+    labels = []
+    frame: Optional[FrameType] = leaf
+    while frame is not None:
+        labels.append(frame_label(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def is_running_in(leaf: FrameType, root: FrameType) -> bool:
+    frame: Optional[FrameType] = leaf
+    while frame is not None:
+        if frame is root:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def awaited_frames(awaitable: object) -> List[FrameType]:
+    """Frames of a suspended coroutine and of the coroutines it awaits."""
+    frames = []
+    while awaitable is not None:
+        # Coroutines, generators then async generators
+        for frame_attribute, await_attribute in [
+            ("cr_frame", "cr_await"),
+            ("gi_frame", "gi_yieldfrom"),
+            ("ag_frame", "ag_await"),
+        ]:
+            if hasattr(awaitable, frame_attribute):
+                frame = getattr(awaitable, frame_attribute)
+                awaitable = getattr(awaitable, await_attribute)
+                break
+        else:
+            # Futures, e.g. of asyncio.gather, end the chain
+            break
+        if frame is None:
+            break
+        frames.append(frame)
+    return frames
+
+
+def is_idle(leaf: FrameType) -> bool:
+    code = leaf.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class StackProfile:
+    """Sampled stacks with their counts."""
+
+    def __init__(self, stacks: Mapping[Stack, int], interval: float, seconds: float):
+        self.stacks: Dict[Stack, int] = dict(stacks)
+        self.interval: float = interval
+        self.seconds: float = seconds
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def breakdown(self, hot_paths: Mapping[str, Set[str]]) -> Dict[str, float]:
+        """Share of samples in each hot path, given by its function names.
+
+        A sample counts for the innermost hot path of its stack, if any.
+        """
+        shares = dict.fromkeys(hot_paths, 0.0)
+        samples = self.samples
+        for stack, count in self.stacks.items():
+            for label in reversed(stack):
+                function = label.rsplit(":", 1)[-1]
+                hot_path = next(
+                    (
+                        name
+                        for name, functions in hot_paths.items()
+                        if function in functions
+                    ),
+                    None,
+                )
+                if hot_path is not None:
+                    shares[hot_path] += count / samples
+                    break
+        return shares
+
+    def package_breakdown(self) -> Dict[str, float]:
+        """Share of samples by top-level package of their leaf frame."""
+        shares: Dict[str, float] = defaultdict(float)
+        samples = self.samples
+        for stack, count in self.stacks.items():
+            leaf = stack[-2] if stack[-1] == AWAIT_FRAME else stack[-1]
+            shares[leaf.split(":", 1)[0].split(".", 1)[0]] += count / samples
+        return dict(sorted(shares.items(), key=lambda item: item[1], reverse=True))
+
+
+class TaskSampler:
+    """Sample the stacks of an asyncio task, and of busy threads, in a thread.
+
+    The task stack is read from its event loop thread while it runs, and from
+    its coroutines while it is suspended, so that awaited queries show. Busy
+    threads other than the loop one run work offloaded by the task, but may
+    also run work of concurrent tasks.
+    """
+
+    def __init__(self, task: "asyncio.Task", interval: float = 0.001):
+        self.task: "asyncio.Task" = task
+        self.interval: float = interval
+        self._loop_thread_id: int = threading.get_ident()
+        self._stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="task-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> StackProfile:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return StackProfile(
+            stacks=self._stacks,
+            interval=self.interval,
+            seconds=time.perf_counter() - self._started_at,
+        )
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._stacks.update(self.sample())
+
+    def sample(self) -> List[Stack]:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, leaf in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+            if thread_id == self._loop_thread_id:
+                task_stack = self._task_stack(leaf)
+                if task_stack:
+                    stacks.append(task_stack)
+            elif not is_idle(leaf):
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                stacks.append((f"thread:{thread_name}", *frame_stack(leaf)))
+        return stacks
+
+    def _task_stack(self, loop_leaf: FrameType) -> Stack:
+        frames = awaited_frames(self.task.get_coro())
+        if not frames:
+            # The task is done
+            return ()
+        if is_running_in(loop_leaf, frames[0]):
+            return frame_stack(loop_leaf, root=frames[0])
+        return (*(frame_label(frame) for frame in frames), AWAIT_FRAME)
@@ -1,4 +1,9 @@
-from typing import Any, Dict, Sequence
+import re
+from threading import Lock
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+# Named parameters of text() queries, as matched by SQLAlchemy
+BIND_PARAM_PATTERN = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
 
 
 def parametrized_in_clause(size: int, prefix: str = "") -> str:
@@ -14,3 +19,108 @@ def parametrized_in_clause(size: int, prefix: str = "") -> str:
 
 def generate_param_dict(values: Sequence[str], prefix: str = "") -> Dict[str, Any]:
     return {f"{prefix}_{i}": value for i, value in enumerate(values)}
+
+
+def parametrized_values_clause(
+    size: int, columns: Sequence[str], prefix: str = ""
+) -> str:
+    if size == 0:
+        raise ValueError("Rows can not be empty")
+    rows = [
+        "(" + ", ".join([f":{prefix}_{column}_{i}" for column in columns]) + ")"
+        for i in range(size)
+    ]
+    return " VALUES " + ", ".join(rows)
+
+
+def generate_rows_param_dict(
+    rows: Sequence[Mapping[str, Any]], prefix: str = ""
+) -> Dict[str, Any]:
+    return {
+        f"{prefix}_{column}_{i}": value
+        for i, row in enumerate(rows)
+        for column, value in row.items()
+    }
+
+
+def array_in_clause(
+    values: Sequence[Any], name: str, dialect: str = "postgresql"
+) -> Tuple[str, Dict[str, Any]]:
+    """Clause and params testing that a column is in `values`.
+
+    On PostgreSQL, ` = ANY(:name)` binds the values as a single array, so that
+    the query text, and its prepared statement, are the same whatever the
+    number of values. Other dialects get the IN clause of
+    parametrized_in_clause.
+    """
+    if dialect == "postgresql":
+        return f" = ANY(:{name})", {name: list(values)}
+    clause = parametrized_in_clause(size=len(values), prefix=name)
+    return clause, generate_param_dict(values=values, prefix=name)
+
+
+class PreparedStatement(NamedTuple):
+    name: str
+    query: str  # with positional $1, $2... parameters, for PREPARE
+    execute_query: str  # EXECUTE with the named parameters of the query
+
+
+def to_prepared_statement(name: str, query: str) -> PreparedStatement:
+    param_names: List[str] = []
+    positions: Dict[str, int] = {}
+
+    def to_positional(match: "re.Match[str]") -> str:
+        param_name = match.group(1)
+        if param_name not in positions:
+            param_names.append(param_name)
+            positions[param_name] = len(param_names)
+        return f"${positions[param_name]}"
+
+    positional_query = BIND_PARAM_PATTERN.sub(to_positional, query)
+    execute_query = f"EXECUTE {name}"
+    if param_names:
+        args = ", ".join(f":{param_name}" for param_name in param_names)
+        execute_query += f" ({args})"
+    return PreparedStatement(
+        name=name,
+        query=positional_query.strip().rstrip(";"),
+        execute_query=execute_query,
+    )
+
+
+class PreparedStatementRegistry:
+    """Fixed PostgreSQL queries, registered by name by the code building them.
+
+    Executors able to do so look the texts of their queries up, and run the
+    registered ones as statements prepared once per connection.
+    """
+
+    def __init__(self):
+        self._statements: Dict[str, PreparedStatement] = {}
+        self._names: Dict[str, str] = {}
+        self._lock = Lock()
+
+    def register(self, name: str, query: str) -> str:
+        """Register `query` under `name` and return it, to build queries inline."""
+        if query not in self._statements:
+            with self._lock:
+                if self._names.get(name, query) != query:
+                    raise ValueError(
+                        f"Prepared statement {name} is registered with another query"
+                    )
+                self._names[name] = query
+                self._statements[query] = to_prepared_statement(name, query)
+        return query
+
+    def get(self, query: str) -> Optional[PreparedStatement]:
+        return self._statements.get(query)
+
+
+PREPARED_STATEMENTS = PreparedStatementRegistry()
+
+
+def named_query(name: str, query: str, dialect: str = "postgresql") -> str:
+    """Register a PostgreSQL query under `name`, others are returned as is."""
+    if dialect == "postgresql":
+        return PREPARED_STATEMENTS.register(name=name, query=query)
+    return query
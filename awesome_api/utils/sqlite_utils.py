@@ -0,0 +1,492 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from threading import RLock
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+from awesome_api.models import (
+    AsyncSqlRequestExecutor,
+    QueryObserver,
+    SqlRequestExecutor,
+    TransactionalQuery,
+)
+from awesome_api.utils.instrumentation import time_query
+from awesome_api.utils.sql_utils import PREPARED_STATEMENTS
+
+# SQLite has no timestamp type: timestamps are stored as ISO text, in the
+# format of _adapt_value so that text comparisons follow time order, and
+# parsed back when read.
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{1,6})?")
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# init_db.sql and the migrations in SQLite. Column names are lower case, as
+# PostgreSQL folds unquoted identifiers.
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS company_credit_scores (
+        score_date TIMESTAMP NOT NULL,
+        company_id VARCHAR(12) NOT NULL,
+        score INT CHECK (score BETWEEN 0 AND 5),
+        score_type CHAR(1) CHECK (score_type IN ('X', 'Y')),
+        score_id INTEGER PRIMARY KEY,
+        change_id BIGINT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS client_portfolio (
+        company_id VARCHAR(12) NOT NULL,
+        validity_start_date TIMESTAMP NOT NULL,
+        validity_end_date TIMESTAMP,
+        is_valid INT CHECK (is_valid IN (0, 1)),
+        portfolio_entry_id INTEGER PRIMARY KEY
+    );
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS client_portfolio_active_company_idx
+        ON client_portfolio (company_id)
+        WHERE validity_end_date IS NULL;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS client_orders (
+        order_date TIMESTAMP NOT NULL,
+        company_id VARCHAR(12) NOT NULL,
+        order_type VARCHAR(14) NOT NULL CHECK (
+            order_type IN ('scores', 'claims', 'score_updates', 'claim_updates')
+        )
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS claims (
+        claim_id VARCHAR(20) PRIMARY KEY,
+        claim_creation_date TIMESTAMP NOT NULL,
+        debtor_id VARCHAR(12),
+        client_id VARCHAR(12),
+        last_update_date TIMESTAMP,
+        initial_claim_amount INT NOT NULL,
+        current_claim_amount INT,
+        hashed_claim_id CHAR(64) GENERATED ALWAYS AS (hash_claim_id(claim_id)) STORED,
+        change_id BIGINT
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS company_credit_scores_company_date_idx
+        ON company_credit_scores (company_id, score_date);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS company_credit_scores_date_company_idx
+        ON company_credit_scores (score_date, company_id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS claims_debtor_creation_date_idx
+        ON claims (debtor_id, claim_creation_date, claim_id);
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS claims_update_date_idx
+        ON claims (last_update_date, claim_id);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS update_snapshots (
+        update_date DATE PRIMARY KEY,
+        created_at TIMESTAMP NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS score_update_snapshots (
+        update_date DATE NOT NULL,
+        score_date TIMESTAMP NOT NULL,
+        company_id VARCHAR(12) NOT NULL,
+        score INT
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS score_update_snapshots_date_company_idx
+        ON score_update_snapshots (update_date, company_id);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS claim_update_snapshots (
+        update_date DATE NOT NULL,
+        claim_id VARCHAR(20) NOT NULL,
+        claim_creation_date TIMESTAMP NOT NULL,
+        debtor_id VARCHAR(12),
+        last_update_date TIMESTAMP,
+        initial_claim_amount INT NOT NULL,
+        current_claim_amount INT,
+        hashed_claim_id CHAR(64) GENERATED ALWAYS AS (hash_claim_id(claim_id)) STORED,
+        PRIMARY KEY (update_date, claim_id)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS claim_update_snapshots_date_debtor_idx
+        ON claim_update_snapshots (update_date, debtor_id);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS history_cache_version (
+        id INT PRIMARY KEY CHECK (id = 1),
+        version BIGINT NOT NULL
+    );
+    """,
+    """
+    INSERT INTO history_cache_version (id, version)
+    VALUES (1, 0)
+    ON CONFLICT (id) DO NOTHING;
+    """,
+    # The change_ids sequence, and triggers in place of its column default
+    """
+    CREATE TABLE IF NOT EXISTS change_ids (
+        id INT PRIMARY KEY CHECK (id = 1),
+        last_value BIGINT NOT NULL
+    );
+    """,
+    """
+    INSERT INTO change_ids (id, last_value)
+    VALUES (1, 0)
+    ON CONFLICT (id) DO NOTHING;
+    """,
+]
+SQLITE_SCHEMA += [
+    statement
+    for table in ["company_credit_scores", "claims"]
+    for statement in [
+        f"""
+        CREATE INDEX IF NOT EXISTS {table}_change_idx ON {table} (change_id);
+        """,
+    ]
+    + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_{event}_change_id
+        AFTER {event.upper()} ON {table}
+        BEGIN
+            UPDATE change_ids SET last_value = last_value + 1;
+            UPDATE {table}
+            SET change_id = (SELECT last_value FROM change_ids)
+            WHERE rowid = NEW.rowid;
+        END;
+        """
+        for event in ["insert", "update"]
+    ]
+]
+# Tables loaded from the init_db.sql CSV files, with their date columns
+INITIAL_DATA_FILES = {
+    "company_credit_scores": ("company_credit_scores.csv", ["SCORE_DATE"]),
+    "claims": ("company_claims.csv", ["CLAIM_CREATION_DATE", "LAST_UPDATE_DATE"]),
+}
+
+
+def _greatest(*values: Any) -> Any:
+    """PostgreSQL GREATEST, ignoring NULL values."""
+    not_null_values = [value for value in values if value is not None]
+    return max(not_null_values) if not_null_values else None
+
+
+def _hash_claim_id(claim_id: Optional[str]) -> Optional[str]:
+    # Same value as claims_management.hash_claim_id
+    if claim_id is None:
+        return None
+    return hashlib.sha256(claim_id.encode()).hexdigest()
+
+
+def _register_functions(dbapi_connection: sqlite3.Connection, _) -> None:
+    dbapi_connection.create_function("GREATEST", -1, _greatest, deterministic=True)
+    dbapi_connection.create_function(
+        "hash_claim_id", 1, _hash_claim_id, deterministic=True
+    )
+
+
+def _adapt_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _adapt_parameters(
+    connection, cursor, statement, parameters, context, executemany
+) -> Tuple[str, Any]:
+    """Bind dates and timestamps as ISO text, on the engines of this module only.
+
+    sqlite3.register_adapter would change every sqlite3 connection of the
+    process.
+    """
+    if executemany:
+        parameters = [tuple(map(_adapt_value, row)) for row in parameters]
+    else:
+        parameters = tuple(map(_adapt_value, parameters))
+    return statement, parameters
+
+
+def _parse_value(value: Any) -> Any:
+    if isinstance(value, str):
+        if TIMESTAMP_PATTERN.fullmatch(value):
+            return datetime.fromisoformat(value)
+        if DATE_PATTERN.fullmatch(value):
+            return date.fromisoformat(value)
+    return value
+
+
+# PostgreSQL statements with data-modifying CTEs, which SQLite does not
+# support, run as several statements in the same transaction. They are looked
+# up by their PREPARED_STATEMENTS name and get the parameters of the original.
+SQLITE_STATEMENT_REWRITES: Dict[str, List[str]] = {
+    # changes() is the number of rows inserted by the previous statement
+    "monitor_company": [
+        """
+        INSERT INTO client_portfolio (company_id, validity_start_date, is_valid)
+        VALUES (:company_id, :insertion_date, 1)
+        ON CONFLICT (company_id) WHERE validity_end_date IS NULL DO NOTHING;
+        """,
+        """
+        UPDATE client_portfolio
+        SET
+            is_valid = 0
+        WHERE
+            company_id = :company_id
+            AND is_valid = 1
+            AND validity_end_date IS NOT NULL
+            AND changes() > 0;
+        """,
+    ],
+    # A new snapshot is told apart from an existing one by its creation time
+    "update_snapshot": [
+        """
+        INSERT INTO update_snapshots (UPDATE_DATE, CREATED_AT)
+        VALUES (:snapshot_date, :created_at)
+        ON CONFLICT (UPDATE_DATE) DO NOTHING;
+        """,
+    ]
+    + [
+        f"""
+        INSERT INTO {snapshot_table} (UPDATE_DATE, {', '.join(columns)})
+        SELECT :snapshot_date, {', '.join(columns)}
+        FROM {table}
+        WHERE {date_column} >= :update_date
+        and {date_column} < :next_day
+        and EXISTS (
+            SELECT 1 FROM update_snapshots
+            WHERE update_date = :snapshot_date and created_at = :created_at
+        );
+        """
+        for snapshot_table, table, date_column, columns in [
+            (
+                "score_update_snapshots",
+                "company_credit_scores",
+                "score_date",
+                ["score_date", "company_id", "score"],
+            ),
+            (
+                "claim_update_snapshots",
+                "claims",
+                "last_update_date",
+                [
+                    "claim_id",
+                    "claim_creation_date",
+                    "debtor_id",
+                    "last_update_date",
+                    "initial_claim_amount",
+                    "current_claim_amount",
+                ],
+            ),
+        ]
+    ],
+}
+SQLITE_STATEMENT_REWRITES["monitor_company_with_order"] = SQLITE_STATEMENT_REWRITES[
+    "monitor_company"
+] + [
+    """
+    INSERT INTO client_orders (COMPANY_ID, ORDER_DATE, ORDER_TYPE)
+    VALUES (:company_id, :insertion_date, :order_type);
+    """
+]
+
+
+def rewrite_query(query: TransactionalQuery) -> List[TransactionalQuery]:
+    """SQLite statements running `query`, see SQLITE_STATEMENT_REWRITES."""
+    statement = PREPARED_STATEMENTS.get(query.query)
+    if statement is None or statement.name not in SQLITE_STATEMENT_REWRITES:
+        return [query]
+    return [
+        TransactionalQuery(query=rewritten_query, params=query.params)
+        for rewritten_query in SQLITE_STATEMENT_REWRITES[statement.name]
+    ]
+
+
+class SqliteDataSource(SqlRequestExecutor):
+    """SQLite implementation of SqlRequestExecutor, in memory by default.
+
+    Runs the API queries with no database server, for tests and benchmarks:
+    `create_schema` and `load_initial_data` give the database of init_db.sql.
+    Queries are serialized on a single connection shared by all threads.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(
+        self, database: str = ":memory:", observer: Optional[QueryObserver] = None
+    ):
+        self.database: str = database
+        self.observer: Optional[QueryObserver] = observer
+        self._engine: Optional[Engine] = None
+        self._lock = RLock()
+
+    @property
+    def engine(self) -> Engine:
+        with self._lock:
+            if self._engine is None:
+                self._engine = self._create_db_engine()
+            return self._engine
+
+    def _create_db_engine(self) -> Engine:
+        engine = create_engine(
+            f"sqlite:///{self.database}",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", _register_functions)
+        event.listen(engine, "before_cursor_execute", _adapt_parameters, retval=True)
+        return engine
+
+    def run_select_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> DataFrame:
+        with time_query(self.observer, "run_select_query", query) as timer:
+            with self._lock, self.engine.connect() as connection:
+                timer.connected()
+                result = connection.execute(text(query), params)
+                columns = list(result.keys())
+                rows = [[_parse_value(value) for value in row] for row in result]
+            df = DataFrame(rows, columns=columns)
+            timer.set_df(df)
+        return df
+
+    def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        with time_query(self.observer, "run_select_rows", query) as timer:
+            with self._lock, self.engine.connect() as connection:
+                timer.connected()
+                rows = [
+                    {key: _parse_value(value) for key, value in row.items()}
+                    for row in connection.execute(text(query), params).mappings()
+                ]
+            timer.set_rows(rows)
+        return rows
+
+    def run_insert_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with time_query(self.observer, "run_insert_query", query) as timer:
+            with self._lock, self.engine.begin() as connection:
+                timer.connected()
+                connection.execute(text(query), params)
+
+    def run_update_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        with time_query(self.observer, "run_update_query", query) as timer:
+            with self._lock, self.engine.begin() as connection:
+                timer.connected()
+                connection.execute(text(query), params)
+
+    def run_queries_in_one_transaction(self, queries: List[TransactionalQuery]) -> None:
+        label_query = queries[0].query if queries else ""
+        with time_query(
+            self.observer, "run_queries_in_one_transaction", label_query
+        ) as timer:
+            with self._lock, self.engine.begin() as connection:
+                timer.connected()
+                for query in queries:
+                    for rewritten_query in rewrite_query(query):
+                        connection.execute(
+                            text(rewritten_query.query), rewritten_query.params
+                        )
+
+    def create_schema(self) -> None:
+        self.run_queries_in_one_transaction(
+            queries=[TransactionalQuery(query=query) for query in SQLITE_SCHEMA]
+        )
+
+    def load_initial_data(self, data_dir: str = "initial_data") -> None:
+        """Insert the CSV files loaded by init_db.sql."""
+        for table, (file_name, date_columns) in INITIAL_DATA_FILES.items():
+            df = pd.read_csv(os.path.join(data_dir, file_name))
+            rows = [
+                {
+                    column.lower(): _to_param(value, column in date_columns)
+                    for column, value in record.items()
+                }
+                for record in df.to_dict("records")
+            ]
+            columns = list(df.columns)
+            query = (
+                f"INSERT INTO {table} ({', '.join(columns)})"
+                f" VALUES ({', '.join(f':{column.lower()}' for column in columns)});"
+            )
+            with self._lock, self.engine.begin() as connection:
+                connection.execute(text(query), rows)
+
+    def dispose(self) -> None:
+        """Close the connection, an in-memory database is then lost."""
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+def _to_param(value: Any, is_date: bool) -> Any:
+    if pd.isna(value):
+        return None
+    if is_date:
+        return datetime.fromisoformat(value)
+    return value.item() if hasattr(value, "item") else value
+
+
+class AsyncSqliteDataSource(AsyncSqlRequestExecutor):
+    """AsyncSqlRequestExecutor running a SqliteDataSource in worker threads."""
+
+    dialect = "sqlite"
+
+    def __init__(self, source: Optional[SqliteDataSource] = None):
+        self.source: SqliteDataSource = source or SqliteDataSource()
+
+    # Queries are observed once, by the wrapped source
+    @property  # type: ignore[override]
+    def observer(self) -> Optional[QueryObserver]:
+        return self.source.observer
+
+    @observer.setter
+    def observer(self, observer: Optional[QueryObserver]) -> None:
+        self.source.observer = observer
+
+    async def run_select_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> DataFrame:
+        return await asyncio.to_thread(self.source.run_select_query, query, params)
+
+    async def run_select_rows(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> Sequence[Mapping[str, Any]]:
+        return await asyncio.to_thread(self.source.run_select_rows, query, params)
+
+    async def run_insert_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        await asyncio.to_thread(self.source.run_insert_query, query, params)
+
+    async def run_update_query(
+        self, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> None:
+        await asyncio.to_thread(self.source.run_update_query, query, params)
+
+    async def run_queries_in_one_transaction(
+        self, queries: List[TransactionalQuery]
+    ) -> None:
+        await asyncio.to_thread(self.source.run_queries_in_one_transaction, queries)
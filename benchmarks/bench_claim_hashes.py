@@ -0,0 +1,55 @@
+"""Cost of hashing claim ids on every request vs reading the stored hash.
+
+Run from the repository root, sizes are comma separated row counts :
+
+    python -m benchmarks.bench_claim_hashes sizes=10000,100000,1000000
+"""
+import time
+from typing import Callable
+
+from awesome_api.claims_management import (
+    get_claim_info_cp,
+    get_claim_info_records,
+    hash_claim_id,
+    hash_claim_ids,
+)
+from awesome_api.entry_points import make_executable
+from benchmarks.bench_claims import generate_claims_df
+
+
+def seconds(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+@make_executable()
+def main(sizes: str = "10000,100000,1000000"):
+    columns = {
+        "cp rehash": "get_claim_info_cp, hashes computed",
+        "cp stored": "get_claim_info_cp, hashed_claim_id selected",
+        "rows cold": "get_claim_info_records, empty hash memo",
+        "rows memo": "get_claim_info_records, warm hash memo",
+        "rows stored": "get_claim_info_records, hashed_claim_id selected",
+    }
+    for name, description in columns.items():
+        print(f"{name:>11} : {description}")
+    print(f"{'rows':>10} | " + " | ".join(f"{name + ' (s)':>15}" for name in columns))
+    for size in [int(size) for size in sizes.split(",")]:
+        df = generate_claims_df(size=size)
+        hashed_df = df.assign(hashed_claim_id=hash_claim_ids(df["claim_id"]))
+        rows = df.to_dict("records")
+        hashed_rows = hashed_df.to_dict("records")
+        hash_claim_id.cache_clear()
+        results = [
+            seconds(lambda: get_claim_info_cp(df)),
+            seconds(lambda: get_claim_info_cp(hashed_df)),
+            seconds(lambda: get_claim_info_records(rows)),
+            seconds(lambda: get_claim_info_records(rows)),
+            seconds(lambda: get_claim_info_records(hashed_rows)),
+        ]
+        print(f"{size:>10} | " + " | ".join(f"{result:>15.3f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Throughput of the claim transformation pipelines.
+
+Run from the repository root, sizes are comma separated row counts :
+
+    python -m benchmarks.bench_claims sizes=10000,100000,1000000
+"""
+import time
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from awesome_api.claims_management import (
+    get_claim_info,
+    get_claim_info_cp,
+    hash_claim_id,
+    set_claim_size,
+)
+from awesome_api.entry_points import make_executable
+from awesome_api.models import ClaimInfo, ClaimStatus
+
+
+def generate_claims_df(size: int, seed: int = 0) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    initial_claim_amount = rng.integers(10000, 1000000, size)
+    current_claim_amount = np.where(
+        rng.random(size) < 0.3, 0, rng.integers(0, initial_claim_amount)
+    )
+    creation_offsets = pd.to_timedelta(rng.integers(0, 5 * 365, size), unit="D")
+    update_offsets = pd.to_timedelta(rng.integers(0, 365, size), unit="D")
+    claim_creation_date = pd.Timestamp("2020-01-01") + creation_offsets
+    return DataFrame(
+        {
+            "claim_creation_date": claim_creation_date,
+            "debtor_id": [f"COMPANY{i % 5000:05d}" for i in range(size)],
+            "claim_id": [f"CLAIM{i:015d}" for i in range(size)],
+            "initial_claim_amount": initial_claim_amount,
+            "current_claim_amount": current_claim_amount,
+            "last_update_date": claim_creation_date + update_offsets,
+        }
+    )
+
+
+def legacy_get_claim_info_cp(df: DataFrame) -> List[ClaimInfo]:
+    """get_claim_info_cp before vectorization, kept as a reference."""
+    cp = df.copy()
+    cp["claim_creation_date"] = cp["claim_creation_date"].dt.strftime("%Y-%m")
+    cp["company_id"] = cp["debtor_id"]
+    cp["hashed_claim_id"] = cp["claim_id"].apply(hash_claim_id)
+    cp["claim_size"] = cp["initial_claim_amount"].apply(set_claim_size)
+    cp["claim_status"] = ClaimStatus.NOT_SETTLED
+    cp.loc[
+        cp["current_claim_amount"] < (cp["initial_claim_amount"] / 2), "claim_status"
+    ] = ClaimStatus.PARTIALLY_SETTLED
+    cp.loc[cp["current_claim_amount"] == 0, "claim_status"] = ClaimStatus.SETTLED
+    cp["claim_status_date"] = cp["last_update_date"].dt.strftime("%Y-%m-%d")
+    return [ClaimInfo.model_validate(record) for record in cp.to_dict("records")]
+
+
+def rows_per_second(func: Callable[[DataFrame], List[ClaimInfo]], df: DataFrame):
+    start = time.perf_counter()
+    func(df)
+    return len(df) / (time.perf_counter() - start)
+
+
+@make_executable()
+def main(
+    sizes: str = "10000,100000,1000000",
+    max_row_by_row_size: str = "100000",
+):
+    implementations = {
+        "get_claim_info": get_claim_info,
+        "legacy_get_claim_info_cp": legacy_get_claim_info_cp,
+        "get_claim_info_cp": get_claim_info_cp,
+    }
+    print(f"{'rows':>10} | " + " | ".join(f"{name:>24}" for name in implementations))
+    for size in [int(size) for size in sizes.split(",")]:
+        df = generate_claims_df(size=size)
+        results = []
+        for name, func in implementations.items():
+            if name == "get_claim_info" and size > int(max_row_by_row_size):
+                results.append(f"{'skipped':>24}")
+            else:
+                results.append(f"{rows_per_second(func, df):>18,.0f} rows/s")
+        print(f"{size:>10} | " + " | ".join(results))
+
+
+if __name__ == "__main__":
+    main()
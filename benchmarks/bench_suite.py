@@ -0,0 +1,229 @@
+"""Benchmarks of the API hot paths, compared to an optional saved baseline.
+
+Groups other than `claims` run against the DATABASE_URL database, seeded with
+benchmarks.seed_database, or with `database=sqlite` against an in-memory
+SQLite database loaded with initial_data. From the repository root :
+
+    python -m benchmarks.bench_suite save=baseline.json
+    python -m benchmarks.bench_suite baseline=baseline.json tolerance=0.2
+    python -m benchmarks.bench_suite database=sqlite companies=50
+
+Exits with status 1 when a metric regressed by more than `tolerance`. Note
+that /scores and /claims log orders and monitor the requested companies.
+"""
+import sys
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import cycle, product
+from typing import Callable, Dict, List, Optional
+
+from fastapi.testclient import TestClient
+
+from awesome_api.claims_management import get_claim_info, get_claim_info_cp
+from awesome_api.entry_points import make_executable
+from awesome_api.fastapi_views import app
+from awesome_api.models import SqlRequestExecutor
+from awesome_api.portfolio_management import SqlPortfolioManager
+from awesome_api.update_management import get_score_updates_companies
+from awesome_api.utils.postgres_utils import get_async_data_source, get_data_source
+from awesome_api.utils.sqlite_utils import AsyncSqliteDataSource, SqliteDataSource
+from benchmarks.bench_claims import generate_claims_df
+from benchmarks.harness import (
+    BenchmarkResult,
+    find_regressions,
+    load_results,
+    measure,
+    print_results,
+    save_results,
+)
+
+BENCH_COMPANY_PREFIX = "BENCH"
+
+
+def bench_claims(runs: int, claim_rows: int) -> List[BenchmarkResult]:
+    df = generate_claims_df(size=claim_rows)
+    return [
+        measure(
+            name=f"{func.__name__}[{claim_rows}]",
+            func=partial(func, df),
+            runs=runs,
+            items_per_run=claim_rows,
+        )
+        for func in [get_claim_info_cp, get_claim_info]
+    ]
+
+
+def bench_portfolio(runs: int, db: SqlRequestExecutor) -> List[BenchmarkResult]:
+    """add_company of new companies, removed from the portfolio afterwards."""
+    manager = SqlPortfolioManager(executor=db)
+    # 12 characters, as company ids
+    run_prefix = f"{BENCH_COMPANY_PREFIX}{uuid.uuid4().hex[:3].upper()}"
+    company_ids = iter(f"{run_prefix}{i:04d}" for i in range(10000))
+    try:
+        return [
+            measure(
+                name="SqlPortfolioManager.add_company",
+                func=lambda: manager.add_company(
+                    company_id=next(company_ids), insertion_date=datetime.now()
+                ),
+                runs=runs,
+            )
+        ]
+    finally:
+        db.run_update_query(
+            query="DELETE FROM client_portfolio WHERE company_id LIKE :prefix;",
+            params={"prefix": f"{run_prefix}%"},
+        )
+
+
+def get_latest_update_date(db: SqlRequestExecutor) -> datetime:
+    rows = db.run_select_rows(
+        query="SELECT MAX(score_date) AS score_date FROM company_credit_scores;"
+    )
+    return datetime.combine(rows[0]["score_date"].date(), datetime.min.time())
+
+
+def get_benchmark_companies(db: SqlRequestExecutor, limit: int) -> List[str]:
+    rows = db.run_select_rows(
+        query=(
+            "SELECT DISTINCT company_id FROM company_credit_scores"
+            " ORDER BY company_id LIMIT :limit;"
+        ),
+        params={"limit": limit},
+    )
+    return [row["company_id"] for row in rows]
+
+
+def bench_updates(
+    runs: int,
+    db: SqlRequestExecutor,
+    companies: List[str],
+    chunk_sizes: List[int],
+    pool_sizes: List[int],
+) -> List[BenchmarkResult]:
+    update_date = get_latest_update_date(db)
+    call_date = update_date + timedelta(days=1)
+    return [
+        measure(
+            name=f"get_score_updates_companies[chunk={chunk_size},pool={pool_size}]",
+            func=partial(
+                get_score_updates_companies,
+                companies=companies,
+                update_date=update_date,
+                call_date=call_date,
+                chunk_size=chunk_size,
+                pool_size=pool_size,
+                executor=db,
+            ),
+            runs=runs,
+            items_per_run=len(companies),
+        )
+        for chunk_size, pool_size in product(chunk_sizes, pool_sizes)
+    ]
+
+
+def bench_api(
+    runs: int, db: SqlRequestExecutor, companies: List[str]
+) -> List[BenchmarkResult]:
+    update_date = get_latest_update_date(db).strftime("%Y-%m-%d")
+    if isinstance(db, SqliteDataSource):
+        app.dependency_overrides[get_async_data_source] = lambda: (
+            AsyncSqliteDataSource(source=db)
+        )
+
+    def get(path: Callable[[], str]) -> Callable[[], None]:
+        def request() -> None:
+            client.get(path()).raise_for_status()
+
+        return request
+
+    score_companies, claim_companies = cycle(companies), cycle(companies)
+    try:
+        with TestClient(app) as client:
+            return [
+                measure(
+                    name="GET /{company_id}/scores",
+                    func=get(lambda: f"/{next(score_companies)}/scores"),
+                    runs=runs,
+                ),
+                measure(
+                    name="GET /{company_id}/claims",
+                    func=get(lambda: f"/{next(claim_companies)}/claims"),
+                    runs=runs,
+                ),
+                measure(
+                    name="GET /updates",
+                    func=get(lambda: f"/updates?input_update_date={update_date}"),
+                    runs=runs,
+                ),
+            ]
+    finally:
+        app.dependency_overrides.pop(get_async_data_source, None)
+
+
+def get_benchmark_database(database: str) -> SqlRequestExecutor:
+    if database == "sqlite":
+        source = SqliteDataSource()
+        source.create_schema()
+        source.load_initial_data()
+        return source
+    return get_data_source()
+
+
+@make_executable()
+def main(
+    groups: str = "claims,portfolio,updates,api",
+    runs: str = "20",
+    claim_rows: str = "10000",
+    companies: str = "1000",
+    chunk_sizes: str = "100,1000",
+    pool_sizes: str = "2,4",
+    database: str = "postgres",
+    baseline: Optional[str] = None,
+    save: Optional[str] = None,
+    tolerance: str = "0.2",
+):
+    selected_groups = groups.split(",")
+    n_runs = int(runs)
+    results: List[BenchmarkResult] = []
+    if set(selected_groups) - {"claims"}:
+        db = get_benchmark_database(database)
+    if "claims" in selected_groups:
+        results += bench_claims(runs=n_runs, claim_rows=int(claim_rows))
+    if "portfolio" in selected_groups:
+        results += bench_portfolio(runs=n_runs, db=db)
+    if "updates" in selected_groups or "api" in selected_groups:
+        company_ids = get_benchmark_companies(db=db, limit=int(companies))
+    if "updates" in selected_groups:
+        results += bench_updates(
+            runs=n_runs,
+            db=db,
+            companies=company_ids,
+            chunk_sizes=[int(size) for size in chunk_sizes.split(",")],
+            pool_sizes=[int(size) for size in pool_sizes.split(",")],
+        )
+    if "api" in selected_groups:
+        results += bench_api(runs=n_runs, db=db, companies=company_ids)
+    baseline_results: Optional[Dict[str, BenchmarkResult]] = (
+        None if baseline is None else load_results(baseline)
+    )
+    print_results(results, baseline=baseline_results)
+    if save is not None:
+        save_results(results, save)
+    if baseline_results is not None:
+        regressions = find_regressions(
+            results, baseline=baseline_results, tolerance=float(tolerance)
+        )
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression.name} {regression.metric}:"
+                f" {regression.baseline:.6g} -> {regression.current:.6g}"
+                f" ({regression.change:+.1%})"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
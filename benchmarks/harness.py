@@ -0,0 +1,138 @@
+"""Timing, memory and baseline comparison helpers of the benchmark suite."""
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    runs: int
+    items_per_run: int
+    throughput: float  # items per second
+    p50: float  # seconds per run
+    p99: float
+    peak_memory: int  # peak bytes allocated by python in this process during a run
+
+
+class Regression(BaseModel):
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    runs: int,
+    items_per_run: int = 1,
+    warmup: int = 1,
+) -> BenchmarkResult:
+    """Time `runs` calls of `func`, then trace the memory of one more call.
+
+    Memory is traced apart from timed runs, tracemalloc slowing allocations.
+    """
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    p50, p99 = np.percentile(durations, [50, 99])
+    return BenchmarkResult(
+        name=name,
+        runs=runs,
+        items_per_run=items_per_run,
+        throughput=items_per_run * runs / sum(durations),
+        p50=p50,
+        p99=p99,
+        peak_memory=peak_memory,
+    )
+
+
+def save_results(results: List[BenchmarkResult], path: str) -> None:
+    with open(path, "w") as file:
+        json.dump([result.model_dump() for result in results], file, indent=2)
+
+
+def load_results(path: str) -> Dict[str, BenchmarkResult]:
+    with open(path) as file:
+        return {
+            result["name"]: BenchmarkResult.model_validate(result)
+            for result in json.load(file)
+        }
+
+
+def find_regressions(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, BenchmarkResult],
+    tolerance: float,
+) -> List[Regression]:
+    """Metrics worse than their baseline by more than `tolerance` (0.1 = 10%).
+
+    Throughput should not drop, latencies and peak memory should not grow.
+    Benchmarks missing from the baseline are not compared.
+    """
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        reference = baseline[result.name]
+        for metric, higher_is_better in [
+            ("throughput", True),
+            ("p50", False),
+            ("p99", False),
+            ("peak_memory", False),
+        ]:
+            base_value = float(getattr(reference, metric))
+            value = float(getattr(result, metric))
+            worse = (
+                value < base_value * (1 - tolerance)
+                if higher_is_better
+                else value > base_value * (1 + tolerance)
+            )
+            if worse and base_value > 0:
+                regressions.append(
+                    Regression(
+                        name=result.name,
+                        metric=metric,
+                        baseline=base_value,
+                        current=value,
+                    )
+                )
+    return regressions
+
+
+def print_results(
+    results: List[BenchmarkResult],
+    baseline: Optional[Dict[str, BenchmarkResult]] = None,
+) -> None:
+    print(
+        f"{'benchmark':<48} | {'items/s':>12} | {'p50 (ms)':>10} | {'p99 (ms)':>10}"
+        f" | {'peak (MiB)':>10} | {'vs baseline':>11}"
+    )
+    for result in results:
+        comparison = ""
+        if baseline and result.name in baseline:
+            change = result.throughput / baseline[result.name].throughput - 1
+            comparison = f"{change:+.1%}"
+        print(
+            f"{result.name:<48} | {result.throughput:>12,.1f}"
+            f" | {result.p50 * 1000:>10.2f} | {result.p99 * 1000:>10.2f}"
+            f" | {result.peak_memory / 2**20:>10.2f} | {comparison:>11}"
+        )
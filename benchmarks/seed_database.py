@@ -0,0 +1,74 @@
+"""Load a generated dataset into the DATABASE_URL database, for benchmarks.
+
+Rows are appended, run it against a fresh database created by init_db.sql and
+migrate_db. From the repository root :
+
+    python -m benchmarks.seed_database companies=100000 claim_dates=1000000
+"""
+import io
+from datetime import datetime
+from typing import Optional
+
+from pandas import DataFrame
+
+from awesome_api.entry_points import make_executable
+from awesome_api.utils.generate_dataset import CSV_DATE_FORMAT, iter_dataset_chunks
+from awesome_api.utils.postgres_utils import get_data_source
+
+TABLES = {
+    "scores": "company_credit_scores",
+    "claims": "claims",
+    "portfolio": "client_portfolio",
+}
+
+
+def copy_df(cursor, table: str, df: DataFrame) -> None:
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format=CSV_DATE_FORMAT)
+    buffer.seek(0)
+    columns = ", ".join(df.columns)
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH CSV", buffer)
+
+
+@make_executable()
+def main(
+    companies: str = "10000",
+    max_history: str = "100",
+    claim_dates: str = "100000",
+    portfolio_share: str = "0.3",
+    seed: str = "0",
+    reference_date: Optional[str] = None,
+    chunk_size: str = "100000",
+):
+    connection = get_data_source().engine.raw_connection()
+    row_counts = dict.fromkeys(TABLES, 0)
+    try:
+        cursor = connection.cursor()
+        for chunk in iter_dataset_chunks(
+            companies=int(companies),
+            max_history=int(max_history),
+            claim_dates=int(claim_dates),
+            portfolio_share=float(portfolio_share),
+            seed=int(seed),
+            reference_date=(
+                None
+                if reference_date is None
+                else datetime.strptime(reference_date, "%Y-%m-%d")
+            ),
+            chunk_size=int(chunk_size),
+        ):
+            for name, df in chunk.items():
+                copy_df(cursor=cursor, table=TABLES[name], df=df)
+                row_counts[name] += len(df)
+            connection.commit()
+        for table in TABLES.values():
+            cursor.execute(f"ANALYZE {table};")
+        connection.commit()
+    finally:
+        connection.close()
+    for name, rows in row_counts.items():
+        print(f"Loaded {rows} rows into {TABLES[name]}")
+
+
+if __name__ == "__main__":
+    main()
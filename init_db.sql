@@ -13,6 +13,11 @@ CREATE TABLE IF NOT EXISTS client_portfolio (
     PORTFOLIO_ENTRY_ID SERIAL PRIMARY KEY
 );
 
+-- At most one active (not stopped) monitoring per company
+CREATE UNIQUE INDEX IF NOT EXISTS client_portfolio_active_company_idx
+    ON client_portfolio (COMPANY_ID)
+    WHERE VALIDITY_END_DATE IS NULL;
+
 CREATE TABLE IF NOT EXISTS client_orders (
     ORDER_DATE TIMESTAMP NOT NULL,
     COMPANY_ID VARCHAR(12) NOT NULL,
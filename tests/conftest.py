@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from awesome_api.api_metrics import get_api_metrics
+from awesome_api.fastapi_views import app
+from awesome_api.history_cache import get_history_cache
+from awesome_api.models import QueryEvent, QueryObserver
+from awesome_api.order_logging import get_order_buffer
+from awesome_api.portfolio_index import get_portfolio_index
+from awesome_api.request_profiling import get_request_profiler
+from awesome_api.utils.postgres_utils import get_async_data_source
+from awesome_api.utils.sqlite_utils import AsyncSqliteDataSource, SqliteDataSource
+
+# Process-wide singletons configured from environment variables
+CACHED_GETTERS = [
+    get_api_metrics,
+    get_history_cache,
+    get_order_buffer,
+    get_portfolio_index,
+    get_request_profiler,
+]
+
+
+class RecordingObserver(QueryObserver):
+    def __init__(self):
+        self.events = []
+
+    def observe_query(self, event: QueryEvent) -> None:
+        self.events.append(event)
+
+
+@pytest.fixture
+def sqlite_source():
+    """In-memory database of init_db.sql, with a RecordingObserver."""
+    source = SqliteDataSource(observer=RecordingObserver())
+    source.create_schema()
+    source.load_initial_data()
+    yield source
+    source.dispose()
+
+
+@pytest.fixture
+def sqlite_client(request, monkeypatch, sqlite_source):
+    """TestClient of the API on `sqlite_source`.
+
+    Parametrize it indirectly with a dict of environment variables to set
+    before the app starts, e.g. to enable a feature.
+    """
+    for env_var, value in getattr(request, "param", {}).items():
+        monkeypatch.setenv(env_var, value)
+    for getter in CACHED_GETTERS:
+        getter.cache_clear()
+    app.dependency_overrides[get_async_data_source] = lambda: AsyncSqliteDataSource(
+        source=sqlite_source
+    )
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+        for getter in CACHED_GETTERS:
+            getter.cache_clear()
@@ -0,0 +1,63 @@
+import pytest
+
+from awesome_api.constants import ENV_VAR_METRICS_ENABLED
+from awesome_api.utils.instrumentation import query_label
+from awesome_api.utils.metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "latency_seconds", "Latency.", ["route"], buckets=[0.1, 1]
+    )
+    for value in [0.05, 0.1, 0.5, 2]:
+        histogram.observe(value, "/a")
+    assert registry.render_lines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 2.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_query_label():
+    assert query_label("SELECT * FROM claims WHERE x = 1") == "select claims"
+    assert query_label("\n  insert into client_orders (a) VALUES (1)") == (
+        "insert client_orders"
+    )
+    assert query_label("SELECT 1;") == "select"
+
+
+def test_executor_reports_rows_and_failures(sqlite_source):
+    rows = sqlite_source.run_select_rows(query="SELECT * FROM claims LIMIT 5;")
+    with pytest.raises(Exception):
+        sqlite_source.run_select_rows(query="SELECT * FROM missing_table;")
+    select_event, failed_event = sqlite_source.observer.events[-2:]
+    assert (select_event.label, select_event.rows) == ("select claims", len(rows))
+    assert select_event.bytes > 0 and not select_event.failed
+    assert failed_event.failed and failed_event.rows == 0
+    assert 0 <= select_event.connection_wait_seconds <= select_event.seconds
+
+
+@pytest.mark.parametrize(
+    "sqlite_client", [{ENV_VAR_METRICS_ENABLED: "true"}], indirect=True
+)
+def test_metrics_route_labels_queries_with_request_routes(sqlite_client):
+    sqlite_client.get("/ZXGCPOL1WVGN/claims")
+    metrics = sqlite_client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    labels = (
+        'route="/{company_id}/claims",method="run_select_rows",query="select claims"'
+    )
+    assert f"awesome_query_duration_seconds_count{{{labels}}} 1" in metrics.text
+    assert (
+        'awesome_request_duration_seconds_count{method="GET",'
+        'route="/{company_id}/claims",status="200"} 1'
+    ) in metrics.text
+
+
+def test_metrics_route_is_disabled_by_default(sqlite_client):
+    assert sqlite_client.get("/metrics").status_code == 404
@@ -0,0 +1,123 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from awesome_api.constants import ENV_VAR_ARROW_TRANSFER_DIR
+from awesome_api.errors import ChunkExecutionError
+from awesome_api.utils import arrow_transfer
+from awesome_api.utils.arrow_transfer import (
+    SHARED_MEMORY_DIR,
+    ArrowResultWriter,
+    get_transfer_dir,
+    iter_record_batches,
+    parallel_execution_arrow,
+    read_arrow_result,
+)
+from awesome_api.utils.parallel_extraction import ExecutorBackend, parallel_execution
+
+
+def claims_chunk(chunk):
+    if "c_4" in chunk:
+        # No rows, as read_sql returns for companies without updates
+        return pd.DataFrame({"debtor_id": [], "amount": [], "last_update_date": []})
+    return pd.DataFrame(
+        {
+            "debtor_id": list(chunk),
+            "amount": [None if i % 2 else i for i in range(len(chunk))],
+            "last_update_date": pd.Timestamp("2024-04-14")
+            + pd.to_timedelta(range(len(chunk)), unit="h"),
+        }
+    )
+
+
+def scores_chunk(chunk):
+    # read_sql gives int64 scores, or float64 ones in chunks with a NULL score
+    scores = [None if value == "c_3" else 2 for value in chunk]
+    return pd.DataFrame({"company_id": list(chunk), "score": scores})
+
+
+def failing_chunk(chunk):
+    raise ValueError(chunk[0])
+
+
+def shared_memory_files():
+    return set(os.listdir(SHARED_MEMORY_DIR)) if SHARED_MEMORY_DIR else set()
+
+
+def test_arrow_transfer_matches_pickled_results():
+    values = [f"c_{i}" for i in range(11)]
+    expected = parallel_execution(
+        func=claims_chunk,
+        values=values,
+        chunk_size=4,
+        pool_size=2,
+        backend=ExecutorBackend.THREAD,
+    )
+    table = parallel_execution_arrow(
+        func=claims_chunk, values=values, chunk_size=4, pool_size=2
+    )
+    pd.testing.assert_frame_equal(table.to_pandas(), expected)
+
+
+def test_arrow_transfer_promotes_integers_of_chunks_with_nulls():
+    values = [f"c_{i}" for i in range(4)]
+    expected = parallel_execution(
+        func=scores_chunk,
+        values=values,
+        chunk_size=2,
+        pool_size=2,
+        backend=ExecutorBackend.THREAD,
+    )
+    table = parallel_execution_arrow(
+        func=scores_chunk, values=values, chunk_size=2, pool_size=2
+    )
+    pd.testing.assert_frame_equal(table.to_pandas(), expected)
+
+
+def test_record_batches_are_streamed_and_files_removed():
+    before = shared_memory_files()
+    values = [f"c_{i}" for i in range(11)]
+    batches = list(
+        iter_record_batches(func=claims_chunk, values=values, chunk_size=4, pool_size=2)
+    )
+    debtor_ids = [id_ for batch in batches for id_ in batch["debtor_id"].to_pylist()]
+    assert sorted(debtor_ids) == sorted(values[:4] + values[8:])
+    assert shared_memory_files() == before
+
+
+def test_arrow_transfer_failure_removes_files():
+    before = shared_memory_files()
+    with pytest.raises(ChunkExecutionError) as error:
+        parallel_execution_arrow(
+            func=failing_chunk, values=["c_0", "c_1"], chunk_size=1, pool_size=2
+        )
+    assert error.value.chunk_index in [0, 1]
+    assert shared_memory_files() == before
+
+
+def test_transfer_dir_is_configurable(monkeypatch):
+    monkeypatch.setenv(ENV_VAR_ARROW_TRANSFER_DIR, "/data/transfer")
+    assert get_transfer_dir() == "/data/transfer"
+    monkeypatch.setenv(ENV_VAR_ARROW_TRANSFER_DIR, "")
+    assert get_transfer_dir() is None
+
+
+def test_writer_falls_back_when_directory_is_full(monkeypatch, tmp_path):
+    directory, fallback_directory = tmp_path / "shm", tmp_path / "tmp"
+    directory.mkdir()
+    fallback_directory.mkdir()
+    monkeypatch.setattr(
+        arrow_transfer.shutil,
+        "disk_usage",
+        lambda path: SimpleNamespace(free=0 if path == str(directory) else 10**9),
+    )
+    writer = ArrowResultWriter(
+        func=claims_chunk,
+        directory=str(directory),
+        fallback_directory=str(fallback_directory),
+    )
+    path = writer(["c_0", "c_1"])
+    assert os.path.dirname(path) == str(fallback_directory)
+    assert read_arrow_result(path).num_rows == 2
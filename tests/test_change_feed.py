@@ -0,0 +1,11 @@
+from awesome_api.change_feed import decode_change_cursor, encode_change_cursor
+
+
+def test_change_cursor_round_trip():
+    cursor = encode_change_cursor(after_change_id=42)
+    assert decode_change_cursor(cursor) == 42
+
+
+def test_change_cursor_of_feed_not_started():
+    assert decode_change_cursor(None) is None
+    assert decode_change_cursor(encode_change_cursor(after_change_id=None)) is None
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pandas as pd
+
+from awesome_api.claims_management import (
+    get_claim_info_cp,
+    get_claim_info_records,
+    hash_claim_id,
+    set_claim_size,
+    set_claim_sizes,
+    set_claim_statuses,
+)
+from awesome_api.models import ClaimSize, ClaimStatus
+
+
+def test_set_claim_sizes_matches_set_claim_size():
+    amounts = pd.Series([0, 19999, 20000, 29999, 30000, 99999, 100000, 499999, 500000])
+    assert list(set_claim_sizes(amounts)) == [set_claim_size(a) for a in amounts]
+
+
+def test_set_claim_statuses():
+    statuses = set_claim_statuses(
+        pd.Series([100, 100, 100, 100]), pd.Series([0, 49, 50, 100])
+    )
+    assert list(statuses) == [
+        ClaimStatus.SETTLED,
+        ClaimStatus.PARTIALLY_SETTLED,
+        ClaimStatus.NOT_SETTLED,
+        ClaimStatus.NOT_SETTLED,
+    ]
+
+
+CLAIMS_DF = pd.DataFrame(
+    {
+        "claim_creation_date": [datetime(2024, 3, 5, 10, 30), datetime(2023, 1, 1)],
+        "debtor_id": ["COMPANY", "OTHER"],
+        "claim_id": ["CLAIM", "OTHER_CLAIM"],
+        "initial_claim_amount": [25000, 700000],
+        "current_claim_amount": [0, 200000],
+        "last_update_date": [datetime(2024, 4, 1, 8), datetime(2023, 2, 1)],
+    }
+)
+
+
+def test_get_claim_info_cp():
+    df = CLAIMS_DF.iloc[:1]
+    [claim] = get_claim_info_cp(df)
+    assert claim.claim_creation_date == "2024-03"
+    assert claim.company_id == "COMPANY"
+    assert claim.hashed_claim_id == hash_claim_id("CLAIM")
+    assert claim.claim_size == ClaimSize.S
+    assert claim.claim_status == ClaimStatus.SETTLED
+    assert claim.claim_status_date == "2024-04-01"
+    assert get_claim_info_cp(df.iloc[:0]) == []
+
+
+def test_get_claim_info_records_matches_get_claim_info_cp():
+    rows = CLAIMS_DF.to_dict("records")
+    assert get_claim_info_records(rows) == [
+        claim.model_dump() for claim in get_claim_info_cp(CLAIMS_DF)
+    ]
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from awesome_api.utils.generate_claims import get_score_by_date
+from awesome_api.utils.generate_dataset import (
+    generate_scores,
+    get_scores_by_date,
+    iter_dataset_chunks,
+    unique_ids,
+    write_dataset,
+)
+
+REFERENCE_DATE = datetime(2025, 1, 1)
+PARAMS = dict(
+    companies=250,
+    claim_dates=2000,
+    seed=3,
+    reference_date=REFERENCE_DATE,
+    chunk_size=100,
+)
+
+
+def concat_chunks(chunks):
+    return {
+        table: pd.concat([chunk[table] for chunk in chunks], ignore_index=True)
+        for table in chunks[0]
+    }
+
+
+def test_dataset_is_deterministic_under_a_seed():
+    first = concat_chunks(list(iter_dataset_chunks(**PARAMS)))
+    second = concat_chunks(list(iter_dataset_chunks(**PARAMS)))
+    other = concat_chunks(list(iter_dataset_chunks(**{**PARAMS, "seed": 4})))
+    for table in first:
+        pd.testing.assert_frame_equal(first[table], second[table])
+    assert not first["scores"].equals(other["scores"])
+
+
+def test_dataset_ids_and_portfolio_are_consistent():
+    dataset = concat_chunks(list(iter_dataset_chunks(**PARAMS)))
+    scores, claims, portfolio = (
+        dataset["scores"],
+        dataset["claims"],
+        dataset["portfolio"],
+    )
+    assert scores["COMPANY_ID"].nunique() == PARAMS["companies"]
+    assert scores["COMPANY_ID"].str.len().eq(12).all()
+    assert claims["CLAIM_ID"].is_unique
+    assert claims["CLAIM_ID"].str.len().eq(20).all()
+    assert claims["DEBTOR_ID"].isin(scores["COMPANY_ID"]).all()
+    assert (claims["LAST_UPDATE_DATE"] >= claims["CLAIM_CREATION_DATE"]).all()
+    assert (claims["CURRENT_CLAIM_AMOUNT"] <= claims["INITIAL_CLAIM_AMOUNT"]).all()
+    active = portfolio[portfolio["VALIDITY_END_DATE"].isna()]
+    assert active["COMPANY_ID"].is_unique
+    assert active["IS_VALID"].eq(1).all()
+    assert portfolio.groupby("COMPANY_ID")["IS_VALID"].sum().eq(1).all()
+    stopped = portfolio.dropna(subset=["VALIDITY_END_DATE"])
+    assert (stopped["VALIDITY_END_DATE"] >= stopped["VALIDITY_START_DATE"]).all()
+
+
+def test_scores_by_date_match_per_claim_lookup():
+    rng = np.random.default_rng(0)
+    company_ids = unique_ids(np.arange(20), 12345, 7)
+    scores = generate_scores(rng, company_ids, 30, REFERENCE_DATE)
+    claims = pd.DataFrame(
+        {
+            "CLAIM_CREATION_DATE": scores["SCORE_DATE"].sample(200, random_state=0)
+            .to_numpy()
+            + pd.to_timedelta(rng.integers(-1, 2, 200) * 3600, unit="s"),
+            "DEBTOR_ID": rng.choice(company_ids, 200),
+        }
+    )
+    expected = [
+        get_score_by_date(df=scores, company_id=company_id, date=date)
+        for date, company_id in claims.itertuples(index=False)
+    ]
+    assert get_scores_by_date(claims=claims, scores=scores).tolist() == expected
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_write_dataset_appends_chunks(tmp_path, output_format):
+    row_counts = write_dataset(
+        output_dir=str(tmp_path), output_format=output_format, **PARAMS
+    )
+    dataset = concat_chunks(list(iter_dataset_chunks(**PARAMS)))
+    read = pd.read_csv if output_format == "csv" else pd.read_parquet
+    for table, file_name in [
+        ("scores", "company_credit_scores"),
+        ("claims", "company_claims"),
+        ("portfolio", "client_portfolio"),
+    ]:
+        df = read(tmp_path / f"{file_name}.{output_format}")
+        assert len(df) == row_counts[table] == len(dataset[table])
+        assert list(df.columns) == list(dataset[table].columns)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 3])
+def test_write_parquet_with_an_empty_last_chunk(tmp_path, seed):
+    # 1 company in the last chunk, whose portfolio or claims are often empty
+    params = dict(
+        companies=101, chunk_size=100, seed=seed, reference_date=REFERENCE_DATE
+    )
+    row_counts = write_dataset(
+        output_dir=str(tmp_path), output_format="parquet", **params
+    )
+    dataset = concat_chunks(list(iter_dataset_chunks(**params)))
+    for table, file_name, id_column in [
+        ("claims", "company_claims", "DEBTOR_ID"),
+        ("portfolio", "client_portfolio", "COMPANY_ID"),
+    ]:
+        df = pd.read_parquet(tmp_path / f"{file_name}.parquet")
+        assert len(df) == row_counts[table] == len(dataset[table])
+        assert df[id_column].notna().all()
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from awesome_api.constants import (
+    ENV_VAR_HISTORY_CACHE_ENABLED,
+    ENV_VAR_HISTORY_CACHE_VERSION_CHECK_INTERVAL,
+)
+from awesome_api.history_cache import (
+    CompanyHistoryCache,
+    get_history_cache,
+    invalidate_history_caches,
+)
+from awesome_api.models import CompanyHistory
+from awesome_api.utils.cache import LruTtlCacheStore
+
+SCORE_ROWS = [
+    {"score_date": datetime(2020, 1, 1, 8), "score": 1, "company_id": "A"},
+    {"score_date": datetime(2020, 1, 1, 20), "score": 2, "company_id": "A"},
+    {"score_date": datetime(2021, 1, 1), "score": 3, "company_id": "A"},
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_store_evicts_least_recently_used_and_expired_entries():
+    clock = FakeClock()
+    store = LruTtlCacheStore(max_size=2, ttl=10, clock=clock)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.evictions == 1
+    clock.now = 10
+    assert store.get("a") is None
+    assert len(store) == 1
+
+
+def test_history_cache_reads_through_once_per_cutoff_day():
+    loaded_cutoffs = []
+
+    async def loader(cutoff_date):
+        loaded_cutoffs.append(cutoff_date)
+        await asyncio.sleep(0.01)
+        return [row for row in SCORE_ROWS if row["score_date"] >= cutoff_date]
+
+    async def scenario():
+        cache = CompanyHistoryCache(store=LruTtlCacheStore(max_size=10, ttl=60))
+
+        def get_rows(cutoff_date):
+            return cache.get_rows(
+                history=CompanyHistory.SCORES,
+                company_id="A",
+                cutoff_date=cutoff_date,
+                loader=loader,
+            )
+
+        first, second = await asyncio.gather(
+            get_rows(datetime(2020, 1, 1, 12)), get_rows(datetime(2020, 1, 1, 6))
+        )
+        assert [row["score"] for row in first] == [2, 3]
+        assert [row["score"] for row in second] == [1, 2, 3]
+        assert loaded_cutoffs == [datetime(2020, 1, 1)]
+        third = await get_rows(datetime(2020, 1, 1, 21))
+        assert [row["score"] for row in third] == [3]
+        assert loaded_cutoffs == [datetime(2020, 1, 1)]
+        cache.invalidate(company_id="A")
+        await get_rows(datetime(2020, 1, 1, 12))
+        await get_rows(datetime(2020, 1, 2))
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats.hits, stats.misses, stats.invalidations) == (1, 4, 2)
+
+
+def test_history_cache_is_cleared_when_the_shared_version_changes():
+    versions = [3, 3, 4]
+
+    async def version_loader():
+        return versions.pop(0)
+
+    async def scenario():
+        cache = CompanyHistoryCache(
+            store=LruTtlCacheStore(max_size=10, ttl=60), version_loader=version_loader
+        )
+        cache.store.set("scores:A", (datetime(2020, 1, 1), SCORE_ROWS))
+        await cache.check_version()
+        await cache.check_version()
+        assert len(cache.store) == 1
+        await cache.check_version()
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats.clears, stats.size) == (1, 0)
+
+
+@pytest.mark.parametrize(
+    "sqlite_client",
+    [
+        {
+            ENV_VAR_HISTORY_CACHE_ENABLED: "true",
+            # Checked by the test only
+            ENV_VAR_HISTORY_CACHE_VERSION_CHECK_INTERVAL: "3600",
+        }
+    ],
+    indirect=True,
+)
+def test_load_job_invalidates_the_history_cache(sqlite_client, sqlite_source):
+    client = sqlite_client
+    history_cache = get_history_cache()
+    scores = client.get("/ZXGCPOL1WVGN/scores").json()
+    sqlite_source.run_update_query(
+        query="DELETE FROM company_credit_scores WHERE company_id = 'ZXGCPOL1WVGN';"
+    )
+    # Served from the cache until the load job bumps the version
+    client.portal.call(history_cache.check_version)
+    assert client.get("/ZXGCPOL1WVGN/scores").json() == scores
+    invalidate_history_caches(executor=sqlite_source)
+    client.portal.call(history_cache.check_version)
+    assert client.get("/ZXGCPOL1WVGN/scores").json() != scores
+    assert client.get("/cache/stats").json()["clears"] == 1
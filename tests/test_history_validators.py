@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from awesome_api.history_validators import (
+    get_etag,
+    get_history_validator,
+    get_validator_headers,
+    is_not_modified,
+)
+from awesome_api.models import CompanyHistory, HistoryValidator
+
+CLAIM_ROWS = [
+    {
+        "claim_creation_date": datetime(2022, 3, 1),
+        "last_update_date": datetime(2023, 5, 2, 10, 30, 15, 500),
+    },
+    {"claim_creation_date": datetime(2022, 1, 1), "last_update_date": None},
+]
+
+
+def test_claims_validator():
+    validator = get_history_validator(history=CompanyHistory.CLAIMS, rows=CLAIM_ROWS)
+    assert validator == HistoryValidator(
+        row_count=2,
+        first_date=datetime(2022, 1, 1),
+        last_modified=datetime(2023, 5, 2, 10, 30, 15, 500),
+    )
+    assert get_history_validator(
+        history=CompanyHistory.CLAIMS, rows=[]
+    ) == HistoryValidator(row_count=0)
+
+
+def test_is_not_modified():
+    history = CompanyHistory.CLAIMS
+    validator = get_history_validator(history=history, rows=CLAIM_ROWS)
+    headers = get_validator_headers(history=history, validator=validator)
+    assert headers["Last-Modified"] == "Tue, 02 May 2023 10:30:15 GMT"
+    etag = get_etag(history=history, validator=validator)
+
+    def not_modified(if_none_match=None, if_modified_since=None):
+        return is_not_modified(
+            history=history,
+            validator=validator,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+        )
+
+    assert not_modified(if_none_match=f'"other", {etag}')
+    assert not_modified(if_none_match="*")
+    assert not not_modified(if_none_match='W/"other"')
+    assert not_modified(if_modified_since=headers["Last-Modified"])
+    assert not not_modified(if_modified_since="Tue, 02 May 2023 10:30:14 GMT")
+    assert not not_modified(if_modified_since="not a date")
+    # If-None-Match takes precedence over If-Modified-Since
+    assert not not_modified(
+        if_none_match='W/"other"', if_modified_since=headers["Last-Modified"]
+    )
@@ -0,0 +1,41 @@
+from awesome_api.migrations import MIGRATIONS, get_pending_migrations
+from awesome_api.models import Migration
+from awesome_api.query_plans import get_plan_indexes
+
+TEST_MIGRATIONS = [
+    Migration(version=version, name=f"migration_{version}", statements=[])
+    for version in [3, 1, 2]
+]
+
+
+def test_migration_versions_are_unique():
+    versions = [migration.version for migration in MIGRATIONS]
+    assert len(versions) == len(set(versions))
+
+
+def test_pending_migrations_are_sorted_and_skip_applied_ones():
+    pending = get_pending_migrations(
+        migrations=TEST_MIGRATIONS, applied_versions={2}
+    )
+    assert [migration.version for migration in pending] == [1, 3]
+
+
+def test_pending_migrations_stop_at_target_version():
+    pending = get_pending_migrations(
+        migrations=TEST_MIGRATIONS, applied_versions=set(), target_version=2
+    )
+    assert [migration.version for migration in pending] == [1, 2]
+
+
+def test_get_plan_indexes():
+    plan = {
+        "Node Type": "Nested Loop",
+        "Plans": [
+            {"Node Type": "Index Scan", "Index Name": "a_idx"},
+            {
+                "Node Type": "Bitmap Heap Scan",
+                "Plans": [{"Node Type": "Bitmap Index Scan", "Index Name": "b_idx"}],
+            },
+        ],
+    }
+    assert get_plan_indexes(plan) == ["a_idx", "b_idx"]
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime
+from typing import List
+
+import pytest
+
+from awesome_api.constants import ENV_VAR_ORDER_WRITE_BEHIND_ENABLED
+from awesome_api.fastapi_views import app, lifespan
+from awesome_api.models import (
+    AsyncPortfolioManager,
+    ClientOrder,
+    OrderType,
+    WriteBehindConfig,
+)
+from awesome_api.order_logging import OrderWriteBehindBuffer, get_order_buffer
+from awesome_api.utils.postgres_utils import get_async_data_source
+from awesome_api.utils.sqlite_utils import AsyncSqliteDataSource
+
+
+class InMemoryPortfolioManager(AsyncPortfolioManager):
+    def __init__(self, fail: bool = False):
+        self.batches: List[List[ClientOrder]] = []
+        self.fail = fail
+
+    async def add_company(self, company_id, insertion_date, order_type=None):
+        pass
+
+    async def remove_company(self, company_id, removal_date):
+        pass
+
+    async def get_portfolio(self, only_active_companies=True):
+        return []
+
+    async def get_portfolio_page(self, limit, after_portfolio_entry_id=0):
+        return [], None
+
+    async def add_orders(self, orders):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.batches.append(orders)
+
+
+def make_orders(n: int) -> List[ClientOrder]:
+    return [
+        ClientOrder(
+            company_id=f"company_{i}",
+            order_type=OrderType.SCORES,
+            order_date=datetime(2024, 1, 1),
+        )
+        for i in range(n)
+    ]
+
+
+def test_buffer_flushes_in_batches_and_on_stop():
+    async def scenario():
+        pf_manager = InMemoryPortfolioManager()
+        buffer = OrderWriteBehindBuffer(
+            pf_manager=pf_manager,
+            config=WriteBehindConfig(enabled=True, batch_size=3, flush_interval=60),
+        )
+        await buffer.start()
+        buffer.record(orders=make_orders(4))
+        await asyncio.sleep(0.01)
+        buffer.record(orders=make_orders(1))
+        await buffer.stop()
+        return pf_manager, buffer
+
+    pf_manager, buffer = asyncio.run(scenario())
+    assert [len(batch) for batch in pf_manager.batches] == [3, 1, 1]
+    stats = buffer.stats()
+    assert stats.queue_depth == 0
+    assert stats.flushed_orders == 5
+
+
+def test_buffer_keeps_orders_of_failed_flush():
+    async def scenario():
+        pf_manager = InMemoryPortfolioManager(fail=True)
+        buffer = OrderWriteBehindBuffer(
+            pf_manager=pf_manager, config=WriteBehindConfig(enabled=True)
+        )
+        buffer.record(orders=make_orders(2))
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        return buffer
+
+    stats = asyncio.run(scenario()).stats()
+    assert stats.queue_depth == 2
+    assert stats.failed_flush_count == 1
+
+
+def test_buffer_drops_orders_beyond_max_pending():
+    buffer = OrderWriteBehindBuffer(
+        pf_manager=InMemoryPortfolioManager(),
+        config=WriteBehindConfig(enabled=True, max_pending=3),
+    )
+    buffer.record(orders=make_orders(2))
+    buffer.record(orders=make_orders(2))
+    buffer.record(orders=make_orders(1))
+    stats = buffer.stats()
+    assert (stats.queue_depth, stats.dropped_orders) == (3, 2)
+
+
+class DisposedExecutor(AsyncSqliteDataSource):
+    disposed = False
+
+    async def dispose(self) -> None:
+        self.disposed = True
+
+
+def test_shutdown_logs_orders_of_failed_flush_and_disposes(
+    monkeypatch, caplog, sqlite_source
+):
+    monkeypatch.setenv(ENV_VAR_ORDER_WRITE_BEHIND_ENABLED, "true")
+    get_order_buffer.cache_clear()
+    executor = DisposedExecutor(source=sqlite_source)
+    app.dependency_overrides[get_async_data_source] = lambda: executor
+
+    async def scenario():
+        async with lifespan(app):
+            buffer = get_order_buffer()
+            buffer.pf_manager = InMemoryPortfolioManager(fail=True)
+            buffer.record(orders=make_orders(2))
+        return buffer
+
+    try:
+        with pytest.raises(ConnectionError):
+            asyncio.run(scenario())
+        stats = get_order_buffer().stats()
+    finally:
+        app.dependency_overrides.clear()
+        get_order_buffer.cache_clear()
+    assert executor.disposed
+    assert (stats.queue_depth, stats.dropped_orders) == (0, 2)
+    assert "Dropped 2 client orders as the final flush failed" in caplog.text
+    assert "company_0 scores 2024-01-01T00:00:00" in caplog.text
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+import pytest
+
+from awesome_api.errors import WrongCursorFormat
+from awesome_api.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 4, 14, 10, 30), "A", 12]
+    cursor = encode_cursor(values)
+    assert decode_cursor(cursor, converters=[datetime.fromisoformat, str, int]) == (
+        values
+    )
+
+
+@pytest.mark.parametrize("cursor", ["zzz", encode_cursor([1, 2]), "bm90IGpzb24="])
+def test_invalid_cursor(cursor):
+    with pytest.raises(WrongCursorFormat):
+        decode_cursor(cursor, converters=[int])
@@ -0,0 +1,103 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from awesome_api.errors import ChunkExecutionError
+from awesome_api.utils.parallel_extraction import (
+    ChunkExecutor,
+    ExecutorBackend,
+    dummy_func,
+    get_chunk_executor,
+    parallel_execution,
+    values_chunker,
+)
+
+
+@pytest.mark.parametrize(
+    "n_values, chunk_size, expected_sizes",
+    [(0, 3, []), (2, 3, [2]), (6, 3, [3, 3]), (7, 3, [3, 3, 1]), (10, 4, [4, 4, 2])],
+)
+def test_values_chunker_keeps_every_value(n_values, chunk_size, expected_sizes):
+    values = [f"a_{i}" for i in range(n_values)]
+    chunks = list(values_chunker(values=values, chunk_size=chunk_size))
+    assert [len(chunk) for chunk in chunks] == expected_sizes
+    assert [value for chunk in chunks for value in chunk] == values
+
+
+def fail_on_a_3(chunk):
+    if "a_3" in chunk:
+        raise ValueError("a_3")
+    return len(chunk)
+
+
+@pytest.mark.parametrize("backend", list(ExecutorBackend))
+def test_parallel_execution_keeps_chunk_order(backend):
+    values = [f"a_{i}" for i in range(11)]
+    df = parallel_execution(
+        func=dummy_func, values=values, chunk_size=3, pool_size=2, backend=backend
+    )
+    assert df["a"].tolist() == values
+    assert get_chunk_executor(backend=backend, pool_size=2).pool is not None
+
+
+def only_a_1(chunk):
+    # Like updates of a date, dates of empty chunks are not datetime typed
+    values = [value for value in chunk if value == "a_1"]
+    return pd.DataFrame({"a": values, "b": [pd.Timestamp(2025, 1, 30)] * len(values)})
+
+
+def test_parallel_execution_leaves_empty_chunks_out():
+    values = [f"a_{i}" for i in range(5)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        df = parallel_execution(
+            func=only_a_1,
+            values=values,
+            chunk_size=1,
+            pool_size=2,
+            backend=ExecutorBackend.THREAD,
+        )
+        empty = parallel_execution(
+            func=only_a_1,
+            values=values[2:],
+            chunk_size=1,
+            pool_size=2,
+            backend=ExecutorBackend.THREAD,
+        )
+    assert df.to_dict("records") == [{"a": "a_1", "b": pd.Timestamp(2025, 1, 30)}]
+    assert empty.empty and list(empty.columns) == ["a", "b"]
+
+
+def test_chunk_executor_streams_timed_results():
+    executor = ChunkExecutor(backend=ExecutorBackend.THREAD, pool_size=2)
+    values = [f"a_{i}" for i in range(7)]
+    try:
+        results = list(executor.imap_unordered(func=len, values=values, chunk_size=3))
+        pool = executor.pool
+        executor.map(func=len, values=values, chunk_size=3)
+        assert executor.pool is pool
+    finally:
+        executor.close()
+    results.sort(key=lambda chunk_result: chunk_result.chunk_index)
+    assert [result.result for result in results] == [3, 3, 1]
+    assert [list(result.chunk) for result in results] == [
+        values[:3],
+        values[3:6],
+        values[6:],
+    ]
+    assert all(result.seconds >= 0 for result in results)
+
+
+@pytest.mark.parametrize("backend", list(ExecutorBackend))
+def test_chunk_executor_identifies_failing_chunk(backend):
+    executor = ChunkExecutor(backend=backend, pool_size=2)
+    values = [f"a_{i}" for i in range(7)]
+    try:
+        with pytest.raises(ChunkExecutionError) as error:
+            executor.map(func=fail_on_a_3, values=values, chunk_size=3)
+    finally:
+        executor.close()
+    assert error.value.chunk_index == 1
+    assert list(error.value.chunk) == ["a_3", "a_4", "a_5"]
+    assert "ValueError: a_3" in str(error.value)
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from awesome_api.constants import ENV_VAR_PORTFOLIO_INDEX_ENABLED
+from awesome_api.models import PortfolioIndexConfig
+from awesome_api.portfolio_index import ActivePortfolioIndex
+from awesome_api.portfolio_management import AsyncSqlPortfolioManager
+from awesome_api.utils.sqlite_utils import AsyncSqliteDataSource
+
+
+def make_row(company_id, portfolio_entry_id):
+    return {
+        "company_id": company_id,
+        "validity_start_date": datetime(2024, 1, portfolio_entry_id),
+        "portfolio_entry_id": portfolio_entry_id,
+    }
+
+
+def test_index_knows_no_company_until_loaded():
+    index = ActivePortfolioIndex(config=PortfolioIndexConfig(enabled=True))
+    index.add(make_row("A", 1))
+    assert not index.loaded
+    assert index.get("A") is None
+
+
+def test_reconcile_keeps_changes_made_while_loading():
+    async def scenario():
+        loading = asyncio.Event()
+        release = asyncio.Event()
+
+        async def loader():
+            loading.set()
+            await release.wait()
+            # Read before "B" was added and "C" removed
+            return [make_row("A", 1), make_row("C", 3), make_row("D", 4)]
+
+        index = ActivePortfolioIndex(
+            config=PortfolioIndexConfig(enabled=True), loader=loader
+        )
+        index.add(make_row("C", 3))
+        index.add(make_row("E", 5))
+        reconcile = asyncio.create_task(index.reconcile())
+        await loading.wait()
+        index.add(make_row("B", 2))
+        index.remove("C")
+        release.set()
+        await reconcile
+        return index
+
+    index = asyncio.run(scenario())
+    assert [entry.company_id for entry in index.portfolio()] == ["A", "B", "D"]
+    assert index.get("E") is None
+    stats = index.stats()
+    assert (stats.size, stats.reconcile_count, stats.last_reconcile_drift) == (
+        3,
+        1,
+        0,
+    )
+
+
+@pytest.mark.parametrize(
+    "sqlite_client", [{ENV_VAR_PORTFOLIO_INDEX_ENABLED: "true"}], indirect=True
+)
+def test_monitored_companies_skip_portfolio_queries(sqlite_client, sqlite_source):
+    client, observer = sqlite_client, sqlite_source.observer
+    client.get("/ZXGCPOL1WVGN/scores")
+    observer.events.clear()
+    client.get("/ZXGCPOL1WVGN/claims")
+    portfolio = client.get("/client_portfolio").json()
+    assert [entry["company_id"] for entry in portfolio] == ["ZXGCPOL1WVGN"]
+    assert [event.label for event in observer.events] == [
+        "select claims",
+        "insert client_orders",
+    ]
+    client.delete("/delete_company/ZXGCPOL1WVGN")
+    assert client.get("/client_portfolio").json() == []
+    observer.events.clear()
+    # A stopped monitoring is renewed through the database
+    client.get("/ZXGCPOL1WVGN/scores")
+    assert "with client_portfolio" in [event.label for event in observer.events]
+    assert len(client.get("/client_portfolio").json()) == 1
+
+
+class PausingExecutor(AsyncSqliteDataSource):
+    """Pauses after reading back the active entry of a company."""
+
+    def __init__(self, source):
+        super().__init__(source=source)
+        self.entry_read = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    async def run_select_rows(self, query, params=None):
+        rows = await super().run_select_rows(query=query, params=params)
+        if params and "company_id" in params and rows:
+            self.entry_read.set()
+            await self.resume.wait()
+        return rows
+
+
+def test_removal_during_add_read_back_is_kept(sqlite_source):
+    async def scenario():
+        executor = PausingExecutor(source=sqlite_source)
+        index = ActivePortfolioIndex(config=PortfolioIndexConfig(enabled=True))
+        pf_manager = AsyncSqlPortfolioManager(executor=executor, index=index)
+        index.loader = pf_manager.get_active_entries
+        await index.reconcile()
+        now = datetime(2025, 1, 30)
+        add = asyncio.create_task(
+            pf_manager.add_company(company_id="ZXGCPOL1WVGN", insertion_date=now)
+        )
+        # The entry is read back, then the company is removed
+        await executor.entry_read.wait()
+        await pf_manager.remove_company(company_id="ZXGCPOL1WVGN", removal_date=now)
+        executor.resume.set()
+        await add
+        return index, await pf_manager.get_active_entries()
+
+    index, rows = asyncio.run(scenario())
+    assert rows == []
+    assert index.get("ZXGCPOL1WVGN") is None
+    assert index.portfolio() == []
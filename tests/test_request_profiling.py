@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from awesome_api.constants import (
+    ENV_VAR_PROFILING_ENABLED,
+    ENV_VAR_PROFILING_OUTPUT_DIR,
+)
+from awesome_api.fastapi_views import app
+from awesome_api.request_profiling import get_request_profiler
+from awesome_api.utils.postgres_utils import get_async_data_source
+from awesome_api.utils.profiling import AWAIT_FRAME, StackProfile, TaskSampler
+from awesome_api.utils.sqlite_utils import AsyncSqliteDataSource, SqliteDataSource
+
+
+def test_profile_collapsed_stacks_and_breakdowns():
+    profile = StackProfile(
+        stacks={
+            ("app:handler", "app:run_select_rows", AWAIT_FRAME): 2,
+            ("app:handler", "pandas.core.frame:__init__"): 1,
+            ("app:handler", "app:json_response", "pydantic.main:dump"): 1,
+        },
+        interval=0.001,
+        seconds=0.01,
+    )
+    assert profile.collapsed().splitlines() == [
+        "app:handler;app:json_response;pydantic.main:dump 1",
+        "app:handler;app:run_select_rows;(await) 2",
+        "app:handler;pandas.core.frame:__init__ 1",
+    ]
+    hot_paths = {"sql": {"run_select_rows"}, "serialization": {"json_response"}}
+    assert profile.breakdown(hot_paths) == {"sql": 0.5, "serialization": 0.25}
+    assert profile.package_breakdown() == {"app": 0.5, "pandas": 0.25, "pydantic": 0.25}
+
+
+async def read_rows():
+    await asyncio.sleep(0.1)
+
+
+async def handle_request():
+    await read_rows()
+
+
+def test_sampler_reads_suspended_task_stack():
+    async def sample_request():
+        task = asyncio.ensure_future(handle_request())
+        await asyncio.sleep(0.01)
+        sampler = TaskSampler(task=task)
+        stacks = await asyncio.to_thread(sampler.sample)
+        await task
+        return stacks
+
+    stacks = asyncio.run(sample_request())
+    assert (
+        f"{__name__}:handle_request",
+        f"{__name__}:read_rows",
+        "asyncio.tasks:sleep",
+        AWAIT_FRAME,
+    ) in stacks
+
+
+@pytest.fixture
+def profiled_client(monkeypatch, tmp_path):
+    monkeypatch.setenv(ENV_VAR_PROFILING_ENABLED, "true")
+    monkeypatch.setenv(ENV_VAR_PROFILING_OUTPUT_DIR, str(tmp_path))
+    get_request_profiler.cache_clear()
+    source = SqliteDataSource()
+    source.create_schema()
+    source.load_initial_data()
+    app.dependency_overrides[get_async_data_source] = lambda: AsyncSqliteDataSource(
+        source=source
+    )
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+        source.dispose()
+        get_request_profiler.cache_clear()
+
+
+def test_requests_with_profile_header_are_profiled(profiled_client, tmp_path):
+    response = profiled_client.get("/ZXGCPOL1WVGN/claims", headers={"X-Profile": "1"})
+    profile_id = response.headers["X-Profile-Id"]
+    with open(tmp_path / f"{profile_id}.json") as file:
+        summary = json.load(file)
+    assert (summary["method"], summary["path"]) == ("GET", "/ZXGCPOL1WVGN/claims")
+    assert set(summary["hot_paths"]) == {"sql", "claim_info", "serialization"}
+    assert (tmp_path / f"{profile_id}.folded").exists()
+    assert "X-Profile-Id" not in profiled_client.get("/ZXGCPOL1WVGN/claims").headers
@@ -0,0 +1,60 @@
+from typing import Iterator, List
+
+from pandas import DataFrame
+
+from awesome_api.models import ConsoleConfig
+from awesome_api.sql_console import ConsoleDataSource, run_console_query
+from awesome_api.utils.cache import LruTtlCacheStore
+
+ROWS = DataFrame({"claim_id": [f"C{i}" for i in range(25)], "amount": range(25)})
+
+
+class InMemoryConsoleDataSource(ConsoleDataSource):
+    def __init__(self, config: ConsoleConfig, df: DataFrame):
+        super().__init__(config=config)
+        self.df = df
+        self.queries: List[str] = []
+
+    def iter_chunks(self, query: str, limit: int) -> Iterator[DataFrame]:
+        self.queries.append(query)
+        rows = self.df.iloc[:limit]
+        for start in range(0, len(rows), self.config.chunk_size):
+            end = start + self.config.chunk_size
+            yield rows.iloc[start:end]
+
+
+def test_console_results_are_capped_and_rendered_by_chunks():
+    source = InMemoryConsoleDataSource(
+        config=ConsoleConfig(max_rows=12, chunk_size=5), df=ROWS
+    )
+    chunk_sizes: List[int] = []
+    result = run_console_query(
+        source=source,
+        cache=LruTtlCacheStore(max_size=10, ttl=60),
+        query="SELECT * FROM claims",
+        on_chunk=lambda chunk: chunk_sizes.append(len(chunk)),
+    )
+    assert chunk_sizes == [5, 5, 2]
+    assert result.df.equals(ROWS.iloc[:12])
+    assert result.truncated and not result.cached
+
+
+def test_console_results_under_the_cap_are_not_truncated():
+    source = InMemoryConsoleDataSource(
+        config=ConsoleConfig(max_rows=25, chunk_size=10), df=ROWS
+    )
+    cache = LruTtlCacheStore(max_size=10, ttl=60)
+    result = run_console_query(source=source, cache=cache, query="SELECT 1")
+    assert len(result.df) == 25 and not result.truncated
+
+
+def test_console_results_are_cached_by_sql_text():
+    source = InMemoryConsoleDataSource(config=ConsoleConfig(), df=ROWS)
+    cache = LruTtlCacheStore(max_size=10, ttl=60)
+    run_console_query(source=source, cache=cache, query="SELECT * FROM claims;")
+    result = run_console_query(
+        source=source, cache=cache, query="\n SELECT * FROM claims \n"
+    )
+    assert result.cached and len(result.df) == 25
+    run_console_query(source=source, cache=cache, query="SELECT * FROM scores")
+    assert source.queries == ["SELECT * FROM claims;", "SELECT * FROM scores"]
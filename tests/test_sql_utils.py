@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from awesome_api.update_management import _build_score_updates_chunk_query
+from awesome_api.utils.sql_utils import (
+    PreparedStatementRegistry,
+    array_in_clause,
+    to_prepared_statement,
+)
+
+
+def test_array_in_clause_binds_one_array_on_postgres_only():
+    assert array_in_clause(values=("A", "B"), name="ids") == (
+        " = ANY(:ids)",
+        {"ids": ["A", "B"]},
+    )
+    assert array_in_clause(values=("A", "B"), name="ids", dialect="sqlite") == (
+        " IN (:ids_0, :ids_1)",
+        {"ids_0": "A", "ids_1": "B"},
+    )
+
+
+def test_chunk_queries_have_the_same_text_whatever_the_chunk_size():
+    dates = {"update_date": datetime(2025, 1, 29), "call_date": datetime(2025, 1, 30)}
+    small = _build_score_updates_chunk_query(chunk=["A"], **dates)
+    large = _build_score_updates_chunk_query(chunk=["A", "B", "C"], **dates)
+    assert small.query == large.query
+    assert large.params["company_ids"] == ["A", "B", "C"]
+
+
+def test_prepared_statement_numbers_parameters_once():
+    statement = to_prepared_statement(
+        name="page",
+        query="SELECT CAST(:day AS DATE)::text WHERE :id > 0 OR :day IS NULL;",
+    )
+    assert statement.query == "SELECT CAST($1 AS DATE)::text WHERE $2 > 0 OR $1 IS NULL"
+    assert statement.execute_query == "EXECUTE page (:day, :id)"
+    assert to_prepared_statement("one", "SELECT 1").execute_query == "EXECUTE one"
+
+
+def test_registry_rejects_a_name_reused_for_another_query():
+    registry = PreparedStatementRegistry()
+    assert registry.register(name="one", query="SELECT 1") == "SELECT 1"
+    registry.register(name="one", query="SELECT 1")
+    assert registry.get("SELECT 1").name == "one"
+    assert registry.get("SELECT 2") is None
+    with pytest.raises(ValueError):
+        registry.register(name="one", query="SELECT 2")
@@ -0,0 +1,192 @@
+from datetime import date, datetime, timedelta
+
+from awesome_api.models import OrderType
+from awesome_api.portfolio_management import SqlPortfolioManager
+from awesome_api.update_snapshots import (
+    build_update_snapshot_query,
+    rebuild_update_snapshot,
+)
+from awesome_api.utils.sqlite_utils import rewrite_query
+
+
+def get_company_with_claims(source):
+    [row] = source.run_select_rows(
+        query="""
+        SELECT debtor_id FROM claims
+        GROUP BY debtor_id ORDER BY MAX(claim_creation_date) DESC LIMIT 1;
+        """
+    )
+    return row["debtor_id"]
+
+
+def test_histories_monitor_and_log_orders(sqlite_client, sqlite_source):
+    company_id = get_company_with_claims(sqlite_source)
+    scores = sqlite_client.get(f"/{company_id}/scores")
+    claims = sqlite_client.get(f"/{company_id}/claims")
+    assert scores.status_code == claims.status_code == 200
+    assert claims.json()
+    assert {claim["company_id"] for claim in claims.json()} == {company_id}
+    not_modified = sqlite_client.get(
+        f"/{company_id}/claims", headers={"If-None-Match": claims.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+    portfolio = sqlite_client.get("/client_portfolio").json()
+    assert [entry["company_id"] for entry in portfolio] == [company_id]
+    orders = sqlite_source.run_select_rows(
+        query="SELECT order_type FROM client_orders ORDER BY order_date;"
+    )
+    assert [order["order_type"] for order in orders] == ["scores", "claims", "claims"]
+    assert sqlite_client.delete(f"/delete_company/{company_id}").status_code == 200
+    assert sqlite_client.get("/client_portfolio").json() == []
+    # A stopped monitoring is renewed, the previous entry is no longer valid
+    sqlite_client.get(f"/{company_id}/scores")
+    entries = sqlite_source.run_select_rows(
+        query="SELECT is_valid, validity_end_date FROM client_portfolio"
+        " ORDER BY portfolio_entry_id;"
+    )
+    assert [entry["is_valid"] for entry in entries] == [0, 1]
+    assert entries[1]["validity_end_date"] is None
+
+
+def test_past_updates_are_served_from_snapshots(sqlite_client, sqlite_source):
+    company_id = get_company_with_claims(sqlite_source)
+    sqlite_client.get(f"/{company_id}/claims")
+    [row] = sqlite_source.run_select_rows(
+        query="SELECT MAX(last_update_date) AS last_update_date FROM claims"
+        " WHERE debtor_id = :company_id;",
+        params={"company_id": company_id},
+    )
+    update_date = row["last_update_date"].date().isoformat()
+    url = f"/updates?input_update_date={update_date}"
+    # Requests do not build snapshots, the live tables serve the date meanwhile
+    live_update = sqlite_client.get(url).json()
+    assert live_update["claim_updates"]
+    assert sqlite_source.run_select_rows(query="SELECT * FROM update_snapshots;") == []
+    rebuild_update_snapshot(
+        executor=sqlite_source, update_date=datetime.fromisoformat(update_date)
+    )
+    sqlite_source.observer.events.clear()
+    assert sqlite_client.get(url).json() == live_update
+    labels = {event.label for event in sqlite_source.observer.events}
+    assert {"select score_update_snapshots", "select claim_update_snapshots"} <= labels
+    assert "select claims" not in labels
+
+
+def test_change_feed_pages(sqlite_client, sqlite_source):
+    company_id = get_company_with_claims(sqlite_source)
+    sqlite_client.get(f"/{company_id}/claims")
+    batch = sqlite_client.get("/changes").json()
+    assert batch["changes"] and not batch["has_more"]
+    changes, params = [], {"limit": 2}
+    while True:
+        page = sqlite_client.get("/changes", params=params).json()
+        changes += page["changes"]
+        params["since"] = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    assert changes == batch["changes"]
+
+
+def test_change_feed_returns_rows_loaded_behind_its_cursor(
+    sqlite_client, sqlite_source
+):
+    company_id = get_company_with_claims(sqlite_source)
+    sqlite_client.get(f"/{company_id}/claims")
+    batch = sqlite_client.get("/changes").json()
+    assert batch["changes"] and not batch["has_more"]
+    # Loaded after the poll, with dates before the changes already returned
+    past_date = datetime.now() - timedelta(days=4 * 365)
+    sqlite_source.run_insert_query(
+        query="INSERT INTO company_credit_scores (company_id, score_date, score)"
+        " VALUES (:company_id, :score_date, 2);",
+        params={"company_id": company_id, "score_date": past_date},
+    )
+    [claim] = sqlite_source.run_select_rows(
+        query="SELECT claim_id FROM claims WHERE debtor_id = :company_id"
+        " ORDER BY claim_creation_date DESC LIMIT 1;",
+        params={"company_id": company_id},
+    )
+    sqlite_source.run_update_query(
+        query="UPDATE claims SET current_claim_amount = 0, last_update_date = :day"
+        " WHERE claim_id = :claim_id;",
+        params={"day": past_date, "claim_id": claim["claim_id"]},
+    )
+    late = sqlite_client.get("/changes", params={"since": batch["next_cursor"]})
+    changes = late.json()["changes"]
+    assert [change["type"] for change in changes] == ["score_update", "claim_update"]
+    assert changes[0]["data"]["score_date"] == past_date.isoformat()
+    assert changes[1]["data"]["claim_status_date"] == past_date.strftime("%Y-%m-%d")
+    polled = sqlite_client.get("/changes", params={"since": late.json()["next_cursor"]})
+    assert polled.json()["changes"] == []
+
+
+def test_postgres_statements_are_rewritten_with_the_same_effect(sqlite_source):
+    day = datetime(2025, 1, 30)
+    queries = {
+        order_type: SqlPortfolioManager._build_monitor_company_query(
+            company_id="A", insertion_date=day, order_type=order_type
+        )
+        for order_type in [None, OrderType.SCORES]
+    }
+    snapshot_query = build_update_snapshot_query(update_date=day, created_at=day)
+    rewritten = [rewrite_query(query) for query in [*queries.values(), snapshot_query]]
+    assert [len(queries) for queries in rewritten] == [2, 3, 3]
+    # Monitoring, a no-op while monitored, then renewed after a stop
+    sqlite_source.run_queries_in_one_transaction(queries=[queries[None]])
+    sqlite_source.run_queries_in_one_transaction(queries=[queries[OrderType.SCORES]])
+    sqlite_source.run_update_query(
+        query="UPDATE client_portfolio SET validity_end_date = :day;",
+        params={"day": day},
+    )
+    sqlite_source.run_queries_in_one_transaction(queries=[queries[OrderType.SCORES]])
+    entries = sqlite_source.run_select_rows(
+        query="SELECT is_valid, validity_end_date FROM client_portfolio"
+        " ORDER BY portfolio_entry_id;"
+    )
+    assert entries == [
+        {"is_valid": 0, "validity_end_date": day},
+        {"is_valid": 1, "validity_end_date": None},
+    ]
+    orders = sqlite_source.run_select_rows(query="SELECT * FROM client_orders;")
+    assert len(orders) == 2
+    # A snapshot is built once, until it is deleted
+    sqlite_source.run_queries_in_one_transaction(queries=[snapshot_query])
+    [count] = sqlite_source.run_select_rows(
+        query="SELECT COUNT(*) AS n FROM claim_update_snapshots;"
+    )
+    later_query = build_update_snapshot_query(
+        update_date=day, created_at=datetime.now()
+    )
+    sqlite_source.run_queries_in_one_transaction(queries=[later_query])
+    assert sqlite_source.run_select_rows(
+        query="SELECT COUNT(*) AS n FROM claim_update_snapshots;"
+    ) == [count]
+    [snapshot] = sqlite_source.run_select_rows(query="SELECT * FROM update_snapshots;")
+    assert snapshot == {"update_date": date(2025, 1, 30), "created_at": day}
+
+
+def test_dates_are_bound_as_iso_text(sqlite_source):
+    [row] = sqlite_source.run_select_rows(
+        query="SELECT :day AS day, :timestamp AS timestamp;",
+        params={"day": date(2025, 1, 30), "timestamp": datetime(2025, 1, 30, 8)},
+    )
+    assert row == {"day": date(2025, 1, 30), "timestamp": datetime(2025, 1, 30, 8)}
+
+
+def test_score_pages_include_identical_scores(sqlite_client, sqlite_source):
+    score = {"company_id": "DUPLICATED", "score_date": datetime.now(), "score": 3}
+    for _ in range(3):
+        sqlite_source.run_insert_query(
+            query="INSERT INTO company_credit_scores (company_id, score_date, score)"
+            " VALUES (:company_id, :score_date, :score);",
+            params=score,
+        )
+    pages = [sqlite_client.get("/DUPLICATED/scores", params={"limit": 2})]
+    while "X-Next-Cursor" in pages[-1].headers:
+        cursor = pages[-1].headers["X-Next-Cursor"]
+        pages.append(
+            sqlite_client.get(
+                "/DUPLICATED/scores", params={"limit": 2, "cursor": cursor}
+            )
+        )
+    assert [len(page.json()) for page in pages] == [2, 1]
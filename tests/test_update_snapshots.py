@@ -0,0 +1,10 @@
+from datetime import datetime
+
+from awesome_api.update_snapshots import is_snapshot_date
+
+
+def test_only_past_dates_are_served_from_snapshots():
+    call_date = datetime(2025, 1, 30, 0, 5)
+    assert is_snapshot_date(update_date=datetime(2025, 1, 29), call_date=call_date)
+    assert not is_snapshot_date(update_date=datetime(2025, 1, 30), call_date=call_date)
+    assert not is_snapshot_date(update_date=datetime(2025, 2, 1), call_date=call_date)